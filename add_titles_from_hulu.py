@@ -1,11 +1,11 @@
-from hulu_bot.hulu_session import HuluSession
+from hulu_bot.orchestrator import HarvestOrchestrator, jobs_for
 
 
 if __name__ == "__main__":
-    # Creates instance of Hulu session
-    session = HuluSession()
-    session.login('{email}', '{password}', '{profile_name}')
-    session.navigate_to_movie_tab()
-    session.get_movie_tab_titles()
-
-
+    # One job per profile and tab, run across a browser per worker process
+    jobs = jobs_for('{email}', '{password}', ['{profile_name}'])
+    new_titles, results = HarvestOrchestrator().run(jobs)
+    for result in results:
+        outcome = f"failed: {result.error}" if result.error else f"{len(result.titles)} titles"
+        print(f"{result.job.label}: {outcome} ({result.attempts} attempts, {result.elapsed}s)")
+    print(f"{len(new_titles)} new titles: {new_titles}")
@@ -1,81 +1,177 @@
 import logging
+import os
+import threading
+import time
+
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
-RETRY_CODES = (500, 503, 409)
+from api_client.adapters import PooledHTTPAdapter
+from api_client.batch import BatchResult, RequestSpec, run_batch
+from api_client.cache import ResponseCache
+from api_client.metrics import (
+    HistogramSink,
+    JsonLinesSink,
+    PrometheusExporter,
+    build_metrics,
+    finish_request_timings,
+    start_request_timings,
+)
+from api_client.rate_limit import JitteredRetry, RateLimiter
+
+RETRY_CODES = (500, 503, 409, 429)
 REQUEST_TIMEOUT = 120
 BACKOFF_FACTOR = 1
 RETRY_TIMES = 3
+POOL_CONNECTIONS = 10  # number of hosts to keep a connection pool for
+POOL_MAXSIZE = 10  # kept-alive connections per host
+MAX_LOGGED_BODY_BYTES = 2048
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def response_log_fields(response, method):
+    """
+    Structured fields for a response log record, passed as `extra` so
+    handlers can emit them as separate keys
+    """
+    return {
+        "method": method,
+        "url": response.url,
+        "status_code": response.status_code,
+        "request_id": response.headers.get("x-request-id"),
+        "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+    }
+
+
+class TruncatedBody(object):
+    """
+    Log argument that only renders the body, capped at MAX_LOGGED_BODY_BYTES,
+    when a handler actually formats the record
+    """
+
+    def __init__(self, content, limit=MAX_LOGGED_BODY_BYTES):
+        self.content = content
+        self.limit = limit
+
+    def __str__(self):
+        if self.content is None or len(self.content) <= self.limit:
+            return str(self.content)
+        return f"{self.content[:self.limit]} ... ({len(self.content) - self.limit} more bytes)"
+
+
+def _bounded_chunks(chunks, chunk_size):
+    """
+    Re-slice an iterable of bytes so no single write exceeds chunk_size
+    """
+    for chunk in chunks:
+        for start in range(0, len(chunk), chunk_size):
+            yield chunk[start:start + chunk_size]
 
 
 class BaseAPITClient(object):
 
-    def __init__(self):
+    def __init__(
+        self,
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        cache=None,
+        rate_limiter=None,
+        metrics_sinks=None,
+    ):
+        """
+        Pass a ResponseCache as `cache` to serve repeated GETs from memory or
+        disk and revalidate stale ones with conditional requests.
+
+        Pass a RateLimiter as `rate_limiter` to cap the request rate and
+        in-flight requests per host and API key.
+
+        `metrics_sinks` (HistogramSink, PrometheusExporter, JsonLinesSink or
+        anything with a record(metrics) method) receive a RequestMetrics
+        with the connection phase timings of every request
+        """
         self.logger = logging.getLogger(__name__)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.metrics_sinks = list(metrics_sinks or [])
+        self._session = None
+        self._adapter = None
+        self._session_lock = threading.Lock()
 
-    def log_response(self, response, verbose=True):
-        request_id = response.headers.get("x-request-id")
-        self.logger.debug("Response request id: {}".format(request_id))
-        self.logger.debug(f"Response status code: <{response.status_code}>")
-        if verbose:
-            self.logger.debug(f"Response content: {response.content}")
+    def __enter__(self):
+        return self
 
-    def post(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
-        headers = {}
-        if api_key is not None:
-            headers["X-API-Key"] = api_key
-        if api_id is not None:
-            headers["X-API-ID"] = api_id
-        if headers:
-            if "headers" in kwargs:
-                kwargs["headers"].update(headers)
-            else:
-                kwargs["headers"] = headers
-        self.logger.debug("Making POST %s" % resource)
-        response = self.requests_retry_session().post(
-            resource, **kwargs, timeout=REQUEST_TIMEOUT
-        )
-        self.log_response(response, verbose)
-        return response
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-    def get(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
-        headers = {}
-        if api_key is not None:
-            headers["X-API-Key"] = api_key
-        if api_id is not None:
-            headers["X-API-ID"] = api_id
-        if headers:
-            if "headers" in kwargs:
-                kwargs["headers"].update(headers)
-            else:
-                kwargs["headers"] = headers
-        self.logger.debug("Making GET %s" % resource)
-        response = self.requests_retry_session().get(
-            resource, **kwargs, timeout=REQUEST_TIMEOUT
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+
+    def connection_stats(self):
+        """
+        Counts of requests sent, connections opened and requests that went out
+        over an already open keep-alive connection
+        """
+        if self._adapter is None:
+            return {"requests": 0, "new_connections": 0, "reused_connections": 0}
+        return self._adapter.connection_stats()
+
+    def batch(self, requests, max_workers=None, rate_limit=None):
+        """
+        Send every request in `requests` on a thread pool sharing this client's
+        connection pool and yield a BatchResult per request as it finishes.
+
+        Results arrive in completion order, use BatchResult.index to map them
+        back to the input. A failed request yields a result with `error` set
+        instead of stopping the batch. `rate_limit` caps request starts per
+        second. max_workers defaults to pool_maxsize; going above it opens
+        connections urllib3 will not keep.
+        """
+        if max_workers is None:
+            max_workers = self.pool_maxsize
+        return run_batch(self, requests, max_workers, rate_limit)
+
+    def log_response(self, response, verbose=True, stream=False):
+        """
+        Log status, request id and timing of a response, plus at most
+        MAX_LOGGED_BODY_BYTES of its body when verbose.
+
+        Does no work unless DEBUG is enabled, and never touches the body of a
+        streamed response since reading it would consume the stream
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        fields = response_log_fields(response, response.request.method)
+        self.logger.debug(
+            "Response %(method)s %(url)s <%(status_code)s> in %(elapsed_ms)sms, request id: %(request_id)s",
+            fields,
+            extra=fields,
         )
-        self.log_response(response, verbose)
-        return response
+        if verbose and not stream:
+            self.logger.debug("Response content: %s", TruncatedBody(response.content), extra=fields)
+
+    def post(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return self.request("POST", resource, api_key, api_id, verbose, **kwargs)
+
+    def get(self, resource: str, api_key=None, api_id=None, verbose=True, use_cache=True, **kwargs):
+        if self.cache is None or not use_cache or kwargs.get("stream"):
+            return self.request("GET", resource, api_key, api_id, verbose, **kwargs)
+        return self._cached_get(resource, api_key, api_id, verbose, **kwargs)
 
     def put(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
-        headers = {}
-        if api_key is not None:
-            headers["X-API-Key"] = api_key
-        if api_id is not None:
-            headers["X-API-ID"] = api_id
-        if headers:
-            if "headers" in kwargs:
-                kwargs["headers"].update(headers)
-            else:
-                kwargs["headers"] = headers
-        self.logger.debug("Making PUT %s" % resource)
-        response = self.requests_retry_session().put(
-            resource, **kwargs, timeout=REQUEST_TIMEOUT
-        )
-        self.log_response(response, verbose)
-        return response
+        return self.request("PUT", resource, api_key, api_id, verbose, **kwargs)
 
     def patch(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return self.request("PATCH", resource, api_key, api_id, verbose, **kwargs)
+
+    def delete(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return self.request("DELETE", resource, api_key, api_id, verbose, **kwargs)
+
+    def request(self, method, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
         headers = {}
         if api_key is not None:
             headers["X-API-Key"] = api_key
@@ -86,39 +182,187 @@ class BaseAPITClient(object):
                 kwargs["headers"].update(headers)
             else:
                 kwargs["headers"] = headers
-        self.logger.debug("Making PATCH %s" % resource)
-        response = self.requests_retry_session().patch(
-            resource, **kwargs, timeout=REQUEST_TIMEOUT
-        )
-        self.log_response(response, verbose)
+        self.logger.debug("Making %s %s", method, resource)
+        if self.rate_limiter is None:
+            response = self._send(method, resource, **kwargs)
+        else:
+            response = self.rate_limiter.send(
+                resource, api_key, lambda: self._send(method, resource, **kwargs)
+            )
+        self.log_response(response, verbose, kwargs.get("stream", False))
         return response
 
-    def delete(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
-        headers = {}
+    def _send(self, method, resource, **kwargs):
+        session = self.requests_retry_session()
+        if not self.metrics_sinks:
+            return session.request(method, resource, **kwargs, timeout=REQUEST_TIMEOUT)
+
+        timings = start_request_timings()
+        start_time = time.perf_counter()
+        response = None
+        error = None
+        try:
+            response = session.request(method, resource, **kwargs, timeout=REQUEST_TIMEOUT)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            finish_request_timings()
+            metrics = build_metrics(
+                method,
+                resource,
+                timings,
+                (time.perf_counter() - start_time) * 1000,
+                response,
+                error,
+            )
+            for sink in self.metrics_sinks:
+                sink.record(metrics)
+
+    def _cached_get(self, resource, api_key, api_id, verbose, **kwargs):
+        caller_headers = dict(kwargs.pop("headers", None) or {})
+        # The credentials are part of the cache key and of Vary matching
+        request_headers = dict(caller_headers)
         if api_key is not None:
-            headers["X-API-Key"] = api_key
+            request_headers["X-API-Key"] = api_key
         if api_id is not None:
-            headers["X-API-ID"] = api_id
-        if headers:
-            if "headers" in kwargs:
-                kwargs["headers"].update(headers)
-            else:
-                kwargs["headers"] = headers
-        self.logger.debug("Making DELETE %s" % resource)
-        response = self.requests_retry_session().delete(
-            resource, **kwargs, timeout=REQUEST_TIMEOUT
-        )
-        self.log_response(response, verbose)
+            request_headers["X-API-ID"] = api_id
+        key = self.cache.key(resource, kwargs.get("params"), request_headers)
+
+        entry = self.cache.lookup(key, request_headers)
+        if entry is not None and entry.is_fresh():
+            self.cache.record_hit()
+            self.logger.debug("Cache hit for GET %s", resource)
+            return entry.to_response()
+
+        headers = dict(caller_headers)
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+        # request() adds the credential headers and rate limits per key
+        response = self.request("GET", resource, api_key, api_id, verbose, headers=headers, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            self.cache.revalidated(key, entry, response)
+            return entry.to_response()
+        self.cache.record_miss()
+        self.cache.store(key, response, request_headers)
         return response
 
+    def get_stream(self, resource: str, api_key=None, api_id=None, **kwargs):
+        """
+        GET without reading the body. The caller owns the returned response
+        and should use it as a context manager or close() it so the
+        connection goes back to the pool
+        """
+        return self.get(resource, api_key, api_id, stream=True, **kwargs)
+
+    def iter_chunks(self, resource: str, api_key=None, api_id=None, chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+        with self.get_stream(resource, api_key, api_id, **kwargs) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+
+    def download_to(self, resource: str, path, api_key=None, api_id=None, resume=True, chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+        """
+        Stream a GET response into `path` through a `<path>.part` file.
+
+        With resume, bytes already in the part file (from an earlier run or a
+        connection dropped mid-download) are requested with a Range header
+        instead of downloaded again. Servers that ignore Range answer 200 and
+        the download restarts from zero. Returns the number of bytes in the
+        finished file.
+        """
+        part_path = f"{path}.part"
+        if not resume and os.path.exists(part_path):
+            os.remove(part_path)
+        attempt = 0
+
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = dict(kwargs.pop("headers", None) or {})
+            # Range offsets count bytes on the wire, so keep the body unencoded
+            headers.setdefault("Accept-Encoding", "identity")
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            elif "Range" in headers:
+                del headers["Range"]
+            kwargs["headers"] = headers
+
+            try:
+                with self.get_stream(resource, api_key, api_id, **kwargs) as response:
+                    if response.status_code == 416 and offset:
+                        # The part file already holds the whole resource
+                        break
+                    response.raise_for_status()
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    received = 0
+                    with open(part_path, mode) as file:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            file.write(chunk)
+                            received += len(chunk)
+                    # urllib3 1.26 does not enforce Content-Length, a dropped
+                    # connection would otherwise look like a finished body
+                    expected = response.headers.get("Content-Length")
+                    if expected is not None and received < int(expected):
+                        raise requests.exceptions.ChunkedEncodingError(
+                            f"Connection closed after {received} of {expected} bytes"
+                        )
+                break
+            except (
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.ConnectionError,
+            ) as e:
+                attempt += 1
+                if attempt > RETRY_TIMES:
+                    raise
+                self.logger.debug(
+                    "Download of %s interrupted (%s), resuming, attempt %s", resource, e, attempt
+                )
+                time.sleep(BACKOFF_FACTOR * (2 ** (attempt - 1)))
+
+        os.replace(part_path, path)
+        return os.path.getsize(path)
+
+    def upload(self, resource: str, data, api_key=None, api_id=None, method="PUT", chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+        """
+        Send `data` without loading it into memory. `data` can be a path, a
+        binary file object or an iterable of bytes. Files are sent with a
+        Content-Length and rewound if the retry adapter resends them;
+        iterables go out with chunked transfer encoding and cannot be resent.
+        """
+        if isinstance(data, (str, os.PathLike)):
+            with open(data, "rb") as file:
+                return self.request(method, resource, api_key, api_id, data=file, **kwargs)
+        if hasattr(data, "read"):
+            return self.request(method, resource, api_key, api_id, data=data, **kwargs)
+        return self.request(method, resource, api_key, api_id, data=_bounded_chunks(data, chunk_size), **kwargs)
+
     def requests_retry_session(self):
-        session = requests.Session()
-        retries = Retry(
-            total=RETRY_TIMES,
-            backoff_factor=BACKOFF_FACTOR,
-            status_forcelist=RETRY_CODES,
-        )
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
\ No newline at end of file
+        """
+        Session shared by every call on this client, built on first use and
+        kept until close() so connections are reused across requests
+        """
+        session = self._session
+        if session is not None:
+            return session
+
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                retries = JitteredRetry(
+                    total=RETRY_TIMES,
+                    backoff_factor=BACKOFF_FACTOR,
+                    status_forcelist=RETRY_CODES,
+                )
+                adapter = PooledHTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=retries,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._adapter = adapter
+                self._session = session
+            return self._session
@@ -0,0 +1,205 @@
+import socket
+import threading
+import time
+
+from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+from urllib3._collections import RecentlyUsedContainer
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from api_client.metrics import current_timings
+
+
+class _TimedConnectionMixin(object):
+    """
+    Records DNS, connect, TLS and time-to-first-byte for the request running
+    on the current thread, when BaseAPITClient has started collecting
+    timings for it. Costs one thread-local lookup otherwise, connections
+    are then opened by urllib3 unchanged
+    """
+
+    _requests_served = 0
+    _setup_timings = None
+    _connected_at = 0.0
+
+    def _new_conn(self):
+        # urllib3 reconnects dropped connections in place, count those as new
+        self._requests_served = 0
+        self._setup_timings = None
+        if current_timings() is None:
+            conn = super()._new_conn()
+            self._connected_at = time.perf_counter()
+            return conn
+
+        timings = {}
+        dns_host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = [
+                info[4][0]
+                for info in socket.getaddrinfo(
+                    dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM
+                )
+            ]
+        except socket.gaierror:
+            addresses = []
+        if not addresses:
+            # Let urllib3 resolve and raise its usual error
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        timings["dns_ms"] = (resolved - start) * 1000
+
+        # Connect to the addresses resolved above, in order like urllib3's
+        # create_connection, so DNS is not timed twice; self.host, used for
+        # SNI and certificate checks, is untouched
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    conn = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError):
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+        self._connected_at = time.perf_counter()
+        timings["connect_ms"] = (self._connected_at - resolved) * 1000
+        self._setup_timings = timings
+        return conn
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        self._connected_at = time.perf_counter()
+        if self._setup_timings is not None and isinstance(self, HTTPSConnection):
+            self._setup_timings["tls_ms"] = max(
+                (self._connected_at - start) * 1000
+                - self._setup_timings.get("dns_ms", 0)
+                - self._setup_timings.get("connect_ms", 0),
+                0,
+            )
+
+    def _start_request(self):
+        timings = current_timings()
+        if timings is not None:
+            timings["request_start"] = time.perf_counter()
+            timings["bytes_out"] = 0
+        return timings
+
+    def request(self, method, url, body=None, headers=None):
+        self._start_request()
+        return super().request(method, url, body=body, headers=headers)
+
+    def request_chunked(self, method, url, body=None, headers=None):
+        self._start_request()
+        return super().request_chunked(method, url, body=body, headers=headers)
+
+    def send(self, data):
+        timings = current_timings()
+        if timings is None:
+            return super().send(data)
+        if hasattr(data, "read"):
+            position = data.tell() if hasattr(data, "tell") else None
+            super().send(data)
+            if position is not None:
+                timings["bytes_out"] = timings.get("bytes_out", 0) + data.tell() - position
+            return
+        super().send(data)
+        timings["bytes_out"] = timings.get("bytes_out", 0) + len(data)
+
+    def getresponse(self):
+        response = super().getresponse()
+        timings = current_timings()
+        if timings is not None:
+            # Plain HTTP connects lazily inside request(), keep that out of TTFB
+            first_byte_from = max(timings.get("request_start", 0), self._connected_at)
+            timings["ttfb_ms"] = (time.perf_counter() - first_byte_from) * 1000
+            timings["reused_connection"] = self._requests_served > 0
+            if self._requests_served == 0 and self._setup_timings:
+                timings.update(self._setup_timings)
+            else:
+                timings.update(dns_ms=0.0, connect_ms=0.0, tls_ms=0.0)
+        self._requests_served += 1
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class CountingPoolManager(PoolManager):
+    """
+    PoolManager that keeps connection counters for pools it has already
+    evicted, so the totals survive urllib3 dropping least recently used hosts
+    """
+
+    def __init__(self, num_pools=10, headers=None, **connection_pool_kw):
+        super().__init__(num_pools=num_pools, headers=headers, **connection_pool_kw)
+        self._retired_lock = threading.Lock()
+        self._retired_connections = 0
+        self._retired_requests = 0
+        self.pools = RecentlyUsedContainer(num_pools, dispose_func=self._retire_pool)
+        self.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def _retire_pool(self, pool):
+        with self._retired_lock:
+            self._retired_connections += pool.num_connections
+            self._retired_requests += pool.num_requests
+        pool.close()
+
+    def connection_stats(self):
+        with self._retired_lock:
+            new_connections = self._retired_connections
+            requests_sent = self._retired_requests
+        # Read the container directly, indexing into the pools would bump
+        # their recency and change which host gets evicted next
+        with self.pools.lock:
+            live_pools = list(self.pools._container.values())
+        for pool in live_pools:
+            new_connections += pool.num_connections
+            requests_sent += pool.num_requests
+        return {
+            "requests": requests_sent,
+            "new_connections": new_connections,
+            "reused_connections": max(requests_sent - new_connections, 0),
+        }
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter backed by a CountingPoolManager so the client can report how
+    many requests went out over a kept-alive connection
+    """
+
+    def init_poolmanager(
+        self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs
+    ):
+        # save these values for pickling, same as HTTPAdapter
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = CountingPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs
+        )
+
+    def connection_stats(self):
+        return self.poolmanager.connection_stats()
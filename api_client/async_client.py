@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+
+import aiohttp
+from requests.exceptions import RetryError
+from urllib3 import HTTPResponse
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from api_client import (
+    BACKOFF_FACTOR,
+    POOL_MAXSIZE,
+    REQUEST_TIMEOUT,
+    RETRY_CODES,
+    RETRY_TIMES,
+    TruncatedBody,
+    response_log_fields,
+)
+from api_client.rate_limit import JitteredRetry
+
+"""
+asyncio counterpart of BaseAPITClient
+
+Retries are driven by the same urllib3 Retry object the blocking client mounts
+on its adapter, so the allowed methods, backoff schedule and Retry-After
+handling stay identical between the two clients
+"""
+
+MAX_CONNECTIONS = 100  # connections across all hosts
+CONCURRENCY_LIMIT = 50  # default in-flight coroutines for gather()
+
+
+class AsyncResponse(object):
+    """
+    Fully read response, exposing the parts of requests.Response callers use
+    """
+
+    def __init__(self, method, url, status_code, headers, content, elapsed, encoding=None):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self, **kwargs):
+        # Decoded with the response charset, like requests does when it has one
+        return json.loads(self.text, **kwargs)
+
+    def __repr__(self):
+        return f"<AsyncResponse [{self.status_code}]>"
+
+
+class AsyncBaseAPIClient(object):
+
+    def __init__(
+        self,
+        limit=MAX_CONNECTIONS,
+        limit_per_host=POOL_MAXSIZE,
+        timeout=REQUEST_TIMEOUT,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    def log_response(self, response, verbose=True):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        fields = response_log_fields(response, response.method)
+        self.logger.debug(
+            "Response %(method)s %(url)s <%(status_code)s> in %(elapsed_ms)sms, request id: %(request_id)s",
+            fields,
+            extra=fields,
+        )
+        if verbose:
+            self.logger.debug("Response content: %s", TruncatedBody(response.content), extra=fields)
+
+    async def post(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return await self.request("POST", resource, api_key, api_id, verbose, **kwargs)
+
+    async def get(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return await self.request("GET", resource, api_key, api_id, verbose, **kwargs)
+
+    async def put(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return await self.request("PUT", resource, api_key, api_id, verbose, **kwargs)
+
+    async def patch(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return await self.request("PATCH", resource, api_key, api_id, verbose, **kwargs)
+
+    async def delete(self, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        return await self.request("DELETE", resource, api_key, api_id, verbose, **kwargs)
+
+    async def request(self, method, resource: str, api_key=None, api_id=None, verbose=True, **kwargs):
+        headers = {}
+        if api_key is not None:
+            headers["X-API-Key"] = api_key
+        if api_id is not None:
+            headers["X-API-ID"] = api_id
+        if headers:
+            if "headers" in kwargs:
+                kwargs["headers"].update(headers)
+            else:
+                kwargs["headers"] = headers
+        self.logger.debug("Making %s %s", method, resource)
+        response = await self._send_with_retries(method, resource, **kwargs)
+        self.log_response(response, verbose)
+        return response
+
+    async def gather(self, coroutines, limit=CONCURRENCY_LIMIT, return_exceptions=False):
+        """
+        Await an iterable of coroutines with at most `limit` running at once.
+        Results come back in input order, like asyncio.gather. The iterable is
+        consumed lazily so generators of any length can be passed in.
+        """
+        coroutines = iter(coroutines)
+        results = {}
+        next_index = 0
+
+        async def worker():
+            nonlocal next_index
+            for coroutine in coroutines:
+                index = next_index
+                next_index += 1
+                try:
+                    results[index] = await coroutine
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[index] = e
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+        try:
+            await asyncio.gather(*workers)
+        except Exception:
+            for task in workers:
+                task.cancel()
+            # Close whatever the workers did not get to, so nothing is left
+            # un-awaited
+            for coroutine in coroutines:
+                coroutine.close()
+            raise
+        return [results[index] for index in range(next_index)]
+
+    def client_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _send_with_retries(self, method, resource, **kwargs):
+        retries = JitteredRetry(
+            total=RETRY_TIMES,
+            backoff_factor=BACKOFF_FACTOR,
+            status_forcelist=RETRY_CODES,
+        )
+        session = self.client_session()
+
+        while True:
+            start_time = time.monotonic()
+            try:
+                async with session.request(method, resource, **kwargs) as raw:
+                    content = await raw.read()
+                    response = AsyncResponse(
+                        method,
+                        str(raw.url),
+                        raw.status,
+                        raw.headers,
+                        content,
+                        timedelta(seconds=time.monotonic() - start_time),
+                        raw.charset,
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Refused connections are retried for every method, anything
+                # that may have reached the server only for idempotent ones
+                if not isinstance(e, aiohttp.ClientConnectorError) and (
+                    method.upper() not in retries.allowed_methods
+                ):
+                    raise
+                try:
+                    retries = retries.increment(method, resource, error=e)
+                except MaxRetryError:
+                    raise e
+                await asyncio.sleep(retries.get_backoff_time())
+                continue
+
+            retry_after = response.headers.get("Retry-After")
+            if not retries.is_retry(method, response.status_code, retry_after is not None):
+                return response
+
+            try:
+                retries = retries.increment(
+                    method,
+                    resource,
+                    response=HTTPResponse(
+                        headers=dict(response.headers),
+                        status=response.status_code,
+                        preload_content=False,
+                    ),
+                )
+            except MaxRetryError as e:
+                raise RetryError(e)
+            self.logger.debug(
+                "Retrying %s %s after status %s", method, resource, response.status_code
+            )
+            if retry_after is not None and response.status_code in Retry.RETRY_AFTER_STATUS_CODES:
+                await asyncio.sleep(retries.parse_retry_after(retry_after))
+            else:
+                await asyncio.sleep(retries.get_backoff_time())
@@ -0,0 +1,79 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from api_client.rate_limit import TokenBucket
+
+"""
+Run many requests through one BaseAPITClient on a thread pool
+
+Specs are pulled from the input lazily and only a bounded number of requests
+is in flight at once, so memory stays flat no matter how long the input is
+"""
+
+BatchResult = namedtuple("BatchResult", ["index", "request", "response", "error"])
+
+VERBS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+IN_FLIGHT_PER_WORKER = 2  # queued specs per worker so threads never sit idle
+
+
+class RequestSpec(namedtuple("RequestSpec", ["method", "resource", "kwargs"])):
+    """
+    A single request in a batch. Accepts a url string (GET), a
+    (method, resource) or (method, resource, kwargs) tuple, or a dict with
+    "method"/"resource" keys plus any keyword arguments for the verb method
+    """
+
+    @classmethod
+    def parse(cls, spec):
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, str):
+            return cls("GET", spec, {})
+        if isinstance(spec, dict):
+            kwargs = dict(spec)
+            method = kwargs.pop("method", "GET")
+            resource = kwargs.pop("resource")
+            return cls(method.upper(), resource, kwargs)
+        method, resource, *rest = spec
+        return cls(method.upper(), resource, dict(rest[0]) if rest else {})
+
+
+def run_batch(client, requests, max_workers, rate_limit=None):
+    # A one token bucket spaces request starts evenly instead of bursting
+    throttle = TokenBucket(rate_limit, capacity=1) if rate_limit else None
+
+    def send(index, spec):
+        if throttle is not None:
+            throttle.acquire()
+        try:
+            if spec.method not in VERBS:
+                raise ValueError(f"Unsupported method {spec.method} in batch request {index}")
+            verb = getattr(client, spec.method.lower())
+            return BatchResult(index, spec, verb(spec.resource, **spec.kwargs), None)
+        except Exception as e:
+            return BatchResult(index, spec, None, e)
+
+    specs = enumerate(requests)
+    max_in_flight = max_workers * IN_FLIGHT_PER_WORKER
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-batch")
+    in_flight = set()
+    try:
+        for index, spec in specs:
+            try:
+                spec = RequestSpec.parse(spec)
+            except Exception as e:
+                yield BatchResult(index, spec, None, e)
+                continue
+            in_flight.add(executor.submit(send, index, spec))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Stops queued work if the caller abandons the generator early
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,368 @@
+import base64
+import email.utils
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+"""
+Opt-in cache for BaseAPITClient.get
+
+Entries live in a size bounded in-memory LRU and, when a directory is given,
+are written through to disk so they survive restarts. Disk entries are JSON
+(body base64 encoded), never pickle, so a shared cache directory cannot run
+code, and the least recently used ones are removed once the directory holds
+more than its entry or byte limit. Freshness follows the
+server's Cache-Control/Expires headers; stale entries carrying an ETag or
+Last-Modified are revalidated with a conditional GET so an unchanged resource
+costs a 304 instead of the full payload
+"""
+
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_DISK_ENTRIES = 4096
+CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+CACHE_KEY_HEADERS = ("X-API-Key", "X-API-ID", "Authorization")
+CACHEABLE_STATUS_CODES = (200, 203, 300, 301, 410)
+
+
+class CacheEntry(object):
+
+    def __init__(self, url, status_code, headers, content, encoding, expires_at, vary=None, reason=None):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = dict(headers)
+        self.content = content
+        self.encoding = encoding
+        self.expires_at = expires_at
+        self.vary = vary or {}
+
+    @property
+    def etag(self):
+        return self.headers.get("ETag")
+
+    @property
+    def last_modified(self):
+        return self.headers.get("Last-Modified")
+
+    def is_fresh(self, now=None):
+        return self.expires_at is not None and (now or time.time()) < self.expires_at
+
+    def matches_vary(self, request_headers):
+        return all(
+            request_headers.get(name) == value for name, value in self.vary.items()
+        )
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.encoding = self.encoding
+        response.url = self.url
+        response.reason = self.reason
+        response.elapsed = timedelta(0)
+        response.request = requests.PreparedRequest()
+        response.request.prepare_method("GET")
+        response.request.url = self.url
+        return response
+
+    def to_json(self):
+        return json.dumps({
+            "url": self.url,
+            "status_code": self.status_code,
+            "reason": self.reason,
+            "headers": self.headers,
+            "content": base64.b64encode(self.content or b"").decode("ascii"),
+            "encoding": self.encoding,
+            "expires_at": self.expires_at,
+            "vary": self.vary,
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(
+            data["url"],
+            data["status_code"],
+            data["headers"],
+            base64.b64decode(data["content"]),
+            data["encoding"],
+            data["expires_at"],
+            data["vary"],
+            data["reason"],
+        )
+
+
+def _cache_control(headers):
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def expiry_for(headers, default_ttl=None, now=None):
+    """
+    Absolute expiry time for a response, None when it must not be stored and
+    `now` when it may be stored but has to be revalidated before each use
+    """
+    now = now or time.time()
+    directives = _cache_control(headers)
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return now
+
+    age = headers.get("Age", "0")
+    age = int(age) if age.isdigit() else 0
+    for name in ("s-maxage", "max-age"):
+        if re.fullmatch(r"\d+", directives.get(name, "")):
+            return now + int(directives[name]) - age
+
+    if "Expires" in headers:
+        expires = email.utils.parsedate_tz(headers["Expires"])
+        return email.utils.mktime_tz(expires) if expires else now
+    if default_ttl:
+        return now + default_ttl
+    if "ETag" in headers or "Last-Modified" in headers:
+        return now
+    return None
+
+
+class ResponseCache(object):
+
+    def __init__(
+        self,
+        max_entries=CACHE_MAX_ENTRIES,
+        directory=None,
+        default_ttl=None,
+        max_disk_entries=CACHE_MAX_DISK_ENTRIES,
+        max_disk_bytes=CACHE_MAX_DISK_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        # Estimates between scans, other processes may share the directory
+        self._disk_entries = 0
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_entries, self._disk_bytes = self._disk_usage()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+            }
+
+    @staticmethod
+    def key(resource, params=None, headers=None):
+        request = requests.PreparedRequest()
+        request.prepare_url(resource, params)
+        key = hashlib.sha256(request.url.encode())
+        headers = CaseInsensitiveDict(headers or {})
+        for name in CACHE_KEY_HEADERS:
+            key.update(f"\n{name}:{headers.get(name, '')}".encode())
+        return key.hexdigest()
+
+    def lookup(self, key, request_headers=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.directory:
+            entry = self._read_from_disk(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None and not entry.matches_vary(CaseInsensitiveDict(request_headers or {})):
+            return None
+        return entry
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def store(self, key, response, request_headers=None):
+        """
+        Cache a response if its status and headers allow it. Returns the
+        stored entry or None
+        """
+        if response.status_code not in CACHEABLE_STATUS_CODES:
+            return None
+        expires_at = expiry_for(response.headers, self.default_ttl)
+        if expires_at is None:
+            return None
+        request_headers = CaseInsensitiveDict(request_headers or {})
+        vary = {
+            name.strip(): request_headers.get(name.strip())
+            for name in response.headers.get("Vary", "").split(",")
+            if name.strip()
+        }
+        if "*" in vary:
+            return None
+        entry = CacheEntry(
+            response.url,
+            response.status_code,
+            response.headers,
+            response.content,
+            response.encoding,
+            expires_at,
+            vary,
+            response.reason,
+        )
+        self._remember(key, entry)
+        self._write_to_disk(key, entry)
+        return entry
+
+    def revalidated(self, key, entry, not_modified_response):
+        """
+        Refresh an entry after a 304, taking any updated validators and
+        freshness headers from the response
+        """
+        entry.headers.update(not_modified_response.headers)
+        entry.expires_at = expiry_for(entry.headers, self.default_ttl)
+        with self._lock:
+            self.revalidations += 1
+        self._remember(key, entry)
+        self._write_to_disk(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".cache"):
+                    os.remove(os.path.join(self.directory, name))
+            with self._lock:
+                self._disk_entries = 0
+                self._disk_bytes = 0
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f"{key}.cache")
+
+    def _read_from_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path) as file:
+                entry = CacheEntry.from_json(file.read())
+        except OSError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            # Unreadable or written by an older version, fetched again
+            return None
+        try:
+            # Reads count as use for least recently used eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_to_disk(self, key, entry):
+        if not self.directory:
+            return
+        path = self._disk_path(key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = None
+        data = entry.to_json().encode("utf-8")
+        # Write then rename so a concurrent reader never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_entries += 1 if replaced is None else 0
+            self._disk_bytes += len(data) - (replaced or 0)
+            over_limit = (
+                self._disk_entries > self.max_disk_entries
+                or self._disk_bytes > self.max_disk_bytes
+            )
+        if over_limit:
+            self._prune_disk()
+
+    def _disk_files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".cache"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _disk_usage(self):
+        files = self._disk_files()
+        return len(files), sum(size for _, size, _ in files)
+
+    def _prune_disk(self):
+        """
+        Remove the least recently used files until the directory is back
+        under both limits
+        """
+        files = sorted(self._disk_files())
+        entries = len(files)
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if entries <= self.max_disk_entries and total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            entries -= 1
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_entries = entries
+            self._disk_bytes = total
+            self.disk_evictions += evicted
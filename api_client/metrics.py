@@ -0,0 +1,264 @@
+import bisect
+import json
+import re
+import threading
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+"""
+Per-request timing for BaseAPITClient
+
+While the client is sending a request it keeps a dict in a thread local that
+the pooled connections in api_client.adapters fill in with DNS, connect, TLS
+and time-to-first-byte. The finished RequestMetrics record is handed to every
+configured sink
+"""
+
+_request_timings = threading.local()
+
+RequestMetrics = namedtuple(
+    "RequestMetrics",
+    [
+        "method",
+        "url",
+        "endpoint",
+        "status_code",
+        "dns_ms",
+        "connect_ms",
+        "tls_ms",
+        "ttfb_ms",
+        "total_ms",
+        "bytes_out",
+        "bytes_in",
+        "retries",
+        "reused_connection",
+        "error",
+    ],
+)
+
+# Upper bounds in milliseconds, the last bucket catches everything above
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+PERCENTILES = (50, 90, 99)
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,}|[0-9a-fA-F]{8,})$")
+
+
+def start_request_timings():
+    _request_timings.current = {}
+    return _request_timings.current
+
+
+def current_timings():
+    return getattr(_request_timings, "current", None)
+
+
+def finish_request_timings():
+    timings = current_timings()
+    _request_timings.current = None
+    return timings or {}
+
+
+def endpoint_for(method, url):
+    """
+    METHOD host/path with numeric and hex id segments collapsed to {id}, so
+    per-endpoint stats do not grow with every resource id
+    """
+    parts = urlsplit(url)
+    path = "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in parts.path.split("/")
+    )
+    return f"{method} {parts.netloc}{path}"
+
+
+def build_metrics(method, url, timings, total_ms, response=None, error=None):
+    raw = getattr(response, "raw", None)
+    retries = getattr(raw, "retries", None)
+    bytes_in = 0
+    if raw is not None and hasattr(raw, "tell"):
+        bytes_in = raw.tell()
+    return RequestMetrics(
+        method=method,
+        url=url,
+        endpoint=endpoint_for(method, url),
+        status_code=getattr(response, "status_code", None),
+        dns_ms=round(timings.get("dns_ms", 0.0), 3),
+        connect_ms=round(timings.get("connect_ms", 0.0), 3),
+        tls_ms=round(timings.get("tls_ms", 0.0), 3),
+        ttfb_ms=round(timings.get("ttfb_ms", 0.0), 3),
+        total_ms=round(total_ms, 3),
+        bytes_out=timings.get("bytes_out", 0),
+        bytes_in=bytes_in,
+        retries=len(retries.history) if retries is not None else 0,
+        reused_connection=timings.get("reused_connection"),
+        error=None if error is None else repr(error),
+    )
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent):
+        """
+        Estimate by linear interpolation inside the bucket holding the rank
+        """
+        if not self.count:
+            return None
+        rank = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1] * 2
+                return round(lower + (upper - lower) * (rank - seen) / bucket_count, 3)
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class _EndpointStats(object):
+
+    def __init__(self):
+        self.total = Histogram()
+        self.ttfb = Histogram()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.errors = 0
+        self.reused_connections = 0
+
+
+class HistogramSink(object):
+    """
+    In-process latency histograms per endpoint
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        with self._lock:
+            stats = self._endpoints.get(metrics.endpoint)
+            if stats is None:
+                stats = self._endpoints[metrics.endpoint] = _EndpointStats()
+            stats.total.observe(metrics.total_ms)
+            if metrics.status_code is not None:
+                stats.ttfb.observe(metrics.ttfb_ms)
+            stats.bytes_in += metrics.bytes_in
+            stats.bytes_out += metrics.bytes_out
+            stats.retries += metrics.retries
+            stats.errors += metrics.error is not None
+            stats.reused_connections += bool(metrics.reused_connection)
+
+    def summary(self):
+        """
+        Request count, latency percentiles, bytes, retries and connection reuse
+        for every endpoint seen so far
+        """
+        summary = {}
+        with self._lock:
+            for endpoint, stats in self._endpoints.items():
+                entry = {
+                    "requests": stats.total.count,
+                    "errors": stats.errors,
+                    "retries": stats.retries,
+                    "reused_connections": stats.reused_connections,
+                    "bytes_in": stats.bytes_in,
+                    "bytes_out": stats.bytes_out,
+                }
+                for percent in PERCENTILES:
+                    entry[f"total_p{percent}_ms"] = stats.total.percentile(percent)
+                    entry[f"ttfb_p{percent}_ms"] = stats.ttfb.percentile(percent)
+                summary[endpoint] = entry
+        return summary
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            endpoints = list(self._endpoints.items())
+            for name in ("total", "ttfb"):
+                metric = f"api_client_request_{name}_milliseconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for endpoint, stats in endpoints:
+                    histogram = getattr(stats, name)
+                    label = _prometheus_label(endpoint)
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{metric}_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{endpoint="{label}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{endpoint="{label}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{endpoint="{label}"}} {histogram.count}')
+            for name in ("bytes_in", "bytes_out", "retries", "errors", "reused_connections"):
+                metric = f"api_client_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for endpoint, stats in endpoints:
+                    lines.append(f'{metric}{{endpoint="{_prometheus_label(endpoint)}"}} {getattr(stats, name)}')
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class PrometheusExporter(object):
+    """
+    Serves a HistogramSink in Prometheus text format on a local port
+    """
+
+    def __init__(self, histograms=None, port=9464, host="127.0.0.1"):
+        self.histograms = histograms or HistogramSink()
+        histograms = self.histograms
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = histograms.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="api-client-metrics", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, metrics):
+        self.histograms.record(metrics)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JsonLinesSink(object):
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        line = json.dumps(metrics._asdict())
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
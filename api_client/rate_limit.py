@@ -0,0 +1,242 @@
+import hashlib
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.exceptions import RetryError
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+"""
+Client side throttling for BaseAPITClient
+
+A RateLimiter keeps a token bucket and an adaptive concurrency window per
+(host, api key). The bucket caps the sustained request rate; the window
+shrinks by half whenever upstream throttles, a 429 or a 503 with
+Retry-After (including answers the retry adapter absorbed), and grows back
+by one slot per window of successful responses. Other 5xx answers are
+server errors, not throttling, and leave the window alone
+"""
+
+# Fingerprint length identifying an API key in stats without showing it
+KEY_FINGERPRINT_LENGTH = 12
+
+
+def is_throttled(status, headers=None):
+    if status == 429:
+        return True
+    return status == 503 and headers is not None and headers.get("Retry-After") is not None
+
+
+class JitteredRetry(Retry):
+    """
+    Retry whose exponential backoff is spread between half and all of the
+    computed delay, so clients throttled at the same moment do not come back
+    in lockstep. Retry-After from the server still takes precedence.
+    """
+
+    def __init__(self, *args, throttled=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Throttled answers retried so far, see is_throttled
+        self.throttled = throttled
+
+    def new(self, **kwargs):
+        kwargs.setdefault("throttled", self.throttled)
+        return super().new(**kwargs)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        throttled = self.throttled
+        if response is not None and is_throttled(response.status, response.headers):
+            throttled += 1
+        try:
+            retries = super().increment(method, url, response, error, _pool, _stacktrace)
+        except MaxRetryError as e:
+            # Read back by RateLimiter.send when the retries ran out
+            e.throttled = throttled
+            raise
+        retries.throttled = throttled
+        return retries
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waits = 0
+        self.total_wait = 0.0
+
+    def acquire(self, tokens=1):
+        """
+        Take `tokens` from the bucket, sleeping until they are available.
+        Returns how long the caller waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the tokens now, even if that drives the balance
+            # negative, so waiting threads queue up in arrival order
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.acquired += 1
+            if wait:
+                self.waits += 1
+                self.total_wait += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class AdaptiveConcurrency(object):
+    """
+    Additive increase / multiplicative decrease limit on in-flight requests
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.throttled = 0
+        self.decreases = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False, throttle_count=1):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += throttle_count
+                self.decreases += 1
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class _HostLimits(object):
+
+    def __init__(self, rate, burst, max_concurrency):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency) if max_concurrency else None
+
+
+class RateLimiter(object):
+    """
+    Shared across threads; one instance can be handed to several clients
+    that talk to the same upstream
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def limits_for(self, resource, api_key=None):
+        key = (urlsplit(resource).netloc, api_key)
+        limits = self._limits.get(key)
+        if limits is None:
+            with self._lock:
+                limits = self._limits.setdefault(
+                    key, _HostLimits(self.rate, self.burst, self.max_concurrency)
+                )
+        return limits
+
+    def send(self, resource, api_key, send_request):
+        """
+        Run `send_request` once a token and a concurrency slot are free for
+        this host and key, then feed the response back into the window
+        """
+        limits = self.limits_for(resource, api_key)
+        if limits.bucket is not None:
+            limits.bucket.acquire()
+        if limits.concurrency is None:
+            return send_request()
+
+        limits.concurrency.acquire()
+        throttle_count = 0
+        try:
+            response = send_request()
+            throttle_count = throttled_responses(response)
+            return response
+        except RetryError as e:
+            # The adapter ran out of retries, on throttling or on server errors
+            throttle_count = throttled_retries(e)
+            raise
+        finally:
+            limits.concurrency.release(throttle_count > 0, throttle_count)
+
+    def stats(self):
+        stats = {}
+        with self._lock:
+            limits = dict(self._limits)
+        for (host, api_key), host_limits in limits.items():
+            entry = {}
+            if host_limits.bucket is not None:
+                bucket = host_limits.bucket
+                entry.update(
+                    requests=bucket.acquired,
+                    rate_limited=bucket.waits,
+                    rate_limit_wait_seconds=round(bucket.total_wait, 3),
+                )
+            if host_limits.concurrency is not None:
+                concurrency = host_limits.concurrency
+                entry.update(
+                    concurrency_limit=int(concurrency.limit),
+                    in_flight=concurrency.in_flight,
+                    throttled_responses=concurrency.throttled,
+                    backoffs=concurrency.decreases,
+                )
+            # Stats end up in logs, the key is only shown as a fingerprint
+            # that still tells every key apart
+            stats[scope_label(host, api_key)] = entry
+        return stats
+
+
+def scope_label(host, api_key=None):
+    if api_key is None:
+        return host
+    fingerprint = hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:KEY_FINGERPRINT_LENGTH]
+    return f"{host} key={fingerprint}"
+
+
+def throttled_responses(response):
+    """
+    Number of throttled answers behind a response, counting the ones urllib3
+    retried before handing the final response back
+    """
+    count = 1 if is_throttled(response.status_code, response.headers) else 0
+    retries = getattr(response.raw, "retries", None)
+    if retries is None:
+        return count
+    if hasattr(retries, "throttled"):
+        return count + retries.throttled
+    # A plain Retry keeps no headers, only a 429 is known to be throttling
+    return count + sum(1 for history in retries.history if history.status == 429)
+
+
+def throttled_retries(retry_error):
+    """
+    Throttled answers behind a RetryError, 0 when it ran out on server errors
+    """
+    reason = retry_error.args[0] if retry_error.args else None
+    return getattr(reason, "throttled", 0)
@@ -0,0 +1,7 @@
+"""
+Offline benchmarks for the page object layer, title extraction and the API client
+
+Run with `python -m benchmarks.run`; see benchmarks/run.py for the options.
+Pages are generated Hulu-like fixtures served from a local static server, the
+API benchmarks hit a local stub, so nothing leaves the machine.
+"""
@@ -0,0 +1,51 @@
+import time
+
+from api_client import BaseAPITClient
+from benchmarks.timing import summarize
+
+"""
+BaseAPITClient throughput against the local stub, one request at a time and
+through batch() on a thread pool
+"""
+
+BATCH_WORKERS = 8
+
+
+def _sequential(client, url, request_count):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(request_count):
+        request_started = time.perf_counter()
+        client.get(url, verbose=False, use_cache=False).raise_for_status()
+        samples.append((time.perf_counter() - request_started) * 1000)
+    elapsed = time.perf_counter() - started
+    result = summarize(samples)
+    result["requests_per_second"] = round(request_count / elapsed, 1)
+    return result
+
+
+def _batch(client, url, request_count, workers):
+    started = time.perf_counter()
+    errors = 0
+    for result in client.batch((url for _ in range(request_count)), max_workers=workers):
+        errors += result.error is not None or result.response.status_code != 200
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": request_count,
+        "workers": workers,
+        "errors": errors,
+        "requests_per_second": round(request_count / elapsed, 1),
+    }
+
+
+def run(base_url, request_count):
+    url = f"{base_url}/items/1"
+    with BaseAPITClient(pool_maxsize=BATCH_WORKERS) as client:
+        sequential = _sequential(client, url, request_count)
+        batch = _batch(client, url, request_count, BATCH_WORKERS)
+        stats = client.connection_stats()
+    return {
+        "sequential": sequential,
+        "batch": batch,
+        "connection_reuse_ratio": round(stats["reused_connections"] / max(stats["requests"], 1), 3),
+    }
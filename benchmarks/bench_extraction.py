@@ -0,0 +1,74 @@
+import json
+
+from bs4 import BeautifulSoup
+
+from benchmarks.fixtures import catalog_file_name, catalog_page
+from benchmarks.timing import measure
+from hulu_bot import title_extraction
+
+"""
+Title extraction time against tile count
+
+live_script is what HuluSession.get_movie_tab_titles runs: one script that
+returns only the alt texts. page_source_strained is the offline path over a
+page_source fetched from the browser, offline_full_parse the original
+page_source + html.parser approach, kept as the baseline
+"""
+
+
+# Runs per size scale down from `repeats` at this many tiles, so 10k-tile
+# parses that take seconds each do not dominate the suite
+REPEATS_REFERENCE_TILES = 100
+MINIMUM_REPEATS = 2
+
+
+def repeats_for(tile_count, repeats):
+    return max(MINIMUM_REPEATS, min(repeats, repeats * REPEATS_REFERENCE_TILES // tile_count))
+
+
+def full_parse_titles(html):
+    soup = BeautifulSoup(html, "html.parser")
+    titles = []
+    for div in soup.find_all("div", class_=title_extraction.TILE_CLASS):
+        titles.append(div.find("img")["alt"].split("for ")[1])
+    return titles
+
+
+def _check(name, titles, tile_count):
+    if len(titles) != tile_count:
+        raise Exception(f"{name} extracted {len(titles)} titles from a page with {tile_count} tiles")
+
+
+def run_offline(tile_counts, repeats):
+    results = {}
+    for tile_count in tile_counts:
+        html = catalog_page(tile_count)
+        _check("offline_strained", title_extraction.extract_titles_from_html(html), tile_count)
+        runs = repeats_for(tile_count, repeats)
+        results[str(tile_count)] = {
+            "html_bytes": len(html.encode("utf-8")),
+            "offline_strained": measure(lambda: title_extraction.extract_titles_from_html(html), runs, warmup=0),
+            "offline_full_parse": measure(lambda: full_parse_titles(html), runs, warmup=0),
+        }
+    return results
+
+
+def run_live(driver, base_url, tile_counts, repeats):
+    results = {}
+    for tile_count in tile_counts:
+        driver.get(f"{base_url}/{catalog_file_name(tile_count)}")
+        titles = title_extraction.extract_titles_live(driver)
+        _check("live_script", titles, tile_count)
+        alts = driver.execute_script(title_extraction.TILE_ALTS_JS, title_extraction.TILE_SELECTOR)
+        results[str(tile_count)] = {
+            # What crosses the wire for each approach
+            "live_script_bytes": len(json.dumps(alts).encode("utf-8")),
+            "page_source_bytes": len(driver.page_source.encode("utf-8")),
+            "live_script": measure(lambda: title_extraction.extract_titles_live(driver), repeats),
+            "page_source_strained": measure(
+                lambda: title_extraction.extract_titles_from_html(driver.page_source),
+                repeats_for(tile_count, repeats),
+                warmup=0,
+            ),
+        }
+    return results
@@ -0,0 +1,65 @@
+from selenium.webdriver.common.by import By
+
+from benchmarks.fixtures import INTERACTION_DELAY_MS
+from benchmarks.timing import measure
+from ui_framework import instrumentation
+from ui_framework.base_selenium_page import SeleniumBasePage
+
+"""
+Latency and WebDriver commands per call of common SeleniumBasePage actions
+
+Waits are measured against elements that change INTERACTION_DELAY_MS (or
+twice that) after the reveal button is pressed, so `overhead_ms` is the time
+spent on top of the page itself
+"""
+
+REVEAL_BUTTON = (By.ID, "reveal")
+MESSAGE = (By.ID, "message")
+COUNTER_BUTTON = (By.ID, "counter-button")
+COUNTER = (By.ID, "counter")
+NAME_INPUT = (By.ID, "name")
+ITEMS = (By.CSS_SELECTOR, "#items .item")
+PRESS_REVEAL_JS = "document.getElementById('reveal').click();"
+
+
+def _commands_per_call(profiler):
+    # No test was started, so everything sits under the None test
+    grouped = profiler.slowest(limit=None, records=profiler.end_test())
+    calls = sum(entry["calls"] for entry in grouped)
+    commands = sum(entry["commands"] for entry in grouped)
+    return round(commands / calls, 2) if calls else None
+
+
+def run(driver, base_url, repeats):
+    page = SeleniumBasePage(driver)
+    driver.get(f"{base_url}/interaction.html")
+
+    def press_reveal():
+        driver.execute_script(PRESS_REVEAL_JS)
+
+    actions = {
+        # name: (action, untimed setup, milliseconds the page itself takes)
+        "wait_for_visible": (lambda: page.wait_for_element_to_be_visible(MESSAGE, 10), press_reveal, INTERACTION_DELAY_MS),
+        "verify_text": (lambda: page.verify_text("Ready", MESSAGE, timeout=10), press_reveal, 2 * INTERACTION_DELAY_MS),
+        "click": (lambda: page.click(COUNTER_BUTTON), None, 0),
+        "get_text": (lambda: page.get_text(COUNTER), None, 0),
+        "get_attribute": (lambda: page.get_attribute_of_element("data-count", COUNTER), None, 0),
+        "clear_and_send_keys": (lambda: page.clear_and_send_keys("benchmark", NAME_INPUT), None, 0),
+        "get_many": (lambda: page.get_many(ITEMS, ["text", "data-index"]), None, 0),
+    }
+
+    results = {}
+    try:
+        for name, (action, setup, page_delay_ms) in actions.items():
+            profiler = instrumentation.ActionProfiler()
+            instrumentation.set_active_profiler(profiler)
+            result = measure(action, repeats, setup=setup)
+            instrumentation.set_active_profiler(None)
+            # Warm-up runs are recorded too, commands per call is an average
+            result["commands_per_call"] = _commands_per_call(profiler)
+            if page_delay_ms:
+                result["overhead_ms"] = round(result["p50_ms"] - page_delay_ms, 3)
+            results[name] = result
+    finally:
+        instrumentation.set_active_profiler(None)
+    return results
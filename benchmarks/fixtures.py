@@ -0,0 +1,139 @@
+import html
+import os
+
+from hulu_bot.title_extraction import TILE_CLASS
+
+"""
+Generated pages for the browser benchmarks
+
+catalog pages mimic a Hulu tab: a navigation bar and carousels of tiles
+whose thumbnail alt reads "Cover art for <title>", padded with the kind of
+markup around each tile that makes page_source large. The interaction page
+has elements that appear, change text and react to clicks after a delay, so
+waits have something to wait for.
+"""
+
+TILE_COUNTS = (100, 1000, 10000)
+TILES_PER_CAROUSEL = 24
+INTERACTION_DELAY_MS = 150
+LIST_ITEMS = 50
+
+CATALOG_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Movies - Catalog {tile_count}</title>
+<style>
+.carousel {{ display: flex; overflow-x: auto; gap: 8px; }}
+.{tile_class} {{ flex: 0 0 180px; }}
+.{tile_class} img {{ width: 180px; height: 100px; background: #223; display: block; }}
+</style></head>
+<body>
+<nav data-testid="global-navigation">
+  <a data-automationid="globalnav-home" href="#">Home</a>
+  <a data-automationid="globalnav-movies" href="#">Movies</a>
+  <a data-automationid="globalnav-my-stuff" href="#">My Stuff</a>
+</nav>
+<main>
+{sections}
+</main>
+</body>
+</html>
+"""
+
+SECTION = """<section id="{section_id}" class="hub-section">
+  <h2 class="hub-section__title">Collection {number}</h2>
+  <div class="carousel" role="list">
+{tiles}
+  </div>
+</section>"""
+
+# A tile with the wrapper and metadata markup a real one carries
+TILE = """    <div class="Tile" role="listitem" data-collection-index="{index}">
+      <a class="Tile__link" href="/movie/{slug}" aria-label="{title}" tabindex="-1">
+        <div class="{tile_class}">
+          <picture><source type="image/webp" srcset="">
+            <img alt="Cover art for {title}" loading="lazy" width="180" height="100">
+          </picture>
+          <div class="Tile__meta"><span class="Tile__rating">TV-14</span><span class="Tile__year">20{year:02d}</span></div>
+        </div>
+      </a>
+    </div>"""
+
+INTERACTION_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Interaction</title></head>
+<body>
+<button id="reveal">Reveal</button>
+<div id="message" style="display: none">Loading</div>
+<button id="counter-button">Add</button>
+<span id="counter" data-count="0">0</span>
+<input id="name" type="text" value="">
+<ul id="items">
+{items}
+</ul>
+<script>
+var delay = {delay};
+document.getElementById("reveal").addEventListener("click", function () {{
+    var message = document.getElementById("message");
+    message.style.display = "none";
+    message.textContent = "Loading";
+    setTimeout(function () {{
+        message.style.display = "block";
+        setTimeout(function () {{ message.textContent = "Ready"; }}, delay);
+    }}, delay);
+}});
+document.getElementById("counter-button").addEventListener("click", function () {{
+    var counter = document.getElementById("counter");
+    var count = parseInt(counter.getAttribute("data-count"), 10) + 1;
+    counter.setAttribute("data-count", count);
+    counter.textContent = count;
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def title_for(index):
+    return f"Movie {index:05d} for the Weekend"
+
+
+def catalog_page(tile_count, tiles_per_carousel=TILES_PER_CAROUSEL):
+    sections = []
+    for start in range(0, tile_count, tiles_per_carousel):
+        tiles = "\n".join(
+            TILE.format(
+                index=index,
+                slug=f"movie-{index:05d}",
+                title=html.escape(title_for(index), quote=True),
+                tile_class=TILE_CLASS,
+                year=index % 25,
+            )
+            for index in range(start, min(start + tiles_per_carousel, tile_count))
+        )
+        number = start // tiles_per_carousel
+        sections.append(SECTION.format(section_id=f"collection-{number}", number=number, tiles=tiles))
+    return CATALOG_PAGE.format(tile_count=tile_count, tile_class=TILE_CLASS, sections="\n".join(sections))
+
+
+def interaction_page():
+    items = "\n".join(f'  <li class="item" data-index="{index}">Item {index}</li>' for index in range(LIST_ITEMS))
+    return INTERACTION_PAGE.format(items=items, delay=INTERACTION_DELAY_MS)
+
+
+def catalog_file_name(tile_count):
+    return f"catalog-{tile_count}.html"
+
+
+def write_fixture_site(directory, tile_counts=TILE_COUNTS):
+    """
+    Write the interaction page and one catalog page per tile count into
+    `directory`, returning {page name: file name}
+    """
+    os.makedirs(directory, exist_ok=True)
+    pages = {"interaction": "interaction.html"}
+    pages.update((f"catalog-{count}", catalog_file_name(count)) for count in tile_counts)
+    for name, file_name in pages.items():
+        content = interaction_page() if name == "interaction" else catalog_page(int(name.split("-")[1]))
+        with open(os.path.join(directory, file_name), "w") as file:
+            file.write(content)
+    return pages
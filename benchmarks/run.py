@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks import bench_api_client, bench_extraction, bench_page_objects
+from benchmarks.fixtures import TILE_COUNTS, write_fixture_site
+from benchmarks.servers import ApiStubServer, StaticSiteServer
+from benchmarks.timing import DEFAULT_REPEATS
+
+"""
+Run the benchmarks, write the results as JSON and check them against
+regression thresholds
+
+    python -m benchmarks.run --output bench_results.json
+
+Browser suites (page, extraction live) need a local Chrome and chromedriver.
+The process exits with 1 when a requested browser suite cannot start, unless
+--allow-browser-skip reports it as skipped instead, and when a metric crosses
+its threshold in benchmarks/thresholds.json, which maps flattened metric
+names to {"max": value} or {"min": value}
+"""
+
+SUITES = ("page", "extraction", "api")
+THRESHOLDS_FILE = os.path.join(os.path.dirname(__file__), "thresholds.json")
+API_REQUESTS = 500
+RESOLUTION = "1920x1080"
+
+
+def start_browser():
+    from selenium import webdriver
+    from ui_framework import configure_chrome
+
+    options = configure_chrome.configure_base_options("benchmarks", RESOLUTION, headless=True)
+    return webdriver.Chrome(options=options)
+
+
+def flatten(results, prefix=""):
+    """
+    {"page": {"click": {"p50_ms": 1}}} -> {"page.click.p50_ms": 1}
+    """
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def check_thresholds(metrics, thresholds):
+    """
+    (regressions, thresholds with no metric to check) for flattened `metrics`
+    """
+    regressions = []
+    unchecked = []
+    for name, limits in thresholds.items():
+        value = metrics.get(name)
+        if value is None:
+            unchecked.append(name)
+            continue
+        if "max" in limits and value > limits["max"]:
+            regressions.append({"metric": name, "value": value, "max": limits["max"]})
+        if "min" in limits and value < limits["min"]:
+            regressions.append({"metric": name, "value": value, "min": limits["min"]})
+    return regressions, unchecked
+
+
+def run(suites=SUITES, repeats=DEFAULT_REPEATS, tile_counts=TILE_COUNTS, api_requests=API_REQUESTS):
+    results = {}
+    skipped = {}
+
+    if "api" in suites:
+        with ApiStubServer() as api_stub:
+            results["api"] = bench_api_client.run(api_stub.url, api_requests)
+
+    if "extraction" in suites:
+        results["extraction"] = {"offline": bench_extraction.run_offline(tile_counts, repeats)}
+
+    browser_suites = [suite for suite in ("page", "extraction") if suite in suites]
+    if browser_suites:
+        try:
+            driver = start_browser()
+        except Exception as e:
+            driver = None
+            for suite in browser_suites:
+                skipped[suite if suite == "page" else "extraction.live"] = f"browser did not start: {e!r}"
+        if driver is not None:
+            with tempfile.TemporaryDirectory(prefix="benchmark-site-") as directory:
+                write_fixture_site(directory, tile_counts)
+                try:
+                    with StaticSiteServer(directory) as site:
+                        if "page" in suites:
+                            results["page"] = bench_page_objects.run(driver, site.url, repeats)
+                        if "extraction" in suites:
+                            results["extraction"]["live"] = bench_extraction.run_live(
+                                driver, site.url, tile_counts, repeats
+                            )
+                finally:
+                    driver.quit()
+    return results, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suites")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--tile-counts", default=",".join(str(count) for count in TILE_COUNTS))
+    parser.add_argument("--api-requests", type=int, default=API_REQUESTS)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--thresholds", default=THRESHOLDS_FILE, help="Pass an empty string to skip the check")
+    parser.add_argument(
+        "--allow-browser-skip",
+        action="store_true",
+        help="Report browser suites as skipped instead of failing when the browser cannot start",
+    )
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(sorted(unknown))}")
+    tile_counts = [int(count) for count in args.tile_counts.split(",")]
+
+    started = time.time()
+    results, skipped = run(suites, args.repeats, tile_counts, args.api_requests)
+    metrics = flatten(results)
+
+    regressions, unchecked = [], []
+    if args.thresholds:
+        with open(args.thresholds) as file:
+            regressions, unchecked = check_thresholds(metrics, json.load(file))
+
+    report = {
+        "started_at": started,
+        "duration_seconds": round(time.time() - started, 3),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "repeats": args.repeats,
+        "results": results,
+        "metrics": metrics,
+        "skipped": skipped,
+        "browser_skip_allowed": args.allow_browser_skip,
+        "regressions": regressions,
+        "unchecked_thresholds": unchecked,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    for name, reason in skipped.items():
+        print(f"{'skipped' if args.allow_browser_skip else 'FAILED'} {name}: {reason}")
+    for regression in regressions:
+        limit = f"max {regression['max']}" if "max" in regression else f"min {regression['min']}"
+        print(f"REGRESSION {regression['metric']} = {regression['value']} ({limit})")
+    print(f"{len(metrics)} metrics written to {args.output}, {len(regressions)} regressions")
+    if skipped and not args.allow_browser_skip:
+        print("Browser suites could not run, pass --allow-browser-skip to report them as skipped")
+        return 1
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import functools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+Local servers the benchmarks run against
+"""
+
+
+class _BackgroundServer(object):
+
+    def __init__(self, handler, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _QuietStaticHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, with Nagle on a keep-alive
+    # client waits for the delayed ACK (~40ms) on every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StaticSiteServer(_BackgroundServer):
+    """
+    Serves the files in `directory`, with keep-alive like a real site
+    """
+
+    def __init__(self, directory, host="127.0.0.1", port=0):
+        super().__init__(functools.partial(_QuietStaticHandler, directory=directory), host, port)
+
+
+class _ApiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps({"path": self.path, "method": self.command, "items": list(range(20))}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiStubServer(_BackgroundServer):
+    """
+    Answers every request with a small JSON document
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__(_ApiStubHandler, host, port)
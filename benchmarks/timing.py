@@ -0,0 +1,44 @@
+import statistics
+import time
+
+"""
+Repeat-and-summarize helper shared by the benchmark modules
+"""
+
+DEFAULT_REPEATS = 20
+WARMUP_RUNS = 1
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples_ms):
+    samples_ms = sorted(samples_ms)
+    return {
+        "runs": len(samples_ms),
+        "min_ms": round(samples_ms[0], 3),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p90_ms": round(percentile(samples_ms, 90), 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+    }
+
+
+def measure(function, repeats=DEFAULT_REPEATS, setup=None, warmup=WARMUP_RUNS):
+    """
+    Time `function` `repeats` times after `warmup` untimed runs, calling
+    `setup` untimed before each run. Returns summarize() of the samples
+    """
+    samples = []
+    for run in range(warmup + repeats):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if run >= warmup:
+            samples.append(elapsed_ms)
+    return summarize(samples)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Keep undetected-chromedriver's patched driver between runs
+
+Without help, every uc.Chrome() works out the installed Chrome version,
+fetches a matching chromedriver and patches it before the browser starts.
+DriverCache keeps a copy of the patched binary per Chrome major version
+along with its sha256. A warm start hands uc.Chrome the cached binary and
+the version, so launching is the only work left. The installed Chrome's
+version is remembered too and only asked for again when the Chrome binary
+changes on disk. The cached binary's sha256 is checked the first time a
+process uses it.
+"""
+
+DRIVER_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".hulu_bot", "chromedriver")
+MANIFEST_FILE = "manifest.json"
+_VERSION = re.compile(r"(\d+)\.(\d+)\.(\d+)\.(\d+)")
+# Manifest entries whose binary matched its sha256 in this process
+_VERIFIED_ENTRIES = set()
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class DriverCache(object):
+
+    def __init__(self, directory=DRIVER_CACHE_DIRECTORY, chrome_executable=None):
+        self.directory = directory
+        self.chrome_executable = chrome_executable
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {"chrome": {}, "drivers": {}}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temporary_path, self.manifest_path)
+
+    def chrome_path(self):
+        if self.chrome_executable is None:
+            import undetected_chromedriver as uc
+
+            self.chrome_executable = uc.find_chrome_executable()
+        return self.chrome_executable
+
+    def chrome_version(self, manifest=None, timings=None):
+        """
+        Full version of the installed Chrome, from the manifest while the
+        binary is unchanged and from `chrome --version` otherwise. The time it
+        took goes into `timings` as chrome_version_ms
+        """
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        manifest = manifest or self._read_manifest()
+        path = self.chrome_path()
+        if not path:
+            return None
+        fingerprint = _fingerprint(path)
+        known = manifest["chrome"].get(path)
+        if known and all(known.get(key) == value for key, value in fingerprint.items()):
+            timings["chrome_version_ms"] = _elapsed_ms(started)
+            return known["version"]
+
+        output = subprocess.run(
+            [path, "--version"], capture_output=True, text=True, timeout=30
+        ).stdout
+        match = _VERSION.search(output)
+        version = match.group(0) if match else None
+        if version:
+            manifest["chrome"][path] = dict(fingerprint, version=version)
+            self._write_manifest(manifest)
+        timings["chrome_version_ms"] = _elapsed_ms(started)
+        return version
+
+    def lookup(self, verify=True):
+        """
+        (path to the cached patched driver, Chrome major version, timings), or
+        (None, major version, timings) when nothing usable is cached. A cached
+        driver is used only while its size and mtime match the manifest and,
+        the first time this process looks it up, its sha256 does too.
+        verify=False skips the sha256 check
+        """
+        started = time.perf_counter()
+        timings = {}
+        manifest = self._read_manifest()
+        version = self.chrome_version(manifest, timings)
+        major = int(version.split(".")[0]) if version else None
+        entry = manifest["drivers"].get(str(major))
+        path = None
+        if entry and os.path.exists(entry["path"]):
+            fingerprint = _fingerprint(entry["path"])
+            unchanged = all(entry.get(key) == value for key, value in fingerprint.items())
+            key = (entry["path"], entry["sha256"], fingerprint["size"], fingerprint["mtime_ns"])
+            if unchanged and (not verify or key in _VERIFIED_ENTRIES or _sha256(entry["path"]) == entry["sha256"]):
+                if verify:
+                    _VERIFIED_ENTRIES.add(key)
+                path = entry["path"]
+            else:
+                LOGGER.warning(f"Cached chromedriver {entry['path']} changed on disk, not using it")
+        timings["driver_lookup_ms"] = _elapsed_ms(started)
+        return path, major, timings
+
+    def launch_copy(self, path):
+        """
+        (a per-launch hard link to the cached driver, timings), uc may delete
+        or rename the binary it was given when the browser quits
+        """
+        started = time.perf_counter()
+        launch_directory = tempfile.mkdtemp(prefix="chromedriver-")
+        launch_path = os.path.join(launch_directory, os.path.basename(path))
+        try:
+            os.link(path, launch_path)
+        except OSError:
+            shutil.copy2(path, launch_path)
+        return launch_path, {"driver_link_ms": _elapsed_ms(started)}
+
+    def store(self, patched_driver_path, major):
+        """
+        Copy the driver uc just patched into the cache for Chrome `major`
+        Returns (path of the cached copy, timings)
+        """
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        target = os.path.join(self.directory, f"chromedriver-{major}{os.path.splitext(patched_driver_path)[1]}")
+        temporary_path = f"{target}.{os.getpid()}.tmp"
+        shutil.copy2(patched_driver_path, temporary_path)
+        os.replace(temporary_path, target)
+        manifest = self._read_manifest()
+        manifest["drivers"][str(major)] = dict(
+            _fingerprint(target), path=target, sha256=_sha256(target), stored_at=time.time()
+        )
+        self._write_manifest(manifest)
+        return target, {"driver_store_ms": _elapsed_ms(started)}
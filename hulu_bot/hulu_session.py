@@ -1,29 +1,125 @@
 from selenium.webdriver import DesiredCapabilities
 
 from page_models import page_hulu
+from hulu_bot import title_extraction
+from hulu_bot.title_store import TitleStore
+from hulu_bot.session_state import SessionStateStore
+from hulu_bot.driver_cache import DriverCache
+from ui_framework import resource_blocking
+from hulu_bot.json_capture import COLLECTION_URL_PATTERN, NetworkCapture, unique_entities
 from selenium import webdriver
-from bs4 import BeautifulSoup
 from selenium.webdriver.chrome.options import Options
 import undetected_chromedriver as uc
+import os
+import shutil
+import time
 
 """
 Use a combination of selenium and beautifulsoup to log into your hulu account and 
 """
 HOME_URL = "https://auth.hulu.com/web/login"
+HUB_URL = "https://www.hulu.com/hub/home"
+# How long a restored session gets to show the logged in navigation
+SESSION_CHECK_SECONDS = 15
+
+# Harvest targets: tab to open and, optionally, the section on it to harvest
+HARVEST_TARGETS = {
+    "movies": ("movies_tab", None),
+    "my_stuff": ("my_stuff_tab", None),
+    "tv_for_you": ("home_tab", "tv_for_you_section"),
+}
+HARVEST_MAX_ROUNDS = 200
+# Rounds in a row without new tiles before a harvest is considered complete
+HARVEST_IDLE_ROUNDS = 2
+HARVEST_SETTLE_SECONDS = 3  # how long each round waits for new tiles to render
+# How long a freshly opened tab gets to render its first tile
+HARVEST_LOAD_SECONDS = 30
+# Titles are read from img[alt] and DOM text, so "text-only" is enough for a harvest,
+# but blocking stays off by default until a preset has been checked against the live site
+DEFAULT_BLOCKING_PRESET = "none"
+# Hulu artwork is served without a file extension
+HULU_ARTWORK_PATTERNS = ("*://img*.hulu.com/*",)
+# How long a capture waits for the content API after opening a tab
+JSON_CAPTURE_SECONDS = 15
 
 class HuluSession:
-    def __init__(self):
+    def __init__(self, title_store=None, user_data_dir=None, session_states=None, driver_cache=None, warm_start=True,
+                 block_resources=DEFAULT_BLOCKING_PRESET, report_network=False,
+                 capture_json=False, capture_url_pattern=COLLECTION_URL_PATTERN):
+        started = time.perf_counter()
 
         options = uc.ChromeOptions()
         options.add_argument("--start-maximized")
         options.add_argument('--no-first-run --no-service-autorun --password-store=basic')
         options.add_argument("--lang=en-GB")
+        if report_network or capture_json:
+            # Read back by network_report() and the JSON capture
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
         print("Getting ChromeDriver ...")
         """
         Use undetected-chromedirver
+        A warm start reuses the patched driver cached for the installed Chrome version
         """
-        self.driver = uc.Chrome(options=options)
+        self.driver_cache = driver_cache or DriverCache()
+        # The cache may be shared by several sessions, so phase timings are kept here
+        timings = {}
+        cached_driver, chrome_major = None, None
+        if warm_start:
+            cached_driver, chrome_major, lookup_timings = self.driver_cache.lookup()
+            timings.update(lookup_timings)
+        self._driver_launch_directory = None
+        if cached_driver:
+            cached_driver, link_timings = self.driver_cache.launch_copy(cached_driver)
+            timings.update(link_timings)
+            self._driver_launch_directory = os.path.dirname(cached_driver)
+
+        # A user_data_dir keeps the whole Chrome profile, login included, between runs
+        self.user_data_dir = user_data_dir
+        launch_started = time.perf_counter()
+        self.driver = uc.Chrome(
+            options=options,
+            user_data_dir=user_data_dir,
+            driver_executable_path=cached_driver,
+            version_main=chrome_major,
+        )
+        timings["launch_ms"] = round((time.perf_counter() - launch_started) * 1000, 3)
+        patched_driver = getattr(getattr(self.driver, "patcher", None), "executable_path", None)
+        if warm_start and not cached_driver and chrome_major and patched_driver:
+            _, store_timings = self.driver_cache.store(patched_driver, chrome_major)
+            timings.update(store_timings)
+
+        self.blocked_patterns = []
+        if block_resources != "none":
+            extra_patterns = ()
+            if "image" in resource_blocking.blocked_types(block_resources):
+                extra_patterns = HULU_ARTWORK_PATTERNS
+            self.blocked_patterns = resource_blocking.apply_blocking(
+                self.driver, block_resources, extra_patterns
+            )
+
+        if report_network:
+            resource_blocking.start_network_report(self.driver)
+        self.network_capture = None
+        if capture_json:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.network_capture = NetworkCapture(self.driver, capture_url_pattern)
+        # Entities seen by the JSON capture, by id
+        self.captured_entities = {}
+
         self.hulu_page = page_hulu.HuluPage(self.driver)
+        # An empty store is falsy, so test for None
+        self.title_store = title_store if title_store is not None else TitleStore()
+        self.session_states = session_states or SessionStateStore()
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        self.startup_timings = dict(timings, warm=bool(cached_driver))
+        print(f"Browser started: {self.startup_report()}")
+
+    def startup_report(self):
+        timings = self.startup_timings
+        phases = ", ".join(
+            f"{name[:-3]} {value:.0f}ms" for name, value in timings.items() if name.endswith("_ms")
+        )
+        return f"{'warm' if timings['warm'] else 'cold'} start, {phases}"
 
     def login(self, username, password, profile_name):
         self.driver.get(HOME_URL)
@@ -34,6 +130,56 @@ class HuluSession:
         self.hulu_page.wait_for_element_to_be_invisible(self.hulu_page.login_message)
         self.hulu_page.click(self.hulu_page.get_watching_profile(profile_name))
 
+    """
+    Reuse the saved session for this account and profile, or the Chrome profile
+    in user_data_dir, and only walk through login() when it is rejected
+    Returns True when the saved session was reused
+    """
+    def resume_or_login(self, username, password, profile_name):
+        # Other workers on this account wait here and then resume what we saved
+        with self.session_states.lock(username, profile_name):
+            if self.resume_session(username, profile_name):
+                return True
+            self.login(username, password, profile_name)
+            self.hulu_page.wait_for_element_to_be_visible(self.hulu_page.global_nav)
+            self.session_states.save(self.driver, username, profile_name)
+            return False
+
+    def resume_session(self, username, profile_name):
+        state = self.session_states.load(username, profile_name)
+        if state is None and self.user_data_dir is None:
+            return False
+        try:
+            if state is not None:
+                self.session_states.restore(self.driver, state)
+            else:
+                self.driver.get(HUB_URL)
+            if self._logged_in(profile_name):
+                return True
+        except Exception as e:
+            print(f"Saved session could not be restored: {e!r}")
+        # Rejected, do not try it again on the next run
+        self.session_states.discard(username, profile_name)
+        return False
+
+    def _logged_in(self, profile_name):
+        try:
+            self.hulu_page.wait_for_element_to_be_visible(
+                self.hulu_page.global_nav, SESSION_CHECK_SECONDS
+            )
+            return True
+        except Exception:
+            pass
+        # Still logged in, but Hulu asks who is watching
+        profile = self.hulu_page.get_watching_profile(profile_name)
+        if not self.hulu_page.find_elements_by(*profile):
+            return False
+        self.hulu_page.click(profile)
+        self.hulu_page.wait_for_element_to_be_visible(
+            self.hulu_page.global_nav, SESSION_CHECK_SECONDS
+        )
+        return True
+
     """
     Pass in which tab you want to go to in the session prior to scraping titles
     All tabs are stored in the hulu page model under the Tabs section
@@ -45,25 +191,135 @@ class HuluSession:
         self.hulu_page.wait_for_element_to_be_visible(self.hulu_page.for_you)
         self.hulu_page.wait_for_element_to_be_visible(self.hulu_page.popular)
 
+    def navigate_to_tab(self, tab_locator):
+        self.hulu_page.wait_for_element_to_be_visible(self.hulu_page.global_nav)
+        self.hulu_page.click(tab_locator)
+
     """
-    Use Beautiful Soup to collect the titles
-    Check titles.txt to see if title already exists
-    If not, write title to file
+    Open one of the HARVEST_TARGETS and harvest all of its titles
+    Returns the titles that were not in the title store yet
     """
-    def get_movie_tab_titles(self):
-        html = self.driver.page_source
-        soup = BeautifulSoup(html, "html.parser")
+    def harvest(self, target):
+        return self.title_store.record(self.collect(target))
+
+    """
+    Open one of the HARVEST_TARGETS and return all of its titles without recording them
+    """
+    def collect(self, target):
+        tab, section = HARVEST_TARGETS[target]
+        section_locator = getattr(self.hulu_page, section) if section else None
+        # Payloads cover a whole tab, they cannot be narrowed down to one section
+        if self.network_capture is not None and section_locator is None:
+            entities = self.capture_entities(target)
+            if entities:
+                return [entity["title"] for entity in entities]
+            print(f"No content API payloads for {target}, reading titles from the page")
+        else:
+            self.navigate_to_tab(getattr(self.hulu_page, tab))
+        return self.collect_titles(section_locator)
+
+    """
+    Open one of the HARVEST_TARGETS and read its entities (id, title, type, metadata)
+    from the content API responses the page loads, without waiting for tiles to render
+    Needs capture_json=True
+    """
+    def capture_entities(self, target, timeout=JSON_CAPTURE_SECONDS):
+        tab, _ = HARVEST_TARGETS[target]
+        self.network_capture.reset()
+        self.navigate_to_tab(getattr(self.hulu_page, tab))
+        entities = unique_entities(self.network_capture.wait_for_payloads(timeout))
+        self.captured_entities.update((entity["id"], entity) for entity in entities)
+        return entities
+
+    """
+    Scroll through the current page, or one section of it, until no new tiles load
+    Waits for the first tile before starting, so a slow load is an error instead of
+    an empty harvest. Each round reads only the tiles not read before, scrolls the
+    last of them in each carousel into view and scrolls down, then waits for new
+    tiles to render
+    Returns the titles that were not in the title store yet
+    """
+    def harvest_titles(self, section_locator=None, **options):
+        return self.title_store.record(self.collect_titles(section_locator, **options))
+
+    def collect_titles(
+        self,
+        section_locator=None,
+        max_rounds=HARVEST_MAX_ROUNDS,
+        idle_rounds=HARVEST_IDLE_ROUNDS,
+        settle_time=HARVEST_SETTLE_SECONDS,
+        load_time=HARVEST_LOAD_SECONDS,
+    ):
+        root_strategy, root_value = section_locator or (None, None)
+        if section_locator is not None:
+            self.hulu_page.wait_for_element_to_be_present(section_locator, load_time)
+            self.hulu_page.scroll_into_center_view(section_locator)
+        try:
+            self.hulu_page.wait_for_count(
+                self.hulu_page.get_tiles(section_locator), minimum=1, timeout=load_time
+            )
+        except TimeoutError:
+            raise Exception(
+                f"No title tiles rendered in {section_locator or 'the page'} after {load_time} seconds"
+            )
+        unharvested_tiles = self.hulu_page.get_unharvested_tiles(section_locator)
         titles = []
-        for div in soup.find_all('div', class_='StandardEmphasisHorizontalTileThumbnail__content'):
-            title = div.find('img')['alt'].split('for ')[1]
-            titles.append(title)
+        idle = 0
+        for _ in range(max_rounds):
+            result = self.driver.execute_script(
+                title_extraction.HARVEST_TILE_ALTS_JS,
+                root_strategy,
+                root_value,
+                page_hulu.TILE_SELECTOR,
+                page_hulu.HARVESTED_ATTRIBUTE,
+                page_hulu.CAROUSEL_EDGE_MARK,
+            )
+            titles.extend(title_extraction.titles_from_alts(result["alts"]))
+            idle = 0 if result["alts"] else idle + 1
+            if idle >= idle_rounds:
+                break
+            # Lazy carousels load their next tiles once the last one is in view
+            for index in range(result["carousels"]):
+                self.hulu_page.scroll_into_view(
+                    *self.hulu_page.get_carousel_edge(index, section_locator)
+                )
+            if section_locator is None:
+                self.hulu_page.scroll_to_bottom()
+            try:
+                self.hulu_page.wait_for_count(
+                    unharvested_tiles, minimum=1, timeout=settle_time
+                )
+            except TimeoutError:
+                pass
+        return titles
 
-        with open('titles.txt', 'w') as file:
-            for title in titles:
-                file.write(title + '\n')
+    """
+    Collect the titles in the browser, only the tile alt texts are sent back
+    Record them in the title store, which keeps when each was first and last seen
+    Returns the titles that were not in the store yet
+    """
+    def get_movie_tab_titles(self):
+        titles = title_extraction.extract_titles_live(
+            self.driver, self.hulu_page.title_tiles[1]
+        )
+        return self.title_store.record(titles)
+
+    """
+    Requests, bytes and blocked requests of the page loaded since the last call
+    Needs report_network=True
+    """
+    def network_report(self):
+        return resource_blocking.network_report(self.driver)
 
+    """
+    Quit the browser and its chromedriver, not just the window, so long lived
+    workers do not leak a browser per session
+    """
     def close(self):
-        self.driver.close()
+        self.driver.quit()
+        self.title_store.close()
+        if self._driver_launch_directory:
+            shutil.rmtree(self._driver_launch_directory, ignore_errors=True)
 
 
 
@@ -0,0 +1,172 @@
+import base64
+import json
+import logging
+import re
+import time
+
+from ui_framework import performance_log
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Titles straight from the JSON Hulu's pages load their tiles from
+
+The browser's performance log (goog:loggingPrefs performance) lists every
+Network.responseReceived. Responses from the content API are read back with
+Network.getResponseBody once they finish loading and walked for entities:
+anything with an id, a known entity type and a name. No rendering or HTML
+is involved, and the entity ids and metadata come along for free.
+
+The walker does not depend on the exact payload layout, which changes
+between API versions; payloads_from_har runs the same parsing over a
+recorded HAR file, see ui_framework.har_replay to serve one to a browser.
+"""
+
+# Responses worth parsing, matched against the full URL
+COLLECTION_URL_PATTERN = re.compile(r"^https?://[^/]*discover\.hulu\.com/content/")
+# Same responses served by a HarReplayServer, which is not on Hulu's host
+REPLAY_COLLECTION_URL_PATTERN = re.compile(r"^https?://[^/]+/content/")
+ENTITY_TYPES = ("movie", "series", "episode", "special")
+TITLE_KEYS = ("name", "title")
+METADATA_KEYS = ("genre_names", "premiere_date", "rating", "duration", "series_name", "description")
+# Seconds without a new matching payload before a capture is considered done
+CAPTURE_QUIET_SECONDS = 1.5
+CAPTURE_POLL_SECONDS = 0.25
+
+
+def _entity(node):
+    entity_type = node.get("type") or node.get("_type")
+    if node.get("id") is None or entity_type not in ENTITY_TYPES:
+        return None
+    title = next((node[key] for key in TITLE_KEYS if isinstance(node.get(key), str) and node[key].strip()), None)
+    if title is None:
+        headline = node.get("visuals", {}).get("headline") if isinstance(node.get("visuals"), dict) else None
+        title = headline.get("text") if isinstance(headline, dict) else None
+    if not title:
+        return None
+    metadata = {key: node[key] for key in METADATA_KEYS if key in node}
+    # Some payloads wrap the details in entity_metadata or metrics_info
+    for nested in ("entity_metadata", "metrics_info"):
+        if isinstance(node.get(nested), dict):
+            metadata.update((key, value) for key, value in node[nested].items() if key in METADATA_KEYS)
+    return {"id": str(node["id"]), "title": title.strip(), "type": entity_type, "metadata": metadata}
+
+
+def entities_from_payload(payload):
+    """
+    Every entity anywhere in a decoded JSON payload, depth first, without
+    descending into entities themselves
+    """
+    entities = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            entity = _entity(node)
+            if entity is not None:
+                entities.append(entity)
+                continue
+            stack.extend(reversed(list(node.values())))
+    return entities
+
+
+def unique_entities(payloads):
+    by_id = {}
+    for payload in payloads:
+        for entity in entities_from_payload(payload):
+            by_id.setdefault(entity["id"], entity)
+    return list(by_id.values())
+
+
+def payloads_from_har(path, url_pattern=COLLECTION_URL_PATTERN):
+    with open(path) as file:
+        har = json.load(file)
+    payloads = []
+    for entry in har["log"]["entries"]:
+        if not url_pattern.search(entry["request"]["url"]):
+            continue
+        content = entry["response"].get("content", {})
+        text = content.get("text")
+        if not text:
+            continue
+        if content.get("encoding") == "base64":
+            text = base64.b64decode(text).decode("utf-8")
+        try:
+            payloads.append(json.loads(text))
+        except ValueError:
+            continue
+    return payloads
+
+
+class NetworkCapture(object):
+
+    def __init__(self, driver, url_pattern=COLLECTION_URL_PATTERN):
+        self.driver = driver
+        self.url_pattern = url_pattern
+        self._log = performance_log.reader(driver)
+        self._pending = {}
+
+    def reset(self):
+        """
+        Forget everything logged so far, call before the navigation to capture
+        """
+        self._log.skip()
+        self._pending = {}
+
+    def poll(self):
+        """
+        (url, payload) for every matching response that finished loading
+        since the last poll
+        """
+        payloads = []
+        for entry in self._log.read():
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                if "json" in response.get("mimeType", "") and self.url_pattern.search(response.get("url", "")):
+                    self._pending[params["requestId"]] = response["url"]
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                url = self._pending.pop(params["requestId"])
+                payload = self._response_body(params["requestId"], url)
+                if payload is not None:
+                    payloads.append((url, payload))
+            elif method == "Network.loadingFailed":
+                self._pending.pop(params.get("requestId"), None)
+        return payloads
+
+    def _response_body(self, request_id, url):
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            text = body["body"]
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text).decode("utf-8")
+            return json.loads(text)
+        except Exception as e:
+            # The browser drops bodies of pages navigated away from
+            LOGGER.debug(f"Could not read response body of {url}: {e!r}")
+            return None
+
+    def wait_for_payloads(self, timeout, quiet_time=CAPTURE_QUIET_SECONDS):
+        """
+        Collect payloads until none has arrived for `quiet_time` seconds after
+        the first one, or `timeout` passes
+        """
+        payloads = []
+        start_time = time.time()
+        last_payload = None
+        while time.time() - start_time < timeout:
+            new_payloads = self.poll()
+            if new_payloads:
+                payloads.extend(payload for _, payload in new_payloads)
+                last_payload = time.time()
+            elif last_payload is not None and time.time() - last_payload >= quiet_time and not self._pending:
+                break
+            time.sleep(CAPTURE_POLL_SECONDS)
+        return payloads
@@ -0,0 +1,263 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+from collections import deque, namedtuple
+
+from hulu_bot.title_store import TitleStore
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Harvest many (account, profile, target) jobs in parallel
+
+Each worker is a separate process that owns one browser and runs one job at
+a time; it keeps its session between jobs for the same account and profile
+so the login is not repeated. Tabs of one account run on several workers at
+once: the first to start logs in and saves the session under the account's
+lock (SessionStateStore.lock), the others wait for it and resume that state.
+
+Every worker talks to the parent over a pipe of its own, so a worker killed
+halfway through sending a result can only break its own pipe, which is
+dropped with it. The parent hands out jobs, kills workers whose job runs
+past the timeout or whose process died (browser included, they run in their
+own process group), retries the job on a fresh worker and merges every
+worker's titles into one TitleStore. Only workers import the browser stack.
+"""
+
+JOB_TIMEOUT_SECONDS = 15 * 60
+JOB_RETRIES = 2
+RESULT_POLL_SECONDS = 1
+
+
+class HarvestJob(namedtuple("HarvestJob", ["username", "password", "profile_name", "target"])):
+
+    @property
+    def account(self):
+        return self.username, self.profile_name
+
+    @property
+    def label(self):
+        # Used in logs and results, never includes the password
+        return f"{self.username}/{self.profile_name}/{self.target}"
+
+
+JobResult = namedtuple("JobResult", ["job", "titles", "error", "attempts", "elapsed"])
+
+
+def jobs_for(username, password, profile_names, targets=None):
+    if targets is None:
+        from hulu_bot.hulu_session import HARVEST_TARGETS
+
+        targets = tuple(HARVEST_TARGETS)
+    return [
+        HarvestJob(username, password, profile_name, target)
+        for profile_name in profile_names
+        for target in targets
+    ]
+
+
+def _take_job(pending, jobs, account):
+    """
+    Remove and return the next (job_id, attempt), preferring one for the
+    `account` the worker is already logged into
+    """
+    entry = next((entry for entry in pending if jobs[entry[0]].account == account), pending[0])
+    pending.remove(entry)
+    return entry
+
+
+def _worker_main(connection, session_factory=None):
+    # Own process group, so the parent can take the browser down with us
+    if hasattr(os, "setsid"):
+        os.setsid()
+    if session_factory is None:
+        from hulu_bot.hulu_session import HuluSession as session_factory
+
+    session = None
+    account = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            # The parent is gone
+            message = None
+        if message is None:
+            break
+        job_id, job = message
+        try:
+            if session is None or account != job.account:
+                if session is not None:
+                    session.close()
+                    session = None
+                # Workers only collect, the parent owns the real title store
+                session = session_factory(title_store=TitleStore(":memory:", legacy_file=None))
+                session.resume_or_login(job.username, job.password, job.profile_name)
+                account = job.account
+            connection.send((job_id, session.collect(job.target), None))
+        except Exception as e:
+            connection.send((job_id, None, repr(e)))
+            # The browser is in an unknown state after a failure
+            if session is not None:
+                try:
+                    session.close()
+                except Exception:
+                    pass
+            session = None
+    if session is not None:
+        session.close()
+
+
+class _Worker(object):
+
+    def __init__(self, context, slot, session_factory=None):
+        self.slot = slot
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, session_factory),
+            name=f"hulu-harvest-{slot}",
+            daemon=True,
+        )
+        self.process.start()
+        # Only the worker holds its end now, so its exit reads as EOF here
+        child_connection.close()
+        self.job_id = None
+        self.account = None
+        self.started = None
+
+    def assign(self, job_id, job):
+        self.job_id = job_id
+        self.account = job.account
+        self.started = time.monotonic()
+        self.connection.send((job_id, job))
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            # Already exited
+            pass
+
+    def kill(self):
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                # Killed before it had its own process group
+                pass
+        self.process.kill()
+        self.process.join()
+        # Whatever the worker was writing when it died goes with its pipe
+        self.connection.close()
+
+
+class HarvestOrchestrator(object):
+
+    def __init__(
+        self, workers=None, job_timeout=JOB_TIMEOUT_SECONDS, retries=JOB_RETRIES, title_store=None, session_factory=None
+    ):
+        """
+        `session_factory` builds the session in each worker, HuluSession by
+        default. It is sent to the worker processes, so it has to be
+        importable by name
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.job_timeout = job_timeout
+        self.retries = retries
+        # An empty store is falsy, so test for None
+        self.title_store = title_store if title_store is not None else TitleStore()
+        self.session_factory = session_factory
+        # spawn: a forked copy of a process that already drives a browser is not safe
+        self._context = multiprocessing.get_context("spawn")
+
+    def run(self, jobs):
+        """
+        Run every job and record the titles in the title store as results come
+        in. Returns (titles new to the store, [JobResult per job])
+        """
+        jobs = list(jobs)
+        pending = deque((job_id, 1) for job_id in range(len(jobs)))
+        attempts = {}
+        started_at = {}
+        workers = {}
+        running = {}
+        finished = {}
+        new_titles = []
+
+        def finish(job_id, titles, error):
+            job = jobs[job_id]
+            attempt = attempts[job_id]
+            if error is not None and attempt <= self.retries:
+                LOGGER.info(f"Harvest job {job.label} failed on attempt {attempt}, retrying: {error}")
+                pending.append((job_id, attempt + 1))
+                return
+            if error is None:
+                new_titles.extend(self.title_store.record(titles))
+            else:
+                LOGGER.warning(f"Harvest job {job.label} failed after {attempt} attempts: {error}")
+            finished[job_id] = JobResult(
+                job, titles, error, attempt, round(time.monotonic() - started_at[job_id], 3)
+            )
+
+        try:
+            while pending or running:
+                for slot in range(min(self.workers, len(jobs))):
+                    if not pending:
+                        break
+                    if slot in running:
+                        continue
+                    worker = workers.get(slot)
+                    if worker is not None and not worker.process.is_alive():
+                        worker.kill()
+                        worker = None
+                    job_id, attempt = _take_job(pending, jobs, worker.account if worker else None)
+                    if worker is None:
+                        worker = workers[slot] = _Worker(self._context, slot, self.session_factory)
+                    attempts[job_id] = attempt
+                    started_at.setdefault(job_id, time.monotonic())
+                    worker.assign(job_id, jobs[job_id])
+                    running[slot] = worker
+
+                connections = {worker.connection: slot for slot, worker in running.items()}
+                broken = {}
+                for connection in multiprocessing.connection.wait(list(connections), timeout=RESULT_POLL_SECONDS):
+                    slot = connections[connection]
+                    try:
+                        job_id, titles, error = connection.recv()
+                    except Exception as e:
+                        # EOF or a torn message, it died halfway through a result
+                        broken[slot] = f"lost the worker: {e!r}"
+                        continue
+                    del running[slot]
+                    finish(job_id, titles, error)
+
+                now = time.monotonic()
+                for slot, worker in list(running.items()):
+                    if slot in broken:
+                        error = broken[slot]
+                    elif now - worker.started > self.job_timeout:
+                        error = f"timed out after {self.job_timeout} seconds"
+                    elif not worker.process.is_alive() and not worker.connection.poll():
+                        error = f"worker exited with code {worker.process.exitcode}"
+                    else:
+                        continue
+                    worker.kill()
+                    del running[slot]
+                    workers.pop(slot)
+                    finish(worker.job_id, None, error)
+        finally:
+            for worker in workers.values():
+                if worker.slot in running:
+                    worker.kill()
+                else:
+                    worker.stop()
+            for worker in workers.values():
+                worker.process.join(timeout=30)
+                if worker.process.is_alive():
+                    worker.kill()
+                worker.connection.close()
+
+        return new_titles, [finished[job_id] for job_id in sorted(finished)]
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Saved login state so a run can skip the Hulu login flow
+
+After a successful login the cookies of every domain and the localStorage of
+the current origin are saved to a JSON file per account and profile. The
+file holds live credentials: it is written with owner-only permissions into
+an owner-only directory, and its name is a hash so the email address does not
+show up in a directory listing.
+
+Several processes can use one account and profile at the same time. lock()
+takes an exclusive file lock for it, so only one of them checks, logs in and
+saves at a time and the others pick up the state it saved. There is no lock
+where fcntl is missing (Windows), saves are still atomic there.
+"""
+
+SESSION_STATE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".hulu_bot", "sessions")
+# Saved sessions older than this are not tried, Hulu expires them anyway
+SESSION_STATE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+# Fields Network.setCookies accepts out of what Network.getAllCookies returns
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires", "priority")
+READ_LOCAL_STORAGE_JS = "return Object.assign({}, window.localStorage);"
+WRITE_LOCAL_STORAGE_JS = """
+var items = arguments[0];
+for (var key in items) window.localStorage.setItem(key, items[key]);
+"""
+
+
+class SessionStateStore(object):
+
+    def __init__(self, directory=SESSION_STATE_DIRECTORY, max_age=SESSION_STATE_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+
+    def path_for(self, username, profile_name, suffix=".json"):
+        key = hashlib.sha256(f"{username}\0{profile_name}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    @contextmanager
+    def lock(self, username, profile_name):
+        """
+        Hold the account and profile's lock, across processes, for the block
+        """
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        descriptor = os.open(self.path_for(username, profile_name, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(descriptor)
+
+    def save(self, driver, username, profile_name):
+        url = driver.current_url
+        parts = urlsplit(url)
+        state = {
+            "saved_at": time.time(),
+            "url": url,
+            "cookies": driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"],
+            "local_storage": {
+                f"{parts.scheme}://{parts.netloc}": driver.execute_script(READ_LOCAL_STORAGE_JS)
+            },
+        }
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        os.chmod(self.directory, 0o700)
+        path = self.path_for(username, profile_name)
+        # A temporary file of its own per writer, mkstemp creates it 0600 so the
+        # credentials are never world readable
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=self.directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                json.dump(state, file)
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return path
+
+    def load(self, username, profile_name):
+        """
+        The saved state, or None when there is none, it is too old or every
+        cookie in it has expired
+        """
+        path = self.path_for(username, profile_name)
+        try:
+            with open(path) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            LOGGER.info(f"Ignoring unreadable session state {path}")
+            return None
+
+        now = time.time()
+        if now - state.get("saved_at", 0) > self.max_age:
+            return None
+        cookies = [
+            cookie for cookie in state.get("cookies", [])
+            if cookie.get("session") or cookie.get("expires", -1) <= 0 or cookie["expires"] > now
+        ]
+        if not cookies:
+            return None
+        state["cookies"] = cookies
+        return state
+
+    @staticmethod
+    def restore(driver, state):
+        """
+        Put the saved cookies and localStorage into the browser, leaving it
+        on the page the state was saved from
+        """
+        cookies = []
+        for saved in state["cookies"]:
+            cookie = {field: saved[field] for field in COOKIE_FIELDS if field in saved}
+            # Session cookies are saved with expires -1, which would set them expired
+            if saved.get("session") or cookie.get("expires", -1) <= 0:
+                cookie.pop("expires", None)
+            cookies.append(cookie)
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+        # localStorage can only be written from a page on its origin
+        for origin, items in state.get("local_storage", {}).items():
+            if items:
+                driver.get(origin)
+                driver.execute_script(WRITE_LOCAL_STORAGE_JS, items)
+        driver.get(state["url"])
+
+    def discard(self, username, profile_name):
+        try:
+            os.remove(self.path_for(username, profile_name))
+        except FileNotFoundError:
+            pass
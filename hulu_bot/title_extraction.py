@@ -0,0 +1,111 @@
+import importlib.util
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from page_models.page_hulu import TILE_CLASS, TILE_SELECTOR
+from ui_framework.dom_waits import DOM_HELPERS_JS
+
+# BeautifulSoup imports the parser itself, only check that it is installed
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+"""
+Pull titles out of Hulu tiles
+
+Every tile is a div holding a thumbnail whose alt text reads
+"Cover art for <title>". In a live session the alt strings are collected by
+one script in the browser, so only the strings cross the wire instead of the
+whole page_source. For saved HTML, a SoupStrainer keeps the parser from
+building a tree for anything but the tiles.
+"""
+
+ALT_PREFIX_SEPARATOR = "for "
+
+# arguments: tile css selector. Returns the alt of the first image in each tile
+TILE_ALTS_JS = """
+var tiles = document.querySelectorAll(arguments[0]);
+var alts = [];
+for (var i = 0; i < tiles.length; i++) {
+    var image = tiles[i].querySelector("img");
+    if (image && image.hasAttribute("alt")) alts.push(image.getAttribute("alt"));
+}
+return alts;
+"""
+
+# arguments: root locator strategy and value (null for the whole document),
+# tile css selector, harvested attribute, carousel edge mark
+# Marks the tiles not read before and returns {alts: their alt texts,
+# carousels: how many carousels they came from}. The last of them in each
+# carousel is marked <edge mark><carousel index> so it can be scrolled to
+HARVEST_TILE_ALTS_JS = DOM_HELPERS_JS + """
+var root = arguments[0] ? locateAll(arguments[0], arguments[1])[0] : document;
+var tileSelector = arguments[2], marker = arguments[3], edgeMark = arguments[4];
+var alts = [], carousels = [], edges = [];
+if (!root) return {alts: alts, carousels: 0};
+
+var oldEdges = root.querySelectorAll("[" + marker + "^='" + edgeMark + "']");
+for (var e = 0; e < oldEdges.length; e++) oldEdges[e].setAttribute(marker, "");
+
+var tiles = root.querySelectorAll(tileSelector + ":not([" + marker + "])");
+for (var i = 0; i < tiles.length; i++) {
+    var tile = tiles[i];
+    tile.setAttribute(marker, "");
+    var image = tile.querySelector("img");
+    if (image && image.hasAttribute("alt")) alts.push(image.getAttribute("alt"));
+    // Nearest horizontally scrollable ancestor is the tile's carousel
+    for (var node = tile.parentElement; node && node !== root; node = node.parentElement) {
+        if (node.scrollWidth > node.clientWidth + 1) {
+            var index = carousels.indexOf(node);
+            if (index < 0) index = carousels.push(node) - 1;
+            edges[index] = tile;
+            break;
+        }
+    }
+}
+for (var c = 0; c < edges.length; c++) edges[c].setAttribute(marker, edgeMark + c);
+return {alts: alts, carousels: edges.length};
+"""
+
+
+def title_from_alt(alt):
+    """
+    "Cover art for Love for Sale" -> "Love for Sale", None when the alt does
+    not follow the pattern
+    """
+    _, separator, title = alt.partition(ALT_PREFIX_SEPARATOR)
+    title = title.strip()
+    return title if separator and title else None
+
+
+def titles_from_alts(alts):
+    titles = []
+    for alt in alts:
+        title = title_from_alt(alt)
+        if title is not None:
+            titles.append(title)
+    return titles
+
+
+def extract_titles_live(driver, tile_selector=TILE_SELECTOR):
+    return titles_from_alts(driver.execute_script(TILE_ALTS_JS, tile_selector))
+
+
+def _has_class(class_name):
+    # While parsing, the strainer may see the raw "a b c" attribute string
+    # rather than a list of classes, depending on the bs4 version
+    def matches(value):
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return class_name in classes
+    return matches
+
+
+def extract_titles_from_html(html, tile_class=TILE_CLASS):
+    tiles_only = SoupStrainer("div", class_=_has_class(tile_class))
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=tiles_only)
+    alts = []
+    for div in soup.find_all("div", class_=tile_class):
+        image = div.find("img")
+        if image is not None and image.has_attr("alt"):
+            alts.append(image["alt"])
+    return titles_from_alts(alts)
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import time
+
+"""
+Every title the bot has seen, with when it was first and last seen
+
+Backed by SQLite so each run is one transaction: a crash mid-run leaves the
+previous state intact, and only titles from the current run are written.
+Membership checks go to an in-memory set loaded when the store opens.
+"""
+
+TITLES_DB = "titles.db"
+LEGACY_TITLES_FILE = "titles.txt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    title TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    times_seen INTEGER NOT NULL DEFAULT 1
+)
+"""
+
+UPSERT_TITLE = """
+INSERT INTO titles (title, first_seen, last_seen) VALUES (?, ?, ?)
+ON CONFLICT (title) DO UPDATE SET
+    last_seen = excluded.last_seen,
+    times_seen = times_seen + 1
+"""
+
+
+class TitleStore(object):
+
+    def __init__(self, path=TITLES_DB, legacy_file=LEGACY_TITLES_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(SCHEMA)
+        self._titles = {row[0] for row in self.connection.execute("SELECT title FROM titles")}
+        # One time import of the list older runs wrote
+        if not self._titles and legacy_file and os.path.exists(legacy_file):
+            self.import_text_file(legacy_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, title):
+        return title in self._titles
+
+    def __len__(self):
+        return len(self._titles)
+
+    def record(self, titles, seen_at=None):
+        """
+        Mark `titles` as seen now, in one transaction. Titles seen more than
+        once in the same call count once. Returns the ones not seen before,
+        in the order given
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        unique_titles = list(dict.fromkeys(title for title in titles if title))
+        new_titles = [title for title in unique_titles if title not in self._titles]
+        with self.connection:
+            self.connection.executemany(
+                UPSERT_TITLE, ((title, seen_at, seen_at) for title in unique_titles)
+            )
+        self._titles.update(new_titles)
+        return new_titles
+
+    def import_text_file(self, path, seen_at=None):
+        """
+        Titles from a one-per-line file, dated by the file's modification time
+        """
+        if seen_at is None:
+            seen_at = os.path.getmtime(path)
+        with open(path) as file:
+            return self.record((line.strip() for line in file), seen_at)
+
+    def get(self, title):
+        row = self.connection.execute(
+            "SELECT title, first_seen, last_seen, times_seen FROM titles WHERE title = ?",
+            (title,),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("title", "first_seen", "last_seen", "times_seen"), row))
+
+    def titles(self, since=None):
+        """
+        Titles in the order they were first seen, only those first seen at or
+        after `since` when given
+        """
+        query = "SELECT title FROM titles"
+        parameters = ()
+        if since is not None:
+            query += " WHERE first_seen >= ?"
+            parameters = (since,)
+        query += " ORDER BY first_seen, rowid"
+        return [row[0] for row in self.connection.execute(query, parameters)]
+
+    def close(self):
+        self.connection.close()
@@ -3,6 +3,13 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
 from ui_framework.base_selenium_page import SeleniumBasePage
 
+TILE_CLASS = "StandardEmphasisHorizontalTileThumbnail__content"
+TILE_SELECTOR = f"div.{TILE_CLASS}"
+# Set on tiles already read while harvesting
+HARVESTED_ATTRIBUTE = "data-harvested"
+# Harvested value of the last tile each carousel added in the latest round
+CAROUSEL_EDGE_MARK = "carousel-"
+
 
 class HuluPage(SeleniumBasePage):
 
@@ -37,3 +44,25 @@ class HuluPage(SeleniumBasePage):
     for_you = (By.ID, "for-you")
     popular = (By.ID, "popular")
     tv_for_you_section = (By.ID, "tv-for-you")
+
+    """
+    Tiles
+    """
+    title_tiles = (By.CSS_SELECTOR, TILE_SELECTOR)
+
+    def get_tiles(self, section_locator=None):
+        scope = ""
+        if section_locator is not None:
+            strategy, value = section_locator
+            if strategy not in (By.ID, By.CSS_SELECTOR):
+                raise Exception(f"Cannot scope tiles to section locator {section_locator}")
+            scope = f"[id='{value}'] " if strategy == By.ID else f"{value} "
+        return (By.CSS_SELECTOR, f"{scope}{TILE_SELECTOR}")
+
+    def get_unharvested_tiles(self, section_locator=None):
+        _, tiles = self.get_tiles(section_locator)
+        return (By.CSS_SELECTOR, f"{tiles}:not([{HARVESTED_ATTRIBUTE}])")
+
+    def get_carousel_edge(self, index, section_locator=None):
+        _, tiles = self.get_tiles(section_locator)
+        return (By.CSS_SELECTOR, f"{tiles}[{HARVESTED_ATTRIBUTE}='{CAROUSEL_EDGE_MARK}{index}']")
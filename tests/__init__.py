@@ -1,33 +1,59 @@
 import logging
 import os
-import re
 import shutil
 from datetime import datetime
 
+from ui_framework import base_config
+from ui_framework.failure_artifacts import LOG_TYPES, ArtifactWriter, capture_failure_artifacts
+
 
 LOGGER = logging.getLogger(__name__)
 current_working_directory = os.getcwd()
 SCREENSHOTS_DIRECTORY = current_working_directory + "/failure_screenshots"
+# Writes failure artifacts in the background, closed in pytest_sessionfinish
+ARTIFACT_WRITER = ArtifactWriter()
+
+
+# Called once per run by the controlling process, never by xdist workers,
+# so one worker cannot wipe out screenshots another one just saved
+def prepare_screenshots_directory():
+    if os.path.exists(SCREENSHOTS_DIRECTORY):
+        shutil.rmtree(SCREENSHOTS_DIRECTORY)
+
+    os.mkdir(SCREENSHOTS_DIRECTORY)
 
-if os.path.exists(SCREENSHOTS_DIRECTORY):
-    shutil.rmtree(SCREENSHOTS_DIRECTORY)
 
-os.mkdir(SCREENSHOTS_DIRECTORY)
+def worker_screenshots_directory():
+    directory = f"{SCREENSHOTS_DIRECTORY}/{base_config.get_worker_id()}"
+    os.makedirs(directory, exist_ok=True)
+    return directory
 
 
-def take_failure_snapshot(web_driver, request):
+# Screenshot, DOM and browser logs of a failed test, plus the performance log
+# with --capture-performance-log. Only the reads from the browser happen
+# here, the files are written in the background. Returns True when the
+# browser did not answer a capture step in time and should not be reused
+def take_failure_snapshot(web_driver, request, since=None):
     if (
         hasattr(request.node, "test_result")
         and request.node.test_result == "failed"
     ):
         dt_now = datetime.now()
         ts = dt_now.strftime("%Y%m%dT%H%M%S")
-        screenshot_path = re.sub(
-            r"[^\w\-_/\. ]",
-            "_",
-            f"{SCREENSHOTS_DIRECTORY}/{request.node.name}-{ts}.png",
+        directory = worker_screenshots_directory()
+        log_types = LOG_TYPES
+        if request.config.getoption("--capture-performance-log"):
+            log_types += ("performance",)
+        capture = capture_failure_artifacts(
+            web_driver,
+            directory,
+            f"{request.node.name}-{ts}",
+            ARTIFACT_WRITER,
+            since=since,
+            log_types=log_types,
         )
         LOGGER.info(
-            f"Test has failed. See more details in screenshot at {screenshot_path}"
+            f"Test has failed. See more details in {', '.join(capture.queued) or directory}"
         )
-        web_driver.save_screenshot(screenshot_path)
+        return capture.timed_out
+    return False
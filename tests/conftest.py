@@ -1,15 +1,121 @@
 
 import logging
+import shutil
+import tempfile
+import time
 import pytest
 from selenium import webdriver
 from ui_framework import configure_chrome
 from ui_framework import base_config
+from ui_framework import instrumentation
+from ui_framework import resource_blocking
+from ui_framework.driver_pool import DEFAULT_POOL_SIZE, DriverPool
+from tests import ARTIFACT_WRITER, prepare_screenshots_directory, take_failure_snapshot
 
 LOGGER = logging.getLogger(__name__)
 
 SCREEN_HEIGHT = 1080
 SCREEN_WIDTH = 1920
 RESOLUTION = str(SCREEN_WIDTH) + "x" + str(SCREEN_HEIGHT)
+SLOWEST_ACTIONS_TO_REPORT = 15
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("page actions")
+    group.addoption(
+        "--profile-page-actions",
+        action="store_true",
+        default=False,
+        help="Time every SeleniumBasePage action and wait, and report the slowest",
+    )
+    group.addoption(
+        "--profile-output",
+        default="page_action_profiles",
+        help="Directory for per-test JSON and folded flame graph profiles",
+    )
+    parser.addoption(
+        "--driver-pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help="Idle browsers kept between tests, 0 starts a fresh browser per test",
+    )
+    parser.addoption(
+        "--block-resources",
+        default="none",
+        choices=sorted(resource_blocking.BLOCKING_PRESETS),
+        help="Resource blocking preset applied to every test browser",
+    )
+    parser.addoption(
+        "--capture-performance-log",
+        action="store_true",
+        default=False,
+        help="Record the DevTools performance log of test browsers and save it with failure artifacts",
+    )
+
+
+def pytest_configure(config):
+    # xdist workers get "workerinput", only the controller clears old screenshots
+    if not hasattr(config, "workerinput"):
+        prepare_screenshots_directory()
+    config.addinivalue_line(
+        "markers",
+        "pristine_browser: run with a newly started browser that is quit afterwards instead of a pooled one",
+    )
+    if config.getoption("--profile-page-actions"):
+        profiler = instrumentation.ActionProfiler()
+        instrumentation.set_active_profiler(profiler)
+        config._page_action_profiler = profiler
+
+
+# Starts and exports the action profile for each test when profiling is on
+@pytest.fixture(autouse=True)
+def page_action_profile(request):
+    profiler = getattr(request.config, "_page_action_profiler", None)
+    if profiler is None:
+        yield None
+        return
+    profiler.start_test(request.node.nodeid)
+    yield profiler
+    records = profiler.end_test()
+    if records:
+        profiler.export(
+            request.config.getoption("--profile-output"),
+            request.node.nodeid,
+            records,
+        )
+
+
+def pytest_sessionfinish(session):
+    # Wait for the background writer so no failure artifact is lost
+    ARTIFACT_WRITER.close()
+    # xdist workers hand their action totals to the controller's summary
+    profiler = getattr(session.config, "_page_action_profiler", None)
+    if profiler is not None and hasattr(session.config, "workeroutput"):
+        session.config.workeroutput["page_action_summary"] = profiler.summary()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    profiler = getattr(node.config, "_page_action_profiler", None)
+    summary = getattr(node, "workeroutput", {}).get("page_action_summary")
+    if profiler is not None and summary:
+        profiler.add_summary(summary)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    profiler = getattr(config, "_page_action_profiler", None)
+    if profiler is None or not profiler.totals:
+        return
+    terminalreporter.section("slowest page actions")
+    terminalreporter.write_line(
+        f"{'total ms':>10} {'calls':>6} {'max ms':>9} {'cmds':>6} {'polls':>6} {'stale':>6}  action"
+    )
+    for entry in profiler.slowest(SLOWEST_ACTIONS_TO_REPORT):
+        terminalreporter.write_line(
+            f"{entry['wall_ms']:>10.0f} {entry['calls']:>6} {entry['max_ms']:>9.0f} "
+            f"{entry['commands']:>6} {entry['polls']:>6} {entry['stale_retries']:>6}  "
+            f"{entry['method']}({entry['locator'] or ''})"
+        )
 
 
 # Teardown fixture to quit browser session
@@ -17,26 +123,88 @@ def teardown_driver(driver):
     driver.quit()
 
 
+def create_driver(test_name, profiles_directory=None, blocking="none", performance_log=False):
+    if base_config.browser.lower() == "chrome":
+        # Every browser gets its own profile, Chrome refuses to share one
+        user_data_dir = tempfile.mkdtemp(prefix="chrome-", dir=profiles_directory)
+        capabilities = configure_chrome.configure_base_capabilities(
+            test_name,
+            RESOLUTION,
+            debugging_port=configure_chrome.free_port(),
+            user_data_dir=user_data_dir,
+            performance_log=performance_log,
+        )
+        driver = webdriver.Chrome(desired_capabilities=capabilities)
+    else:
+        raise Exception("WebDriver Environment not supported")
+    driver.set_window_size(SCREEN_WIDTH, SCREEN_HEIGHT)
+    if blocking != "none":
+        resource_blocking.apply_blocking(driver, blocking)
+    return driver
+
+
+# Same meaning as the pytest-xdist fixture, and available without it
+@pytest.fixture(scope="session")
+def worker_id():
+    return base_config.get_worker_id()
+
+
+# Chrome profiles of this worker, removed once its browsers are gone
+@pytest.fixture(scope="session")
+def worker_profiles_directory(worker_id):
+    directory = tempfile.mkdtemp(prefix=f"chrome-profiles-{worker_id}-")
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+# One pool per session, which is per worker process under xdist
+@pytest.fixture(scope="session")
+def driver_pool(request, worker_profiles_directory):
+    pool = DriverPool(
+        lambda: create_driver(
+            request.session.name,
+            worker_profiles_directory,
+            request.config.getoption("--block-resources"),
+            request.config.getoption("--capture-performance-log"),
+        ),
+        size=request.config.getoption("--driver-pool-size"),
+        window_size=(SCREEN_WIDTH, SCREEN_HEIGHT),
+    )
+    yield pool
+    pool.close()
+    LOGGER.info(f"WebDriver pool: {pool.stats()}")
+
+
 # Creator of web_driver fixtures
 # Currently only configured for chrome
 @pytest.fixture(scope="function")
-def web_driver_factory(request):
+def web_driver_factory(request, driver_pool, worker_profiles_directory):
+    pristine = request.node.get_closest_marker("pristine_browser") is not None
+
     class Driver(object):
         @staticmethod
         def web_driver():
-            test_name = request.node.name
-
-            if base_config.browser.lower() == "chrome":
-                capabilities = configure_chrome.configure_base_capabilities(
-                    test_name, RESOLUTION
+            if pristine:
+                driver = create_driver(
+                    request.node.name,
+                    worker_profiles_directory,
+                    request.config.getoption("--block-resources"),
+                    request.config.getoption("--capture-performance-log"),
                 )
-                driver = webdriver.Chrome(desired_capabilities=capabilities)
             else:
-                raise Exception("WebDriver Environment not supported")
-            driver.set_window_size(SCREEN_WIDTH, SCREEN_HEIGHT)
+                driver = driver_pool.acquire()
+            started = time.time()
 
             def teardown():
-                teardown_driver(driver)
+                # Before the pool resets the browser and the failure state is gone
+                browser_hung = take_failure_snapshot(driver, request, since=started)
+                if pristine:
+                    teardown_driver(driver)
+                elif browser_hung:
+                    # An abandoned capture step may still be running on it
+                    driver_pool.discard(driver)
+                else:
+                    driver_pool.release(driver)
 
             request.addfinalizer(teardown)
             return driver
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from requests.exceptions import RetryError
+
+from api_client.async_client import AsyncBaseAPIClient, AsyncResponse
+from api_client.rate_limit import JitteredRetry
+
+"""
+AsyncBaseAPIClient against an in-process aiohttp server
+"""
+
+
+def run_against(handlers, scenario):
+    """
+    Serve `handlers` ({path: handler}) and await scenario(client, server)
+    """
+
+    async def main():
+        app = web.Application()
+        for path, handler in handlers.items():
+            app.router.add_route("*", path, handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            async with AsyncBaseAPIClient() as client:
+                return await scenario(client, server)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def statuses_then_ok(statuses, headers=None):
+    """
+    Handler answering with each of `statuses` in turn, then 200, and
+    counting the calls it received
+    """
+    remaining = list(statuses)
+
+    async def handler(request):
+        handler.calls += 1
+        if remaining:
+            return web.json_response({"error": True}, status=remaining.pop(0), headers=headers)
+        return web.json_response({"calls": handler.calls})
+
+    handler.calls = 0
+    return handler
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(JitteredRetry, "get_backoff_time", lambda self: 0)
+
+
+def test_retries_throttled_responses_after_retry_after():
+    handler = statuses_then_ok([429, 429], headers={"Retry-After": "0"})
+
+    async def scenario(client, server):
+        return await client.get(str(server.make_url("/throttled")))
+
+    response = run_against({"/throttled": handler}, scenario)
+    assert response.status_code == 200
+    assert response.json() == {"calls": 3}
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_retries_server_errors(no_backoff, status):
+    handler = statuses_then_ok([status])
+
+    async def scenario(client, server):
+        return await client.get(str(server.make_url("/flaky")))
+
+    response = run_against({"/flaky": handler}, scenario)
+    assert response.status_code == 200
+    assert handler.calls == 2
+
+
+def test_raises_retry_error_once_retries_run_out(no_backoff):
+    handler = statuses_then_ok([500] * 10)
+
+    async def scenario(client, server):
+        await client.get(str(server.make_url("/down")))
+
+    with pytest.raises(RetryError):
+        run_against({"/down": handler}, scenario)
+    # First attempt and RETRY_TIMES retries
+    assert handler.calls == 4
+
+
+def test_does_not_retry_non_idempotent_methods_on_server_errors(no_backoff):
+    handler = statuses_then_ok([500])
+
+    async def scenario(client, server):
+        return await client.post(str(server.make_url("/create")), json={})
+
+    response = run_against({"/create": handler}, scenario)
+    assert response.status_code == 500
+    assert handler.calls == 1
+
+
+def test_gather_keeps_to_its_limit_and_input_order():
+    in_flight = {"now": 0, "most": 0}
+
+    async def slow(request):
+        in_flight["now"] += 1
+        in_flight["most"] = max(in_flight["most"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return web.json_response({"index": int(request.query["index"])})
+
+    async def scenario(client, server):
+        url = str(server.make_url("/slow"))
+        # A generator, gather must consume it lazily
+        coroutines = (client.get(url, params={"index": index}, verbose=False) for index in range(30))
+        return await client.gather(coroutines, limit=4)
+
+    responses = run_against({"/slow": slow}, scenario)
+    assert [response.json()["index"] for response in responses] == list(range(30))
+    assert in_flight["most"] == 4
+
+
+def test_gather_returns_exceptions_in_place(no_backoff):
+    async def failing():
+        raise ValueError("boom")
+
+    async def scenario(client, server):
+        url = str(server.make_url("/ok"))
+        return await client.gather([client.get(url), failing(), client.get(url)], limit=2, return_exceptions=True)
+
+    first, error, last = run_against({"/ok": statuses_then_ok([])}, scenario)
+    assert first.status_code == 200 and last.status_code == 200
+    assert isinstance(error, ValueError)
+
+
+def test_response_exposes_body_text_and_json():
+    async def document(request):
+        return web.Response(
+            body="{\"name\": \"Café\"}".encode("latin-1"),
+            content_type="application/json",
+            charset="latin-1",
+            headers={"X-Request-Id": "abc"},
+        )
+
+    async def scenario(client, server):
+        return await client.get(str(server.make_url("/document")), api_key="key")
+
+    response = run_against({"/document": document}, scenario)
+    assert isinstance(response, AsyncResponse)
+    assert response.ok
+    assert response.content == "{\"name\": \"Café\"}".encode("latin-1")
+    assert response.encoding == "latin-1"
+    assert response.text == "{\"name\": \"Café\"}"
+    assert response.json() == {"name": "Café"}
+    assert response.headers["X-Request-Id"] == "abc"
+    assert response.elapsed.total_seconds() >= 0
+
+
+def test_response_is_not_ok_for_client_errors():
+    response = AsyncResponse("GET", "http://example.test", 404, {}, b"", None)
+    assert not response.ok
+    assert repr(response) == "<AsyncResponse [404]>"
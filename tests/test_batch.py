@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from api_client.batch import RequestSpec, run_batch
+
+"""
+Batch request specs and the bounded runner behind BaseAPITClient.batch
+"""
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("https://api.test/items", ("GET", "https://api.test/items", {})),
+        (("post", "/items"), ("POST", "/items", {})),
+        (("put", "/items/1", {"json": {"a": 1}}), ("PUT", "/items/1", {"json": {"a": 1}})),
+        ({"resource": "/items", "params": {"page": 2}}, ("GET", "/items", {"params": {"page": 2}})),
+        ({"method": "delete", "resource": "/items/1", "api_key": "k"}, ("DELETE", "/items/1", {"api_key": "k"})),
+    ],
+)
+def test_parse(spec, expected):
+    assert RequestSpec.parse(spec) == expected
+
+
+def test_parse_returns_specs_unchanged_and_copies_kwargs():
+    spec = RequestSpec("GET", "/items", {})
+    assert RequestSpec.parse(spec) is spec
+    kwargs = {"json": {}}
+    parsed = RequestSpec.parse(("POST", "/items", kwargs))
+    assert parsed.kwargs == kwargs and parsed.kwargs is not kwargs
+
+
+@pytest.mark.parametrize("spec", [{"method": "GET"}, ("GET",), 42])
+def test_parse_rejects_incomplete_specs(spec):
+    with pytest.raises((KeyError, ValueError, TypeError)):
+        RequestSpec.parse(spec)
+
+
+class RecordingClient(object):
+    """
+    Answers every verb with (method, resource, kwargs) after `delay`,
+    keeping track of how many calls run at once
+    """
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def _call(self, method, resource, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        if resource == "/fail":
+            raise ConnectionError("refused")
+        return method, resource, kwargs
+
+    def __getattr__(self, name):
+        return lambda resource, **kwargs: self._call(name.upper(), resource, **kwargs)
+
+
+def test_run_batch_returns_every_result_with_its_index():
+    client = RecordingClient()
+    specs = [f"/items/{index}" for index in range(20)] + ["/fail", ("TRACE", "/items"), {"method": "GET"}]
+    results = sorted(run_batch(client, iter(specs), max_workers=4), key=lambda result: result.index)
+
+    assert [result.index for result in results] == list(range(23))
+    assert [result.response[1] for result in results[:20]] == specs[:20]
+    assert isinstance(results[20].error, ConnectionError)
+    assert isinstance(results[21].error, ValueError)
+    assert isinstance(results[22].error, KeyError)
+    assert client.most_running <= 4
+
+
+def test_run_batch_reads_the_input_lazily():
+    pulled = []
+
+    def specs():
+        for index in range(1000):
+            pulled.append(index)
+            yield f"/items/{index}"
+
+    results = run_batch(RecordingClient(delay=0), specs(), max_workers=2)
+    next(results)
+    # No more than the in-flight window was taken from the input
+    assert len(pulled) <= 5
+    results.close()
@@ -0,0 +1,221 @@
+import json
+import os
+import pickle
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from api_client import BaseAPITClient
+from api_client.cache import CacheEntry, ResponseCache, expiry_for
+from api_client.rate_limit import RateLimiter, scope_label
+
+"""
+ResponseCache freshness, storage and the conditional GET path of
+BaseAPITClient.get
+"""
+
+NOW = 1_700_000_000.0
+
+
+def make_response(status_code=200, headers=None, content=b'{"ok": true}', reason="OK", url="http://api.test/items"):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = content
+    response.encoding = "utf-8"
+    response.url = url
+    return response
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"Cache-Control": "max-age=60"}, NOW + 60),
+        ({"Cache-Control": "public, max-age=60", "Age": "20"}, NOW + 40),
+        ({"Cache-Control": "s-maxage=10, max-age=60"}, NOW + 10),
+        ({"Cache-Control": 'max-age="30"'}, NOW + 30),
+        ({"Cache-Control": "no-store, max-age=60"}, None),
+        ({"Cache-Control": "no-cache"}, NOW),
+        ({"Expires": formatdate(NOW + 120, usegmt=True)}, NOW + 120),
+        ({"Expires": "0"}, NOW),
+        ({"ETag": '"v1"'}, NOW),
+        ({"Last-Modified": formatdate(NOW - 3600, usegmt=True)}, NOW),
+        ({}, None),
+    ],
+)
+def test_expiry_for(headers, expected):
+    assert expiry_for(CaseInsensitiveDict(headers), now=NOW) == expected
+
+
+def test_expiry_for_falls_back_to_default_ttl():
+    assert expiry_for(CaseInsensitiveDict(), default_ttl=30, now=NOW) == NOW + 30
+    # Explicit freshness from the server wins over the default
+    assert expiry_for(CaseInsensitiveDict({"Cache-Control": "max-age=5"}), default_ttl=30, now=NOW) == NOW + 5
+
+
+def test_store_skips_uncacheable_responses():
+    cache = ResponseCache()
+    assert cache.store("a", make_response(500, {"Cache-Control": "max-age=60"})) is None
+    assert cache.store("b", make_response(200, {"Cache-Control": "no-store"})) is None
+    assert cache.store("c", make_response(200, {"Cache-Control": "max-age=60", "Vary": "*"})) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lookup_honours_vary():
+    cache = ResponseCache()
+    cache.store(
+        "key",
+        make_response(200, {"Cache-Control": "max-age=60", "Vary": "Accept-Language"}),
+        {"Accept-Language": "en"},
+    )
+    assert cache.lookup("key", {"accept-language": "en"}) is not None
+    assert cache.lookup("key", {"Accept-Language": "fr"}) is None
+
+
+def test_memory_entries_are_evicted_least_recently_used_first():
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.store(key, make_response(headers={"Cache-Control": "max-age=60"}))
+    cache.lookup("a")
+    cache.store("c", make_response(headers={"Cache-Control": "max-age=60"}))
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None and cache.lookup("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_key_depends_on_params_and_credentials():
+    key = ResponseCache.key("http://api.test/items", {"page": 1}, {"X-API-Key": "one"})
+    assert key == ResponseCache.key("http://api.test/items?page=1", None, {"x-api-key": "one"})
+    assert key != ResponseCache.key("http://api.test/items", {"page": 2}, {"X-API-Key": "one"})
+    assert key != ResponseCache.key("http://api.test/items", {"page": 1}, {"X-API-Key": "two"})
+
+
+def test_disk_entries_are_json_and_keep_status_and_reason(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    body = bytes(range(256))
+    cache.store("key", make_response(203, {"Cache-Control": "max-age=60"}, body, reason="Non-Authoritative Information"))
+
+    with open(tmp_path / "key.cache") as file:
+        on_disk = json.load(file)
+    assert on_disk["status_code"] == 203
+
+    restored = ResponseCache(directory=str(tmp_path)).lookup("key").to_response()
+    assert restored.status_code == 203
+    assert restored.reason == "Non-Authoritative Information"
+    assert restored.content == body
+    assert restored.headers["cache-control"] == "max-age=60"
+
+
+def test_pickled_disk_entries_are_never_loaded(tmp_path):
+    marker = tmp_path / "unpickled"
+
+    class Exploit(object):
+        def __reduce__(self):
+            return (os.mkdir, (str(marker),))
+
+    with open(tmp_path / "key.cache", "wb") as file:
+        pickle.dump(Exploit(), file)
+    assert ResponseCache(directory=str(tmp_path)).lookup("key") is None
+    assert not marker.exists()
+
+
+def test_disk_is_bounded_by_entries_and_bytes(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_entries=1, max_disk_entries=3)
+    for index in range(5):
+        cache.store(f"entry{index}", make_response(headers={"Cache-Control": "max-age=60"}))
+        # Distinct modification times for least recently used order
+        os.utime(tmp_path / f"entry{index}.cache", (NOW + index, NOW + index))
+    assert sorted(os.listdir(tmp_path)) == ["entry2.cache", "entry3.cache", "entry4.cache"]
+    assert cache.stats()["disk_evictions"] == 2
+
+    # Room for two entries, give or take the digits of their expiry times
+    entry_size = os.path.getsize(tmp_path / "entry4.cache")
+    small = ResponseCache(directory=str(tmp_path), max_disk_bytes=entry_size * 2 + 32)
+    small.store("entry5", make_response(headers={"Cache-Control": "max-age=60"}))
+    assert len(os.listdir(tmp_path)) == 2
+    assert "entry5.cache" in os.listdir(tmp_path)
+
+
+class _EtagHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Cache-Control", "max-age=0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"version": 1}).encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Cache-Control", "max-age=0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def etag_server():
+    _EtagHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EtagHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stale_entries_are_revalidated_with_a_conditional_get(etag_server):
+    cache = ResponseCache()
+    with BaseAPITClient(cache=cache) as client:
+        first = client.get(f"{etag_server}/items", verbose=False)
+        second = client.get(f"{etag_server}/items", verbose=False)
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert second.json() == {"version": 1}
+    assert "If-None-Match" not in _EtagHandler.requests_seen[0]
+    assert _EtagHandler.requests_seen[1]["If-None-Match"] == '"v1"'
+    assert cache.stats()["revalidations"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_fresh_entries_are_served_without_a_request():
+    entry = CacheEntry("http://api.test/items", 200, {"Cache-Control": "max-age=60"}, b"{}", "utf-8", NOW + 60)
+    assert entry.is_fresh(now=NOW)
+    assert not entry.is_fresh(now=NOW + 61)
+
+    cache = ResponseCache()
+    entry.expires_at = float("inf")
+    cache._remember(ResponseCache.key("http://api.test/items"), entry)
+    with BaseAPITClient(cache=cache) as client:
+        # Nothing answers for api.test, a request would fail
+        assert client.get("http://api.test/items", verbose=False).json() == {}
+    assert cache.stats()["hits"] == 1
+
+
+def test_cached_gets_are_rate_limited_under_the_callers_key(etag_server):
+    limiter = RateLimiter(rate=100, max_concurrency=4)
+    with BaseAPITClient(cache=ResponseCache(), rate_limiter=limiter) as client:
+        client.get(f"{etag_server}/items", api_key="caller-key", verbose=False)
+        client.get(f"{etag_server}/items", api_key="caller-key", verbose=False)
+
+    host = etag_server.split("//")[1]
+    assert list(limiter.stats()) == [scope_label(host, "caller-key")]
+    assert limiter.stats()[scope_label(host, "caller-key")]["requests"] == 2
+    # Sent once by request(), not copied in by the cache path as well
+    assert _EtagHandler.requests_seen[1]["X-API-Key"] == "caller-key"
+    assert _EtagHandler.requests_seen[1]["If-None-Match"] == '"v1"'
@@ -0,0 +1,111 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api_client import BaseAPITClient
+
+"""
+Keep-alive connection reuse of BaseAPITClient, its connection_stats and
+tearing the session down
+"""
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """
+    Answers every GET on the same connection and remembers which client
+    ports connected and which have disconnected
+    """
+
+    protocol_version = "HTTP/1.1"
+    connected = []
+    disconnected = []
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.connected.append(self.client_address[1])
+
+    def finish(self):
+        super().finish()
+        self.disconnected.append(self.client_address[1])
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def keep_alive_servers():
+    _KeepAliveHandler.connected = []
+    _KeepAliveHandler.disconnected = []
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler) for _ in range(2)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_gets_to_one_host_share_one_connection(keep_alive_servers):
+    server, _ = keep_alive_servers
+    with BaseAPITClient() as client:
+        for _ in range(5):
+            assert client.get(f"{server}/items", verbose=False).status_code == 200
+        stats = client.connection_stats()
+
+    assert stats == {"requests": 5, "new_connections": 1, "reused_connections": 4}
+    assert len(_KeepAliveHandler.connected) == 1
+
+
+def test_counters_of_evicted_pools_are_kept(keep_alive_servers):
+    first, second = keep_alive_servers
+    # One pool only, each switch of host evicts the other one
+    with BaseAPITClient(pool_connections=1) as client:
+        for url in (first, first, first, second, second, first):
+            client.get(f"{url}/items", verbose=False)
+        stats = client.connection_stats()
+
+    assert stats == {"requests": 6, "new_connections": 3, "reused_connections": 3}
+    assert len(_KeepAliveHandler.connected) == 3
+
+
+def test_close_tears_the_session_down(keep_alive_servers):
+    server, _ = keep_alive_servers
+    client = BaseAPITClient()
+    client.get(f"{server}/items", verbose=False)
+    client.close()
+
+    assert wait_until(lambda: _KeepAliveHandler.disconnected == _KeepAliveHandler.connected)
+    assert client.connection_stats() == {"requests": 0, "new_connections": 0, "reused_connections": 0}
+    # A closed client starts a fresh session on its next request
+    client.get(f"{server}/items", verbose=False)
+    assert client.connection_stats()["new_connections"] == 1
+    client.close()
+
+
+def test_the_context_manager_closes_the_client(keep_alive_servers):
+    server, _ = keep_alive_servers
+    with BaseAPITClient() as client:
+        client.get(f"{server}/items", verbose=False)
+        assert _KeepAliveHandler.disconnected == []
+
+    assert client._session is None
+    assert wait_until(lambda: len(_KeepAliveHandler.disconnected) == 1)
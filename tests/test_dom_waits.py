@@ -0,0 +1,243 @@
+import pytest
+from selenium.common.exceptions import (
+    ElementClickInterceptedException,
+    StaleElementReferenceException,
+    WebDriverException,
+)
+from selenium.webdriver.common.by import By
+
+from ui_framework.base_selenium_page import SeleniumBasePage
+
+"""
+Waits of SeleniumBasePage against fake drivers: regex waits, where the
+browser reports value changes and the pattern is matched in Python, and
+resolving an element before acting on it
+"""
+
+FIELD = (By.ID, "field")
+
+
+class ChangingValueDriver(object):
+    """
+    Answers the in-browser wait with the next of `values` that differs from
+    the condition's last value, or a timeout once there is none
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.conditions = []
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, strategy, value, condition, timeout_ms, recheck_ms):
+        self.conditions.append(condition)
+        assert condition["op"] == "changes"
+        while self.values:
+            current = self.values.pop(0) or None
+            if current != condition["expected"]:
+                return {"satisfied": True, "value": current, "elapsed": 0.01}
+        return {"satisfied": False, "value": condition["expected"], "elapsed": timeout_ms / 1000}
+
+
+def test_patterns_are_matched_in_python():
+    # \A, \Z and (?P<...>) are Python only, JavaScript would reject or misread them
+    driver = ChangingValueDriver(["12a", "123"])
+    SeleniumBasePage(driver).verify_value_matches_pattern(r"\A(?P<digits>\d+)\Z", FIELD, timeout=5)
+
+    assert [condition["expected"] for condition in driver.conditions] == [None, "12a"]
+    assert all("digits" not in str(condition) for condition in driver.conditions)
+
+
+def test_contains_pattern_uses_unicode_classes():
+    # Python's \d matches Arabic-Indic digits, JavaScript's does not
+    driver = ChangingValueDriver(["code:", "code: ٣"])
+    SeleniumBasePage(driver).verify_value_contains_pattern(r"\d", FIELD, timeout=5)
+    assert len(driver.conditions) == 2
+
+
+def test_text_stops_matching_regex():
+    driver = ChangingValueDriver(["Loading.", "Loading..", "Loaded"])
+    SeleniumBasePage(driver).verify_text_does_not_contain_regex("Loading", FIELD, timeout=5)
+    assert driver.conditions[-1]["source"] == "text"
+    assert driver.conditions[-1]["expected"] == "Loading.."
+
+
+def test_times_out_with_the_last_value():
+    driver = ChangingValueDriver(["pending"])
+    with pytest.raises(TimeoutError) as error:
+        SeleniumBasePage(driver).verify_value_contains_pattern(r"\d", FIELD, timeout=0.2)
+    assert "Actual value: pending" in str(error.value)
+
+
+class FakeElement(object):
+    """
+    Raises the given exceptions from click(), one per call, then clicks
+    """
+
+    def __init__(self, click_errors=()):
+        self.click_errors = list(click_errors)
+        self.clicks = 0
+
+    def click(self):
+        if self.click_errors:
+            raise self.click_errors.pop(0)
+        self.clicks += 1
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+
+class ResolvingDriver(object):
+    """
+    Answers each in-browser element wait with the next of `elements`, or
+    fails the script when `script_error` is set so the page falls back to
+    WebDriverWait, which finds `elements[0]`
+    """
+
+    def __init__(self, elements, script_error=False):
+        self.elements = list(elements)
+        self.script_error = script_error
+        self.conditions = []
+        self.finds = 0
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, strategy, value, condition, timeout_ms, recheck_ms):
+        self.conditions.append(condition)
+        if self.script_error:
+            raise WebDriverException("javascript error: script injection blocked")
+        return {"satisfied": True, "value": "ok", "elapsed": 0.01, "element": self.elements.pop(0)}
+
+    def find_element(self, strategy, value):
+        self.finds += 1
+        return self.elements[0]
+
+
+def test_a_stale_element_is_resolved_again():
+    stale, fresh = FakeElement([StaleElementReferenceException()]), FakeElement()
+    driver = ResolvingDriver([stale, fresh])
+    SeleniumBasePage(driver).click(FIELD, timeout=5)
+
+    assert (stale.clicks, fresh.clicks) == (0, 1)
+    assert [condition["name"] for condition in driver.conditions] == ["clickable", "clickable"]
+
+
+def test_an_intercepted_click_is_retried_until_the_timeout():
+    covered = FakeElement([ElementClickInterceptedException()])
+    driver = ResolvingDriver([covered, covered])
+    SeleniumBasePage(driver).click(FIELD, timeout=5)
+    assert covered.clicks == 1
+
+    always_covered = FakeElement([ElementClickInterceptedException()] * 100)
+    driver = ResolvingDriver([always_covered] * 100)
+    with pytest.raises(Exception) as error:
+        SeleniumBasePage(driver).click(FIELD, timeout=0.3)
+    assert "Unable to click element" in str(error.value)
+
+
+def test_other_errors_are_not_retried():
+    element = FakeElement([ElementClickInterceptedException()])
+    driver = ResolvingDriver([element, element])
+    page = SeleniumBasePage(driver)
+    with pytest.raises(ElementClickInterceptedException):
+        page.act_on_element(FIELD, lambda element: element.click(), timeout=5)
+    assert len(driver.conditions) == 1
+
+
+def test_unavailable_script_falls_back_to_webdriver_wait():
+    element = FakeElement()
+    driver = ResolvingDriver([element], script_error=True)
+    page = SeleniumBasePage(driver)
+
+    assert page.resolve_element(FIELD, wait=5) is element
+    page.click(FIELD, timeout=5)
+    assert element.clicks == 1
+    assert driver.finds > 0
+    # Without the observer nothing is run in the browser at all
+    page.USE_DOM_OBSERVER = False
+    driver.conditions = []
+    assert page.wait_for_element_to_be_present(FIELD, 5) is element
+    assert driver.conditions == []
+
+
+class CountingDriver(object):
+    """
+    Reports the next of `counts` for every in-browser count wait, or fails
+    the script when `script_error` is set so the page polls find_elements
+    """
+
+    def __init__(self, counts, script_error=False):
+        self.counts = list(counts)
+        self.script_error = script_error
+        self.conditions = []
+        self.finds = 0
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, strategy, value, condition, timeout_ms, recheck_ms):
+        self.conditions.append(condition)
+        if self.script_error:
+            raise WebDriverException("javascript error: script injection blocked")
+        count = self.counts[0]
+        satisfied = (condition["minimum"] is None or count >= condition["minimum"]) and (
+            condition["maximum"] is None or count <= condition["maximum"]
+        )
+        return {"satisfied": satisfied, "value": count, "elapsed": 0.01 if satisfied else timeout_ms / 1000}
+
+    def find_elements(self, strategy, value):
+        self.finds += 1
+        count = self.counts.pop(0) if len(self.counts) > 1 else self.counts[0]
+        return [object()] * count
+
+
+@pytest.mark.parametrize(
+    "bounds, condition",
+    [
+        ({"exact": 3}, (3, 3)),
+        ({"minimum": 1}, (1, None)),
+        ({"maximum": 5}, (None, 5)),
+        ({"minimum": 2, "maximum": 4}, (2, 4)),
+    ],
+)
+def test_count_bounds_become_one_browser_condition(bounds, condition):
+    driver = CountingDriver([3])
+    assert SeleniumBasePage(driver).wait_for_count(FIELD, timeout=5, **bounds) == 0.01
+    (sent,) = driver.conditions
+    assert (sent["minimum"], sent["maximum"]) == condition
+
+
+@pytest.mark.parametrize(
+    "bounds",
+    [{}, {"exact": 2, "minimum": 1}, {"minimum": -1}, {"minimum": 4, "maximum": 2}],
+)
+def test_invalid_count_bounds_are_rejected(bounds):
+    driver = CountingDriver([3])
+    with pytest.raises(ValueError):
+        SeleniumBasePage(driver).wait_for_count(FIELD, timeout=5, **bounds)
+    assert driver.conditions == []
+
+
+def test_polling_fallback_counts_again_each_round():
+    driver = CountingDriver([0, 1, 2], script_error=True)
+    SeleniumBasePage(driver).wait_for_count(FIELD, minimum=2, timeout=5)
+    assert driver.finds == 3
+
+
+def test_count_timeout_reports_the_last_count():
+    driver = CountingDriver([7])
+    with pytest.raises(TimeoutError) as error:
+        SeleniumBasePage(driver).wait_for_count(FIELD, maximum=5, timeout=0.2)
+    assert "Found 7 elements" in str(error.value)
+    assert "expected at most 5" in str(error.value)
+
+    driver = CountingDriver([0, 1], script_error=True)
+    with pytest.raises(TimeoutError) as error:
+        SeleniumBasePage(driver).wait_for_count(FIELD, minimum=2, maximum=3, timeout=0.3)
+    assert "Found 1 elements" in str(error.value)
+    assert "expected between 2 and 3" in str(error.value)
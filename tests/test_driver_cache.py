@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import stat
+
+from hulu_bot import driver_cache
+from hulu_bot.driver_cache import DriverCache
+
+"""
+DriverCache: the Chrome version and patched chromedriver kept between runs,
+with a shell script standing in for Chrome
+"""
+
+
+def fake_chrome(path, version):
+    # Appends a line to <path>.runs every time it is asked for its version
+    path.write_text(f'#!/bin/sh\necho x >> "$0.runs"\necho "Google Chrome {version} "\n')
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def version_runs(chrome):
+    try:
+        with open(f"{chrome}.runs") as file:
+            return len(file.readlines())
+    except FileNotFoundError:
+        return 0
+
+
+def patched_driver(tmp_path, content=b"patched chromedriver"):
+    path = tmp_path / "undetected_chromedriver"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_chrome_version_is_kept_per_chrome_binary(tmp_path):
+    chrome = fake_chrome(tmp_path / "chrome", "120.0.6099.109")
+    cache = DriverCache(str(tmp_path / "cache"), chrome_executable=chrome)
+
+    timings = {}
+    assert cache.chrome_version(timings=timings) == "120.0.6099.109"
+    assert cache.chrome_version() == "120.0.6099.109"
+    assert version_runs(chrome) == 1
+    assert "chrome_version_ms" in timings
+    with open(cache.manifest_path) as file:
+        known = json.load(file)["chrome"][chrome]
+    assert known["version"] == "120.0.6099.109"
+    assert known["size"] == os.path.getsize(chrome)
+
+    # An updated Chrome is a different binary on disk
+    fake_chrome(tmp_path / "chrome", "121.0.6167.85")
+    assert cache.chrome_version() == "121.0.6167.85"
+    assert version_runs(chrome) == 2
+
+
+def test_store_then_lookup_and_launch_copy(tmp_path):
+    chrome = fake_chrome(tmp_path / "chrome", "120.0.6099.109")
+    cache = DriverCache(str(tmp_path / "cache"), chrome_executable=chrome)
+    assert cache.lookup()[:2] == (None, 120)
+
+    cached, timings = cache.store(patched_driver(tmp_path), 120)
+    assert os.path.dirname(cached) == str(tmp_path / "cache")
+    assert "driver_store_ms" in timings
+    with open(cache.manifest_path) as file:
+        entry = json.load(file)["drivers"]["120"]
+    assert entry["path"] == cached
+    assert entry["sha256"] == hashlib.sha256(b"patched chromedriver").hexdigest()
+    assert entry["mtime_ns"] == os.stat(cached).st_mtime_ns
+
+    path, major, timings = cache.lookup()
+    assert (path, major) == (cached, 120)
+    assert set(timings) == {"chrome_version_ms", "driver_lookup_ms"}
+
+    launch_path, timings = cache.launch_copy(path)
+    assert os.path.dirname(launch_path) != os.path.dirname(cached)
+    # A hard link, so launching copies nothing
+    assert os.stat(launch_path).st_ino == os.stat(cached).st_ino
+    assert "driver_link_ms" in timings
+
+
+def test_a_changed_driver_or_chrome_invalidates_the_entry(tmp_path):
+    chrome = fake_chrome(tmp_path / "chrome", "120.0.6099.109")
+    cache = DriverCache(str(tmp_path / "cache"), chrome_executable=chrome)
+    cached, _ = cache.store(patched_driver(tmp_path), 120)
+    original = os.stat(cached)
+
+    # Same size and mtime, different bytes: only the sha256 tells
+    with open(cached, "r+b") as file:
+        file.write(b"P")
+    os.utime(cached, ns=(original.st_atime_ns, original.st_mtime_ns))
+    assert cache.lookup()[0] is None
+    assert cache.lookup(verify=False)[0] == cached
+
+    with open(cached, "ab") as file:
+        file.write(b" and more")
+    assert cache.lookup(verify=False)[0] is None
+
+    cache.store(patched_driver(tmp_path), 120)
+    fake_chrome(tmp_path / "chrome", "121.0.6167.85")
+    # Nothing is cached for the new major version yet
+    assert cache.lookup()[:2] == (None, 121)
+
+
+def test_sha256_is_checked_once_per_process(tmp_path, monkeypatch):
+    chrome = fake_chrome(tmp_path / "chrome", "120.0.6099.109")
+    cache = DriverCache(str(tmp_path / "cache"), chrome_executable=chrome)
+    cached, _ = cache.store(patched_driver(tmp_path), 120)
+    checked = []
+    real_sha256 = driver_cache._sha256
+    monkeypatch.setattr(driver_cache, "_sha256", lambda path: checked.append(path) or real_sha256(path))
+
+    assert cache.lookup()[0] == cached
+    assert DriverCache(str(tmp_path / "cache"), chrome_executable=chrome).lookup()[0] == cached
+    assert checked == [cached]
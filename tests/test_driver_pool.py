@@ -0,0 +1,145 @@
+import json
+
+from ui_framework.driver_pool import DriverPool
+
+"""
+DriverPool reuse and the reset between tests, against a fake driver
+"""
+
+
+class _SwitchTo(object):
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class FakeDriver(object):
+    """
+    Tabs as {handle: [urls navigated to]}, the last url being the current
+    page. Frames are {handle: [frame urls]}
+    """
+
+    def __init__(self, tabs, frames=None, performance_log=None):
+        self.tabs = tabs
+        self.frames = frames or {}
+        self.performance_log = performance_log
+        self.current = next(iter(tabs))
+        self.switch_to = _SwitchTo(self)
+        self.cdp_commands = []
+        self.quit_called = False
+
+    @property
+    def window_handles(self):
+        return list(self.tabs)
+
+    @property
+    def current_url(self):
+        return self.tabs[self.current][-1]
+
+    def close(self):
+        del self.tabs[self.current]
+
+    def quit(self):
+        self.quit_called = True
+
+    def execute_script(self, script):
+        if "getEntriesByType" in script:
+            return [self.current_url] + self.frames.get(self.current, [])
+        return None
+
+    def execute_cdp_cmd(self, command, arguments):
+        self.cdp_commands.append((command, arguments))
+        if command == "Page.getNavigationHistory":
+            entries = [{"url": url} for url in self.tabs[self.current]]
+            return {"currentIndex": len(entries) - 1, "entries": entries}
+        return {}
+
+    def get_log(self, log_type):
+        if self.performance_log is None:
+            raise Exception("log type 'performance' not found")
+        entries, self.performance_log = self.performance_log, []
+        return entries
+
+    def get(self, url):
+        self.tabs[self.current].append(url)
+
+    def set_window_size(self, width, height):
+        pass
+
+    def cleared_origins(self):
+        return [
+            arguments["origin"]
+            for command, arguments in self.cdp_commands
+            if command == "Storage.clearDataForOrigin"
+        ]
+
+
+def _document_request(url, resource_type="Document"):
+    message = {"method": "Network.requestWillBeSent", "params": {"type": resource_type, "request": {"url": url}}}
+    return {"message": json.dumps({"message": message})}
+
+
+def test_reset_clears_every_origin_the_test_visited():
+    driver = FakeDriver(
+        {
+            "main": ["https://www.hulu.com/welcome", "https://auth.hulu.com/login", "https://www.hulu.com/hub"],
+            "popup": ["https://help.hulu.com/article"],
+        },
+        frames={"main": ["https://player.example.com/embed"]},
+    )
+    DriverPool(lambda: driver).reset(driver)
+
+    assert driver.window_handles == ["main"]
+    assert driver.cleared_origins() == [
+        "https://auth.hulu.com",
+        "https://help.hulu.com",
+        "https://player.example.com",
+        "https://www.hulu.com",
+    ]
+    assert driver.cdp_commands[-1] == ("Network.clearBrowserCookies", {})
+    assert driver.current_url == "about:blank"
+
+
+def test_reset_includes_documents_from_the_performance_log():
+    driver = FakeDriver(
+        {"main": ["https://www.hulu.com/hub"]},
+        performance_log=[
+            _document_request("https://closed-tab.example.com/"),
+            _document_request("https://cdn.example.com/app.js", resource_type="Script"),
+            {"message": "not json"},
+        ],
+    )
+    DriverPool(lambda: driver).reset(driver)
+    assert driver.cleared_origins() == ["https://closed-tab.example.com", "https://www.hulu.com"]
+
+
+def test_driver_is_recycled_when_the_test_visited_too_many_origins():
+    history = [f"https://site{index}.example.com/" for index in range(5)]
+    created = []
+
+    def create_driver():
+        driver = FakeDriver({"main": ["about:blank"]})
+        created.append(driver)
+        return driver
+
+    pool = DriverPool(create_driver, max_cleared_origins=4)
+    driver = pool.acquire()
+    driver.tabs["main"].extend(history)
+    pool.release(driver)
+
+    assert driver.quit_called
+    assert driver.cleared_origins() == []
+    assert pool.stats()["idle"] == 0
+    assert pool.acquire() is not driver
+
+
+def test_released_driver_is_reused_after_reset():
+    pool = DriverPool(lambda: FakeDriver({"main": ["about:blank"]}))
+    driver = pool.acquire()
+    driver.get("https://www.hulu.com/hub")
+    pool.release(driver)
+    assert pool.acquire() is driver
+    assert pool.stats() == {"created": 1, "reused": 1, "recycled": 0, "idle": 0}
@@ -0,0 +1,100 @@
+import functools
+import gzip
+import json
+import os
+import threading
+import time
+
+import tests
+from ui_framework import failure_artifacts
+from ui_framework.failure_artifacts import ArtifactWriter, capture_failure_artifacts
+
+"""
+Failure artifact capture within its time budget and the background writer
+"""
+
+
+class FakeDriver(object):
+
+    def __init__(self, page_source_seconds=0):
+        self.page_source_seconds = page_source_seconds
+        self.logs_read = []
+        self.released = threading.Event()
+
+    def execute_cdp_cmd(self, command, arguments):
+        return {"data": "aGVsbG8="}
+
+    @property
+    def page_source(self):
+        # A hung page, released at the end of the test
+        self.released.wait(self.page_source_seconds)
+        return "<html></html>"
+
+    def get_log(self, log_type):
+        self.logs_read.append(log_type)
+        return [{"timestamp": 2000, "message": "new"}, {"timestamp": 500, "message": "old"}]
+
+
+def test_capture_writes_screenshot_dom_and_logs(tmp_path):
+    driver = FakeDriver()
+    writer = ArtifactWriter()
+    capture = capture_failure_artifacts(
+        driver, str(tmp_path), "test/name", writer, since=1, log_types=("browser", "performance")
+    )
+    writer.close()
+
+    base = tmp_path / "test_name"
+    assert not capture.timed_out
+    assert capture.queued == [f"{base}.jpg", f"{base}.html", f"{base}.browser.jsonl", f"{base}.performance.jsonl"]
+    assert (tmp_path / "test_name.jpg").read_bytes() == b"hello"
+    with gzip.open(tmp_path / "test_name.browser.jsonl.gz", "rt") as file:
+        # Entries from before the test started are dropped
+        assert [json.loads(line)["message"] for line in file] == ["new"]
+    assert writer.written == 4
+
+
+def test_capture_reads_only_the_requested_logs(tmp_path):
+    driver = FakeDriver()
+    writer = ArtifactWriter()
+    capture_failure_artifacts(driver, str(tmp_path), "name", writer)
+    writer.close()
+    assert driver.logs_read == ["browser"]
+
+
+def test_a_hung_step_stops_capture_at_the_budget(tmp_path):
+    driver = FakeDriver(page_source_seconds=30)
+    writer = ArtifactWriter()
+    started = time.monotonic()
+    capture = capture_failure_artifacts(driver, str(tmp_path), "name", writer, budget=0.5)
+    elapsed = time.monotonic() - started
+    driver.released.set()
+    writer.close()
+
+    assert elapsed < 2
+    # The DOM read was abandoned and the logs were never asked for
+    assert capture.queued == [os.path.join(str(tmp_path), "name.jpg")]
+    assert capture.timed_out
+    assert driver.logs_read == []
+
+
+class FakeRequest(object):
+
+    def __init__(self, test_result):
+        self.node = type("Node", (), {"name": "test_play", "test_result": test_result})()
+        self.config = type("Config", (), {"getoption": staticmethod(lambda name: False)})()
+
+
+def test_snapshot_tells_the_caller_when_the_browser_hung(tmp_path, monkeypatch):
+    monkeypatch.setattr(tests, "SCREENSHOTS_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(tests, "capture_failure_artifacts", functools.partial(
+        failure_artifacts.capture_failure_artifacts, budget=0.5
+    ))
+    hung = FakeDriver(page_source_seconds=30)
+    try:
+        assert tests.take_failure_snapshot(hung, FakeRequest("failed")) is True
+        assert tests.take_failure_snapshot(FakeDriver(), FakeRequest("failed")) is False
+        # Passing tests capture nothing
+        assert tests.take_failure_snapshot(hung, FakeRequest("passed")) is False
+    finally:
+        hung.released.set()
+        tests.ARTIFACT_WRITER.flush()
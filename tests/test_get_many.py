@@ -0,0 +1,139 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+from selenium.webdriver.common.by import By
+
+from ui_framework import dom_waits
+from ui_framework.base_selenium_page import SeleniumBasePage
+
+"""
+SeleniumBasePage.get_many and iter_many: chunked reads of many elements in
+as few script calls as possible, and the fields GET_MANY_JS reads
+"""
+
+TILES = (By.CSS_SELECTOR, "div.tile")
+
+# Runs a page script in node against stub elements built from JSON specs
+NODE_RUNNER = r"""
+var input = JSON.parse(require("fs").readFileSync(0, "utf8"));
+function makeElement(spec) {
+    var element = {
+        tagName: spec.tag.toUpperCase(),
+        innerText: spec.text || "",
+        isConnected: true,
+        children: [],
+        style: spec.style || {},
+        getAttribute: function (name) {
+            return name in (spec.attributes || {}) ? spec.attributes[name] : null;
+        },
+        getBoundingClientRect: function () { return {width: 100, height: 20}; },
+        checkVisibility: function () { return !spec.hidden; }
+    };
+    return Object.assign(element, spec.properties || {});
+}
+var elements = input.elements.map(makeElement);
+globalThis.document = {querySelectorAll: function () { return elements; }};
+globalThis.getComputedStyle = function (element) {
+    return {getPropertyValue: function (name) { return element.style[name] || ""; }};
+};
+var result = new Function(input.script).apply(null, input.args);
+process.stdout.write(JSON.stringify(result));
+"""
+
+
+class SlicingDriver(object):
+    """
+    Answers GET_MANY_JS like the browser would for `count` matches, and
+    remembers the offset and limit of every call
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.calls = []
+
+    def execute_script(self, script, strategy, value, fields, offset, limit):
+        assert script == dom_waits.GET_MANY_JS
+        self.calls.append((offset, limit))
+        end = self.count if limit is None else min(self.count, offset + limit)
+        records = [{field: f"{field}-{index}" for field in fields} for index in range(offset, end)]
+        return {"total": self.count, "records": records}
+
+
+class NodeDriver(object):
+
+    def __init__(self, elements):
+        self.elements = elements
+
+    def execute_script(self, script, *args):
+        output = subprocess.run(
+            ["node", "-e", NODE_RUNNER],
+            input=json.dumps({"script": script, "args": list(args), "elements": self.elements}),
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=30,
+        ).stdout
+        return json.loads(output)
+
+
+@pytest.mark.parametrize(
+    "count, chunk_size, expected_calls",
+    [
+        (7, None, [(0, None)]),
+        (6, 3, [(0, 3), (3, 3)]),
+        (7, 3, [(0, 3), (3, 3), (6, 3)]),
+        (2, 3, [(0, 3)]),
+        (0, 3, [(0, 3)]),
+        (0, None, [(0, None)]),
+    ],
+)
+def test_chunks_cover_every_match_once(count, chunk_size, expected_calls):
+    driver = SlicingDriver(count)
+    records = SeleniumBasePage(driver).get_many(TILES, ["text"], chunk_size=chunk_size)
+
+    assert [record["text"] for record in records] == [f"text-{index}" for index in range(count)]
+    assert driver.calls == expected_calls
+
+
+def test_iter_many_fetches_chunks_as_they_are_consumed():
+    driver = SlicingDriver(10)
+    records = SeleniumBasePage(driver).iter_many(TILES, ("href",), chunk_size=4)
+
+    assert next(records) == {"href": "href-0"}
+    assert driver.calls == [(0, 4)]
+    assert len(list(records)) == 9
+    assert driver.calls == [(0, 4), (4, 4), (8, 4)]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="runs the page script in node")
+def test_fields_are_read_by_prefix():
+    elements = [
+        {
+            "tag": "a",
+            "text": "Palm Springs \n",
+            "attributes": {"href": "/watch/1", "data-id": "42", "class": "tile wide"},
+            "properties": {"href": "https://www.hulu.com/watch/1", "hidden": False},
+            "style": {"color": "rgb(1, 2, 3)"},
+        },
+        {"tag": "div", "text": "Behind a spoiler", "hidden": True, "attributes": {"class": "tile"}},
+    ]
+    fields = ["text", "displayed", "tag", "css:color", "attribute:href", "href", "data-id", "class", "hidden"]
+    shown, hidden = SeleniumBasePage(NodeDriver(elements)).get_many(TILES, fields)
+
+    assert shown == {
+        "text": "Palm Springs",
+        "displayed": True,
+        "tag": "a",
+        "css:color": "rgba(1, 2, 3, 1)",
+        # Properties win over attributes, like Selenium's get_attribute
+        "attribute:href": "https://www.hulu.com/watch/1",
+        "href": "https://www.hulu.com/watch/1",
+        "data-id": "42",
+        "class": "tile wide",
+        "hidden": None,
+    }
+    assert hidden["text"] == ""
+    assert hidden["displayed"] is False
+    assert hidden["href"] is None
@@ -0,0 +1,106 @@
+import pytest
+
+from ui_framework import instrumentation
+from ui_framework.instrumentation import ActionProfiler, _locator_from_arguments, instrument_public_methods
+
+"""
+ActionProfiler records, per test hand-off and the totals kept for the summary
+"""
+
+
+class FakeDriver(object):
+
+    def execute(self, command, params=None):
+        return {"value": None}
+
+
+@instrument_public_methods
+class FakePage(object):
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def click(self, locator):
+        self.wait_for_element(locator)
+        self.driver.execute("clickElement")
+
+    def wait_for_element(self, locator):
+        instrumentation.record("polls")
+        self.driver.execute("findElement")
+
+
+@pytest.fixture
+def profiler():
+    profiler = ActionProfiler()
+    instrumentation.set_active_profiler(profiler)
+    yield profiler
+    instrumentation.set_active_profiler(None)
+
+
+def test_records_are_handed_out_once_per_test(profiler):
+    page = FakePage(FakeDriver())
+    profiler.start_test("test_one")
+    page.click(("id", "play"))
+    first = profiler.end_test()
+    profiler.start_test("test_two")
+    page.wait_for_element(("id", "title"))
+    second = profiler.end_test()
+
+    assert [(action.test, action.path) for action in first] == [
+        ("test_one", ("click", "wait_for_element")),
+        ("test_one", ("click",)),
+    ]
+    assert first[1].commands == 2 and first[1].polls == 1
+    assert [action.test for action in second] == ["test_two"]
+    # Nothing is held on to once a test has ended
+    assert not profiler.records
+
+
+def test_totals_outlive_the_records(profiler):
+    page = FakePage(FakeDriver())
+    for test_name in ("test_one", "test_two"):
+        profiler.start_test(test_name)
+        page.click(("id", "play"))
+        page.click(("id", "play"))
+        profiler.end_test()
+
+    slowest = profiler.slowest()
+    assert [(entry["method"], entry["locator"], entry["calls"]) for entry in slowest] == [
+        ("click", "id=play", 4)
+    ]
+    assert slowest[0]["commands"] == 8
+    assert slowest[0]["polls"] == 4
+
+
+def test_worker_summaries_add_up():
+    worker = {"method": "click", "locator": "id=play", "calls": 2, "wall_ms": 30.0, "max_ms": 20.0,
+              "commands": 4, "polls": 0, "stale_retries": 1}
+    controller = ActionProfiler()
+    controller.add_summary([worker])
+    controller.add_summary([dict(worker, wall_ms=10.0, max_ms=6.0)])
+
+    (entry,) = controller.slowest()
+    assert entry["calls"] == 4
+    assert entry["wall_ms"] == 40.0
+    assert entry["max_ms"] == 20.0
+    assert entry["stale_retries"] == 2
+    assert controller.summary() == [entry]
+
+
+def test_folded_stacks_of_records_not_yet_handed_out(profiler):
+    profiler.start_test("test_one")
+    FakePage(FakeDriver()).click(("id", "play"))
+    folded = profiler.folded_stacks()
+    assert folded.startswith("test_one;click ")
+    assert "test_one;click;wait_for_element " in folded
+
+
+def test_only_selenium_locators_are_labelled():
+    assert _locator_from_arguments((("css selector", "div.tile"),), {}) == "css selector=div.tile"
+    assert _locator_from_arguments((), {"element_locator": ("id", "play")}) == "id=play"
+    # Unpacked, as scroll_into_view(*loc) receives it
+    assert _locator_from_arguments(("xpath", "//button"), {"align_to_top": False}) == "xpath=//button"
+    # Two strings that are not a locator, like send_keys(keys, ...) or attribute checks
+    assert _locator_from_arguments(("hello", "world"), {}) is None
+    assert _locator_from_arguments(("class", "active", ("id", "menu")), {}) == "id=menu"
+    assert _locator_from_arguments((("width", "100px"),), {}) is None
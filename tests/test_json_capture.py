@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from hulu_bot import title_extraction
+from hulu_bot.json_capture import (
+    REPLAY_COLLECTION_URL_PATTERN,
+    NetworkCapture,
+    entities_from_payload,
+    payloads_from_har,
+    unique_entities,
+)
+from ui_framework.har_replay import HarReplayServer
+
+"""
+Title capture from content API payloads, replayed from a trimmed HAR of the
+movies hub: the page with its tiles and the content API call it makes
+"""
+
+HAR_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "hulu_movies_hub.har")
+PAGE_URL = "https://www.hulu.com/hub/movies"
+COLLECTION_URL = "https://discover.hulu.com/content/v5/hubs/movies?schema=1&limit=999"
+EXPECTED_TITLES = [
+    "Love for Sale",
+    "The Great British Baking Show",
+    "Palm Springs",
+    "Pilot",
+]
+
+
+def recorded_payload():
+    payloads = payloads_from_har(HAR_PATH)
+    assert len(payloads) == 1
+    return payloads[0]
+
+
+def test_entities_from_recorded_payload():
+    entities = entities_from_payload(recorded_payload())
+
+    # Collections, view-all links and blank names are not titles; the
+    # duplicate in the second collection is still listed here
+    assert [entity["title"] for entity in entities] == [
+        "Love for Sale",
+        "The Great British Baking Show",
+        "Palm Springs",
+        "Love for Sale",
+        "Pilot",
+    ]
+    movie = entities[0]
+    assert movie["id"] == "a1b2c3-movie-1"
+    assert movie["type"] == "movie"
+    assert movie["metadata"]["genre_names"] == ["Drama", "Romance"]
+    assert movie["metadata"]["duration"] == 5940
+    series = entities[1]
+    assert series["type"] == "series"
+    assert series["metadata"]["series_name"] == "The Great British Baking Show"
+
+
+def test_unique_entities_keeps_first_of_each_id():
+    entities = unique_entities([recorded_payload(), recorded_payload()])
+    assert [entity["title"] for entity in entities] == EXPECTED_TITLES
+
+
+def test_payloads_from_har_only_reads_collection_responses():
+    # The profile response is JSON too, but not from the content API
+    assert len(payloads_from_har(HAR_PATH, url_pattern=re.compile("json|api|content"))) == 2
+    assert payloads_from_har(HAR_PATH) == [recorded_payload()]
+
+
+def test_dom_fallback_reads_the_same_titles_from_the_recorded_page():
+    with open(HAR_PATH) as file:
+        entries = json.load(file)["log"]["entries"]
+    page = next(entry for entry in entries if entry["request"]["url"] == PAGE_URL)
+    titles = title_extraction.extract_titles_from_html(page["response"]["content"]["text"])
+
+    captured = {entity["title"] for entity in unique_entities([recorded_payload()])}
+    assert titles == ["Love for Sale", "Palm Springs", "The Great British Baking Show"]
+    assert set(titles) <= captured
+
+
+def _log_entry(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+class ReplayLogDriver(object):
+    """
+    Stands in for the browser: opening a URL from the replay server writes
+    the performance log entries Chrome would, and response bodies are read
+    back from the replay server like Network.getResponseBody would
+    """
+
+    def __init__(self):
+        self._log = []
+        self._bodies = {}
+
+    def open(self, url, mime_type="application/json"):
+        request_id = str(len(self._bodies) + 1)
+        with urllib.request.urlopen(url) as response:
+            self._bodies[request_id] = response.read().decode("utf-8")
+        self._log.append(
+            _log_entry("Network.responseReceived", requestId=request_id, response={"url": url, "mimeType": mime_type})
+        )
+        self._log.append(_log_entry("Network.loadingFinished", requestId=request_id))
+
+    def get_log(self, log_type):
+        assert log_type == "performance"
+        entries, self._log = self._log, []
+        return entries
+
+    def execute_cdp_cmd(self, command, arguments):
+        assert command == "Network.getResponseBody"
+        return {"body": self._bodies[arguments["requestId"]], "base64Encoded": False}
+
+
+def test_capture_round_trip_through_har_replay():
+    with HarReplayServer(HAR_PATH) as replay:
+        # Recorded origins in the page are rewritten to the replay server
+        with urllib.request.urlopen(replay.url_for(PAGE_URL)) as response:
+            page = response.read().decode("utf-8")
+        assert replay.url_for(COLLECTION_URL) in page
+
+        driver = ReplayLogDriver()
+        capture = NetworkCapture(driver, REPLAY_COLLECTION_URL_PATTERN)
+        capture.reset()
+        driver.open(replay.url_for(PAGE_URL), mime_type="text/html")
+        driver.open(replay.url_for(COLLECTION_URL))
+        payloads = capture.wait_for_payloads(timeout=5, quiet_time=0)
+
+        assert payloads == [recorded_payload()]
+        assert [entity["title"] for entity in unique_entities(payloads)] == EXPECTED_TITLES
+        assert replay.misses == []
+
+
+def test_har_replay_reports_requests_it_has_no_recording_for():
+    with HarReplayServer(HAR_PATH) as replay:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{replay.url}/content/v5/hubs/tv")
+        assert error.value.code == 404
+        assert replay.misses == ["GET /content/v5/hubs/tv"]
+
+
+def test_collect_falls_back_to_the_page_without_payloads(monkeypatch):
+    pytest.importorskip("undetected_chromedriver")
+    from hulu_bot import hulu_session
+
+    session = hulu_session.HuluSession.__new__(hulu_session.HuluSession)
+    session.network_capture = object()
+    monkeypatch.setattr(session, "capture_entities", lambda target: [], raising=False)
+    monkeypatch.setattr(session, "collect_titles", lambda section_locator=None: ["From the page"], raising=False)
+
+    assert session.collect("movies") == ["From the page"]
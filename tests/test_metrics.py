@@ -0,0 +1,228 @@
+import json
+import socket
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import api_client
+from api_client import BaseAPITClient
+from api_client.metrics import (
+    Histogram,
+    HistogramSink,
+    JsonLinesSink,
+    PrometheusExporter,
+    RequestMetrics,
+    build_metrics,
+)
+
+"""
+Bucketed latency histograms and their percentile estimates, the connection
+timings the pooled connections record and the sinks they are written to
+"""
+
+
+class ListSink(object):
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, metrics):
+        self.records.append(metrics)
+
+
+class _ItemHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    hosts = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.hosts.append(self.headers["Host"])
+        body = b'{"id": 123}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def item_server():
+    _ItemHandler.hosts = []
+    # Bound to IPv4 loopback only, "localhost" may resolve to other addresses first
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ItemHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def metrics_record(**fields):
+    defaults = dict(
+        method="GET", url="http://api.test/items/1", endpoint="GET api.test/items/{id}", status_code=200,
+        dns_ms=1.0, connect_ms=2.0, tls_ms=0.0, ttfb_ms=30.0, total_ms=40.0, bytes_out=0, bytes_in=11,
+        retries=0, reused_connection=False, error=None,
+    )
+    defaults.update(fields)
+    return RequestMetrics(**defaults)
+
+
+def test_empty_histogram_has_no_percentiles():
+    assert Histogram().percentile(50) is None
+
+
+def test_values_on_a_bound_fall_in_the_bucket_it_closes():
+    histogram = Histogram(buckets=(1, 10, 100))
+    for value in (1, 10, 10.5, 100, 1000):
+        histogram.observe(value)
+    assert histogram.counts == [1, 1, 2, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(1121.5)
+
+
+def test_percentile_interpolates_inside_the_bucket():
+    histogram = Histogram()
+    for _ in range(10):
+        histogram.observe(3)
+    # All ten in (2.5, 5], the median sits halfway through that bucket
+    assert histogram.percentile(50) == 3.75
+    assert histogram.percentile(100) == 5
+
+
+def test_percentiles_of_a_two_mode_distribution():
+    histogram = Histogram()
+    for _ in range(50):
+        histogram.observe(0.5)
+        histogram.observe(80)
+    assert histogram.percentile(50) == 1.0
+    assert histogram.percentile(90) == 90.0
+    assert histogram.percentile(99) == 99.0
+
+
+def test_values_past_the_last_bucket_are_estimated_up_to_twice_its_bound():
+    histogram = Histogram(buckets=(10, 100))
+    histogram.observe(150)
+    histogram.observe(500)
+    assert histogram.percentile(50) == 150.0
+    assert histogram.percentile(100) == 200.0
+
+
+def test_connection_phases_are_timed_once_per_connection(item_server):
+    sink = ListSink()
+    with BaseAPITClient(metrics_sinks=[sink]) as client:
+        for _ in range(2):
+            client.get(f"http://localhost:{item_server}/items/123", verbose=False)
+
+    first, second = sink.records
+    assert first.endpoint == f"GET localhost:{item_server}/items/{{id}}"
+    assert (first.status_code, first.bytes_in, first.error) == (200, 11, None)
+    assert first.reused_connection is False
+    assert first.connect_ms > 0 and first.ttfb_ms > 0
+    assert first.total_ms >= first.ttfb_ms
+    # The kept-alive connection has no setup of its own
+    assert second.reused_connection is True
+    assert (second.dns_ms, second.connect_ms, second.tls_ms) == (0.0, 0.0, 0.0)
+
+
+def test_unreachable_addresses_fall_through_to_the_next(item_server, monkeypatch):
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args):
+        resolved = real_getaddrinfo("127.0.0.1", port, *args)
+        if host != "localhost":
+            return resolved
+        # Nothing listens on 127.0.0.2, the connection there is refused
+        return real_getaddrinfo("127.0.0.2", port, *args) + resolved
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    sink = ListSink()
+    with BaseAPITClient(metrics_sinks=[sink]) as client:
+        response = client.get(f"http://localhost:{item_server}/items/123", verbose=False)
+
+    assert response.status_code == 200
+    # The name, not the address that answered, is what the server sees
+    assert _ItemHandler.hosts == [f"localhost:{item_server}"]
+    (record,) = sink.records
+    assert record.connect_ms > 0 and record.error is None
+
+
+def test_no_reachable_address_is_an_error(item_server, monkeypatch):
+    real_getaddrinfo = socket.getaddrinfo
+    monkeypatch.setattr(
+        socket, "getaddrinfo", lambda host, port, *args: real_getaddrinfo("127.0.0.2", port, *args)
+    )
+    monkeypatch.setattr(api_client, "RETRY_TIMES", 0)
+    sink = ListSink()
+    with BaseAPITClient(metrics_sinks=[sink]) as client:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get(f"http://localhost:{item_server}/items/123", verbose=False)
+
+    (record,) = sink.records
+    assert record.status_code is None
+    assert "ConnectionError" in record.error
+
+
+def test_build_metrics_reads_retries_and_bytes_from_the_response():
+    class Raw(object):
+        retries = type("History", (), {"history": ("503", "503")})()
+
+        def tell(self):
+            return 512
+
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = Raw()
+    timings = {"dns_ms": 1.23456, "connect_ms": 2.0, "ttfb_ms": 9.0, "bytes_out": 64, "reused_connection": True}
+    metrics = build_metrics("PUT", "http://api.test/items/123/art", timings, 20.0, response)
+
+    assert metrics.endpoint == "PUT api.test/items/{id}/art"
+    assert (metrics.dns_ms, metrics.tls_ms, metrics.bytes_out, metrics.bytes_in) == (1.235, 0.0, 64, 512)
+    assert (metrics.retries, metrics.reused_connection) == (2, True)
+
+    failed = build_metrics("GET", "http://api.test/items", {}, 5.0, error=TimeoutError("slow"))
+    assert (failed.status_code, failed.bytes_in, failed.error) == (None, 0, "TimeoutError('slow')")
+
+
+def test_json_lines_sink_writes_one_record_per_line(tmp_path):
+    sink = JsonLinesSink(str(tmp_path / "metrics.jsonl"))
+    sink.record(metrics_record())
+    sink.record(metrics_record(status_code=None, error="TimeoutError()"))
+    sink.close()
+
+    with open(tmp_path / "metrics.jsonl") as file:
+        lines = [json.loads(line) for line in file]
+    assert lines[0] == metrics_record()._asdict()
+    assert lines[1]["error"] == "TimeoutError()"
+
+
+def test_prometheus_exporter_serves_histograms_and_counters():
+    exporter = PrometheusExporter(port=0)
+    try:
+        exporter.record(metrics_record())
+        exporter.record(metrics_record(total_ms=400.0, retries=1, reused_connection=True))
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+            content_type = response.headers["Content-Type"]
+            text = response.read().decode()
+    finally:
+        exporter.close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    label = 'endpoint="GET api.test/items/{id}"'
+    lines = text.splitlines()
+    assert "# TYPE api_client_request_total_milliseconds histogram" in lines
+    assert f'api_client_request_total_milliseconds_bucket{{{label},le="50"}} 1' in lines
+    assert f'api_client_request_total_milliseconds_bucket{{{label},le="500"}} 2' in lines
+    assert f'api_client_request_total_milliseconds_bucket{{{label},le="+Inf"}} 2' in lines
+    assert f"api_client_request_total_milliseconds_sum{{{label}}} 440.0" in lines
+    assert f"api_client_retries_total{{{label}}} 1" in lines
+    assert f"api_client_reused_connections_total{{{label}}} 1" in lines
+
+
+def test_prometheus_labels_are_escaped():
+    histograms = HistogramSink()
+    histograms.record(metrics_record(endpoint='GET api.test/say/"hi"\\'))
+    assert 'endpoint="GET api.test/say/\\"hi\\"\\\\"' in histograms.prometheus_text()
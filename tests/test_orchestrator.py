@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from hulu_bot import orchestrator
+from hulu_bot.orchestrator import HarvestJob, HarvestOrchestrator, _take_job
+from hulu_bot.title_store import TitleStore
+
+"""
+HarvestOrchestrator with worker processes running StubSession instead of a
+browser. A job's target tells the stub what to do:
+
+    titles:A,B      return those titles
+    flaky:<path>    fail the first time (creates <path>), then succeed
+    crash:          exit the worker process
+    meet:<dir>      wait until every job given this target is running at once
+    hang:<path>     start a child process standing in for the browser, write
+                    its pid to <path> and never return
+"""
+
+
+class StubSession(object):
+
+    def __init__(self, title_store=None):
+        self.title_store = title_store
+
+    def resume_or_login(self, username, password, profile_name):
+        if username == "locked-out":
+            raise Exception("login rejected")
+        return True
+
+    def collect(self, target):
+        kind, _, argument = target.partition(":")
+        if kind == "titles":
+            return argument.split(",")
+        if kind == "flaky":
+            if not os.path.exists(argument):
+                open(argument, "w").close()
+                raise Exception("flaky tab")
+            return ["Recovered"]
+        if kind == "crash":
+            os._exit(3)
+        if kind == "meet":
+            directory, _, count = argument.rpartition("/")
+            open(os.path.join(directory, str(os.getpid())), "w").close()
+            deadline = time.monotonic() + 10
+            while len(os.listdir(directory)) < int(count):
+                if time.monotonic() > deadline:
+                    raise Exception("the other jobs never started")
+                time.sleep(0.05)
+            return [f"Met {count}"]
+        if kind == "hang":
+            browser = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(120)"])
+            with open(argument, "w") as file:
+                file.write(str(browser.pid))
+            time.sleep(120)
+        raise Exception(f"Unknown stub target {target}")
+
+    def close(self):
+        pass
+
+
+def job(target, username="viewer@example.com", profile_name="Kids"):
+    return HarvestJob(username, "secret", profile_name, target)
+
+
+def is_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            # Zombies are dead, just not reaped by a parent
+            return file.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def run_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(orchestrator, "RESULT_POLL_SECONDS", 0.1)
+
+    def run_jobs(jobs, **options):
+        store = TitleStore(str(tmp_path / "titles.db"), legacy_file=None)
+        options.setdefault("workers", 2)
+        harvest = HarvestOrchestrator(title_store=store, session_factory=StubSession, **options)
+        new_titles, results = harvest.run(jobs)
+        assert multiprocessing.active_children() == []
+        return store, new_titles, results
+
+    return run_jobs
+
+
+def test_titles_of_every_worker_are_merged_once(run_jobs):
+    store, new_titles, results = run_jobs(
+        [job("titles:Palm Springs,Pilot"), job("titles:Pilot,Love for Sale"), job("titles:Pilot", profile_name="Main")]
+    )
+    assert sorted(new_titles) == ["Love for Sale", "Palm Springs", "Pilot"]
+    assert len(store) == 3
+    assert [(result.error, result.attempts) for result in results] == [(None, 1)] * 3
+    assert results[0].titles == ["Palm Springs", "Pilot"]
+
+
+def test_failed_jobs_are_retried_on_a_fresh_worker(run_jobs, tmp_path):
+    store, new_titles, results = run_jobs(
+        [job(f"flaky:{tmp_path / 'failed-once'}"), job("crash:"), job("titles:Pilot")], retries=1
+    )
+    flaky, crash, ok = results
+    assert (flaky.error, flaky.attempts, flaky.titles) == (None, 2, ["Recovered"])
+    assert crash.attempts == 2
+    assert crash.titles is None
+    assert "exited with code 3" in crash.error or "lost the worker" in crash.error
+    assert (ok.error, ok.attempts) == (None, 1)
+    assert sorted(new_titles) == ["Pilot", "Recovered"]
+
+
+def test_errors_are_reported_after_the_last_retry(run_jobs):
+    store, new_titles, (result,) = run_jobs([job("titles:Pilot", username="locked-out")], retries=2)
+    assert result.error == "Exception('login rejected')"
+    assert result.attempts == 3
+    assert new_titles == [] and len(store) == 0
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="checks processes through /proc")
+def test_timed_out_jobs_are_killed_with_their_browser(run_jobs, tmp_path):
+    pid_file = tmp_path / "browser.pid"
+    started = time.monotonic()
+    store, new_titles, results = run_jobs(
+        [job(f"hang:{pid_file}"), job("titles:Pilot")], job_timeout=3, retries=0
+    )
+    hung, ok = results
+    assert hung.error == "timed out after 3 seconds"
+    assert hung.attempts == 1
+    assert ok.error is None
+    assert time.monotonic() - started < 20
+    assert not is_running(int(pid_file.read_text()))
+
+
+def test_jobs_of_one_account_run_side_by_side(run_jobs, tmp_path):
+    (tmp_path / "meet").mkdir()
+    store, new_titles, results = run_jobs([job(f"meet:{tmp_path / 'meet'}/4")] * 4, workers=4, retries=0)
+    # Each job only finishes once all four are running
+    assert [result.error for result in results] == [None] * 4
+
+
+def test_take_job_prefers_the_workers_account():
+    jobs = [job("titles:A", profile_name="Main"), job("titles:B"), job("titles:C", profile_name="Main")]
+    pending = [(0, 1), (1, 1), (2, 1)]
+    assert _take_job(pending, jobs, ("viewer@example.com", "Kids")) == (1, 1)
+    assert _take_job(pending, jobs, ("other@example.com", "Kids")) == (0, 1)
+    assert pending == [(2, 1)]
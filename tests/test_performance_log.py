@@ -0,0 +1,105 @@
+import json
+
+from ui_framework import performance_log, resource_blocking
+from ui_framework.driver_pool import DriverPool, _logged_document_origins
+from ui_framework.performance_log import PerformanceLogBuffer
+
+"""
+The shared performance log buffer: every reader sees every entry once, no
+matter who drained the browser's log first
+"""
+
+
+class LogDriver(object):
+    """
+    get_log drains what was logged, like the real browser
+    """
+
+    def __init__(self):
+        self.logged = []
+        self.drains = 0
+
+    def log(self, *entries):
+        self.logged.extend(entries)
+
+    def get_log(self, log_type):
+        assert log_type == "performance"
+        self.drains += 1
+        entries, self.logged = self.logged, []
+        return entries
+
+    def execute_script(self, script):
+        return None
+
+
+def document_request(request_id, url):
+    message = {"method": "Network.requestWillBeSent",
+               "params": {"requestId": request_id, "type": "Document", "request": {"url": url}}}
+    return {"timestamp": 1000, "message": json.dumps({"message": message})}
+
+
+def test_each_reader_sees_every_entry_once():
+    driver = LogDriver()
+    first, second = performance_log.reader(driver), performance_log.reader(driver)
+    driver.log("a", "b")
+
+    assert first.read() == ["a", "b"]
+    driver.log("c")
+    assert second.read() == ["a", "b", "c"]
+    assert first.read() == ["c"]
+    assert second.read() == []
+
+
+def test_named_readers_pick_up_where_they_stopped():
+    driver = LogDriver()
+    driver.log("a")
+    assert performance_log.reader(driver, "report").read() == ["a"]
+    driver.log("b")
+    assert performance_log.reader(driver, "report").read() == ["b"]
+    # A new reader starts at the oldest entry some reader still has to read
+    late = performance_log.reader(driver)
+    driver.log("c")
+    assert late.read() == ["c"]
+
+
+def test_entries_are_dropped_once_every_reader_is_past_them():
+    driver = LogDriver()
+    buffer = PerformanceLogBuffer(driver, max_entries=3)
+    fast, slow = buffer.reader(), buffer.reader()
+    driver.log("a", "b")
+    fast.read()
+    assert buffer.peek() == ["a", "b"]
+    slow.skip()
+    assert buffer.peek() == []
+
+    # A reader that falls too far behind loses the oldest entries
+    driver.log("c", "d", "e", "f")
+    assert fast.read() == ["d", "e", "f"]
+    assert slow.read() == ["d", "e", "f"]
+
+
+def test_peek_leaves_readers_where_they_are():
+    driver = LogDriver()
+    reader = performance_log.reader(driver)
+    driver.log("a")
+    assert performance_log.buffer_for(driver).peek() == ["a"]
+    assert reader.read() == ["a"]
+
+
+def test_the_pool_and_the_network_report_both_see_a_page_load():
+    driver = DriverPool(LogDriver).new_driver()
+    resource_blocking.start_network_report(driver)
+    driver.log(document_request("1", "https://www.hulu.com/hub/movies"))
+    # Whichever reads first, the other one still gets the entry
+    origins = _logged_document_origins(driver)
+    report = resource_blocking.network_report(driver)
+
+    assert report["by_type"] == {"Document": {"requests": 1, "bytes": 0, "blocked": 0}}
+    assert origins == {"https://www.hulu.com"}
+    assert driver.drains == 2
+
+    other = DriverPool(LogDriver).new_driver()
+    resource_blocking.start_network_report(other)
+    other.log(document_request("1", "https://www.hulu.com/hub/movies"))
+    assert resource_blocking.network_report(other)["by_type"]["Document"]["requests"] == 1
+    assert _logged_document_origins(other) == {"https://www.hulu.com"}
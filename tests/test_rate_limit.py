@@ -0,0 +1,234 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from requests.exceptions import RetryError
+from urllib3 import HTTPResponse
+from urllib3.exceptions import MaxRetryError
+
+from api_client import BaseAPITClient, rate_limit
+from api_client.rate_limit import (
+    AdaptiveConcurrency,
+    JitteredRetry,
+    RateLimiter,
+    TokenBucket,
+    is_throttled,
+    scope_label,
+    throttled_responses,
+)
+
+"""
+Token bucket, adaptive concurrency and throttle accounting of RateLimiter
+"""
+
+
+class FakeClock(object):
+    """
+    Stands in for the time module in api_client.rate_limit, sleeping moves
+    the clock forward instead of blocking
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty, the next token arrives after 1 / rate seconds
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.waits == 2
+    assert bucket.total_wait == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+    for _ in range(5):
+        bucket.acquire()
+    clock.now += 0.3
+    assert [bucket.acquire() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.0])
+    assert bucket.acquire() == pytest.approx(0.1)
+    # A long idle period refills no more than the capacity
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+def test_waiting_callers_queue_in_arrival_order(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.acquire()
+    clock.sleep = lambda seconds: None  # both reserve before either sleeps
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(2.0)
+
+
+def test_window_halves_on_throttling_and_grows_back_additively():
+    window = AdaptiveConcurrency(maximum=8)
+    window.acquire()
+    window.release(throttled=True)
+    assert window.limit == 4
+    window.acquire()
+    window.release(throttled=True, throttle_count=3)
+    assert window.limit == 2
+    assert window.throttled == 4 and window.decreases == 2
+
+    # One slot per window of successes: 2 -> 2.5 -> 2.9
+    for _ in range(2):
+        window.acquire()
+        window.release()
+    assert window.limit == pytest.approx(2.9)
+    # Never below the minimum or above the maximum
+    for _ in range(10):
+        window.acquire()
+        window.release(throttled=True)
+    assert window.limit == 1
+    for _ in range(200):
+        window.acquire()
+        window.release()
+    assert window.limit == 8
+
+
+def test_window_blocks_callers_over_the_limit():
+    window = AdaptiveConcurrency(maximum=1)
+    window.acquire()
+    entered = threading.Event()
+
+    def second_caller():
+        window.acquire()
+        entered.set()
+        window.release()
+
+    thread = threading.Thread(target=second_caller)
+    thread.start()
+    assert not entered.wait(0.1)
+    window.release()
+    assert entered.wait(5)
+    thread.join()
+
+
+@pytest.mark.parametrize(
+    "status, headers, expected",
+    [
+        (429, {}, True),
+        (503, {"Retry-After": "5"}, True),
+        (503, {}, False),
+        (500, {"Retry-After": "5"}, False),
+        (200, {}, False),
+    ],
+)
+def test_is_throttled(status, headers, expected):
+    assert is_throttled(status, headers) is expected
+
+
+def _raw_response(status, headers=None):
+    return HTTPResponse(headers=headers or {}, status=status, preload_content=False)
+
+
+def test_retry_counts_only_throttled_answers():
+    retries = JitteredRetry(total=5, status_forcelist=(429, 500, 503))
+    for status, headers in ((429, None), (500, None), (503, None), (503, {"retry-after": "1"})):
+        retries = retries.increment("GET", "/items", response=_raw_response(status, headers))
+    assert retries.throttled == 2
+    assert len(retries.history) == 4
+
+
+def test_retry_error_from_server_errors_is_not_throttling():
+    retries = JitteredRetry(total=1, status_forcelist=(500,))
+    retries = retries.increment("GET", "/items", response=_raw_response(500))
+    with pytest.raises(MaxRetryError) as error:
+        retries.increment("GET", "/items", response=_raw_response(500))
+    assert error.value.throttled == 0
+
+    retries = JitteredRetry(total=1, status_forcelist=(429,))
+    retries = retries.increment("GET", "/items", response=_raw_response(429))
+    with pytest.raises(MaxRetryError) as error:
+        retries.increment("GET", "/items", response=_raw_response(429))
+    assert error.value.throttled == 2
+
+
+def test_throttled_responses_include_absorbed_retries():
+    retries = JitteredRetry(total=5, status_forcelist=(429,)).increment(
+        "GET", "/items", response=_raw_response(429)
+    )
+    response = SimpleNamespace(status_code=200, headers={}, raw=SimpleNamespace(retries=retries))
+    assert throttled_responses(response) == 1
+    response.status_code = 503
+    assert throttled_responses(response) == 1
+    response.headers = {"Retry-After": "1"}
+    assert throttled_responses(response) == 2
+
+
+def test_stats_tell_apart_keys_with_the_same_tail():
+    limiter = RateLimiter(rate=100, max_concurrency=4)
+    for api_key in ("first-key-1234", "other-key-1234", None):
+        limiter.send("https://api.test/items", api_key, lambda: SimpleNamespace(status_code=200, headers={}, raw=None))
+    stats = limiter.stats()
+    assert len(stats) == 3
+    assert all(entry["requests"] == 1 for entry in stats.values())
+    assert scope_label("api.test") in stats
+    assert not any("1234" in label for label in stats)
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    status = 200
+    headers_to_send = {}
+
+    def do_GET(self):
+        self.send_response(self.status)
+        for name, value in self.headers_to_send.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def status_server(monkeypatch):
+    monkeypatch.setattr(JitteredRetry, "get_backoff_time", lambda self: 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StatusHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "status, headers, throttled, backoffs",
+    [
+        (500, {}, 0, 0),
+        (503, {}, 0, 0),
+        (503, {"Retry-After": "0"}, 4, 1),
+        (429, {"Retry-After": "0"}, 4, 1),
+    ],
+)
+def test_client_counts_throttling_when_retries_run_out(monkeypatch, status_server, status, headers, throttled, backoffs):
+    monkeypatch.setattr(_StatusHandler, "status", status)
+    monkeypatch.setattr(_StatusHandler, "headers_to_send", headers)
+    limiter = RateLimiter(max_concurrency=8)
+    with BaseAPITClient(rate_limiter=limiter) as client:
+        with pytest.raises(RetryError):
+            client.get(f"{status_server}/items", verbose=False)
+    entry = limiter.stats()[scope_label(status_server.split("//")[1])]
+    assert entry["throttled_responses"] == throttled
+    assert entry["backoffs"] == backoffs
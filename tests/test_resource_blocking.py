@@ -0,0 +1,106 @@
+import json
+import re
+
+import pytest
+
+from ui_framework import resource_blocking
+
+"""
+Blocked URL patterns and the network report
+"""
+
+
+def chrome_pattern_matches(pattern, url):
+    # Network.setBlockedURLs patterns: * matches anything, nothing else is special
+    return re.fullmatch(".*".join(re.escape(part) for part in pattern.split("*")), url) is not None
+
+
+def is_blocked(preset, url):
+    return any(chrome_pattern_matches(pattern, url) for pattern in resource_blocking.blocked_patterns(preset))
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://img1.example.com/art/cover.jpg",
+        "https://img1.example.com/art/cover.webp?size=600x338&format=webp",
+        "https://www.example.com/favicon.ico",
+        "https://cdn.example.com/fonts/graphik.woff2",
+        "https://cdn.example.com/trailer/segment-12.m4s",
+        "https://www.google-analytics.com/collect?v=2",
+    ],
+)
+def test_text_only_blocks_assets(url):
+    assert is_blocked("text-only", url)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://assets.example.com/runtime.webpack.8f2c.js",
+        "https://static.icons.example.com/sprite.json",
+        "https://www.gifts.example.com/gift-cards",
+        "https://www.example.com/api/thumbnail?format=.png&width=10",
+        "https://discover.example.com/content/v5/hubs/movies?schema=1",
+        "https://www.example.com/api/images/list.json?types=png,jpg",
+        "https://www.example.com/hub/movies",
+    ],
+)
+def test_text_only_leaves_pages_scripts_and_apis_alone(url):
+    assert not is_blocked("text-only", url)
+
+
+def test_presets_are_cumulative():
+    assert resource_blocking.blocked_patterns("none") == []
+    trackers = set(resource_blocking.blocked_patterns("no-trackers"))
+    media = set(resource_blocking.blocked_patterns("no-media"))
+    assert trackers < media < set(resource_blocking.blocked_patterns("text-only"))
+    assert resource_blocking.blocked_patterns(["font"], ["*://img*.example.com/*"])[-1] == "*://img*.example.com/*"
+
+
+def test_unknown_preset_is_rejected():
+    with pytest.raises(Exception, match="Unknown blocking preset"):
+        resource_blocking.blocked_types("images-only")
+
+
+def _log(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+class TimingDriver(object):
+    def __init__(self, load_ms):
+        self.load_ms = load_ms
+
+    def execute_script(self, script):
+        return {"dom_content_loaded_ms": self.load_ms / 2, "load_ms": self.load_ms, "transfer_bytes": 1000}
+
+
+def test_network_report_and_comparison():
+    baseline = resource_blocking.network_report(
+        TimingDriver(900),
+        [
+            _log("Network.requestWillBeSent", requestId="1", type="Document", request={"url": "https://example.com/"}),
+            _log("Network.loadingFinished", requestId="1", encodedDataLength=1000),
+            _log("Network.requestWillBeSent", requestId="2", type="Image", request={"url": "https://example.com/a.jpg"}),
+            _log("Network.loadingFinished", requestId="2", encodedDataLength=3000),
+            {"message": "not json"},
+        ],
+    )
+    blocked = resource_blocking.network_report(
+        TimingDriver(400),
+        [
+            _log("Network.requestWillBeSent", requestId="1", type="Document", request={"url": "https://example.com/"}),
+            _log("Network.loadingFinished", requestId="1", encodedDataLength=1000),
+            _log("Network.requestWillBeSent", requestId="2", type="Image", request={"url": "https://example.com/a.jpg"}),
+            _log("Network.loadingFailed", requestId="2", type="Image", blockedReason="inspector"),
+        ],
+    )
+    assert baseline["requests"] == 2 and baseline["bytes"] == 4000
+    assert blocked["by_type"]["Image"] == {"requests": 0, "bytes": 0, "blocked": 1}
+    assert resource_blocking.compare_reports(baseline, blocked) == {
+        "requests_saved": 1,
+        "bytes_saved": 3000,
+        "blocked_requests": 1,
+        "bytes_saved_percent": 75.0,
+        "load_ms_saved": 500,
+    }
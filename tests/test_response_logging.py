@@ -0,0 +1,70 @@
+import logging
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from api_client import MAX_LOGGED_BODY_BYTES, BaseAPITClient, TruncatedBody
+
+"""
+BaseAPITClient.log_response: what is logged, and that bodies are only read
+when a DEBUG record will actually carry them
+"""
+
+
+class WatchedResponse(requests.Response):
+    """
+    Response that counts reads of its body
+    """
+
+    def __init__(self, content):
+        super().__init__()
+        self.status_code = 200
+        self.url = "http://api.test/items"
+        self.headers = CaseInsensitiveDict({"x-request-id": "req-1"})
+        self.request = requests.Request("GET", self.url).prepare()
+        self._content = content
+        self.content_reads = 0
+
+    @property
+    def content(self):
+        self.content_reads += 1
+        return self._content
+
+
+def test_nothing_is_read_when_debug_is_off(caplog):
+    caplog.set_level(logging.INFO, logger="api_client")
+    response = WatchedResponse(b"x" * 10)
+    BaseAPITClient().log_response(response, verbose=True)
+
+    assert response.content_reads == 0
+    assert caplog.records == []
+
+
+def test_streamed_bodies_are_never_read(caplog):
+    caplog.set_level(logging.DEBUG, logger="api_client")
+    response = WatchedResponse(b"x" * 10)
+    BaseAPITClient().log_response(response, verbose=True, stream=True)
+
+    assert response.content_reads == 0
+    (record,) = caplog.records
+    assert record.getMessage().startswith("Response GET http://api.test/items <200>")
+    assert record.request_id == "req-1"
+
+
+def test_logged_bodies_are_truncated(caplog):
+    caplog.set_level(logging.DEBUG, logger="api_client")
+    response = WatchedResponse(b"x" * (MAX_LOGGED_BODY_BYTES + 100))
+    BaseAPITClient().log_response(response, verbose=True)
+
+    _, body = caplog.records
+    assert body.getMessage() == f"Response content: {b'x' * MAX_LOGGED_BODY_BYTES} ... (100 more bytes)"
+    assert body.status_code == 200
+    assert response.content_reads == 1
+
+
+def test_truncated_body_reports_the_bytes_left_out():
+    body = TruncatedBody(b"abcdef", limit=4)
+    assert body.content == b"abcdef"
+    assert str(body) == "b'abcd' ... (2 more bytes)"
+    assert str(TruncatedBody(b"abcd", limit=4)) == "b'abcd'"
+    assert str(TruncatedBody(None)) == "None"
@@ -0,0 +1,155 @@
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from hulu_bot.session_state import SessionStateStore
+
+"""
+SessionStateStore: saved login state on disk, its expiry and restoring it
+"""
+
+NOW = time.time()
+
+
+class StateDriver(object):
+
+    def __init__(self, cookies=None, local_storage=None, url="https://www.hulu.com/hub/home"):
+        self.cookies = cookies if cookies is not None else [
+            {"name": "_hulu_session", "value": "abc", "domain": ".hulu.com", "path": "/",
+             "expires": NOW + 3600, "session": False, "size": 16},
+        ]
+        self.local_storage = local_storage or {"profile": "Kids"}
+        self.current_url = url
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, arguments):
+        self.commands.append((command, arguments))
+        if command == "Network.getAllCookies":
+            return {"cookies": self.cookies}
+        return {}
+
+    def execute_script(self, script, *args):
+        self.commands.append(("script", args))
+        return dict(self.local_storage)
+
+    def get(self, url):
+        self.commands.append(("get", url))
+        self.current_url = url
+
+
+def test_saved_state_is_private_and_loads_back(tmp_path):
+    store = SessionStateStore(directory=str(tmp_path / "sessions"))
+    path = store.save(StateDriver(), "viewer@example.com", "Kids")
+
+    assert stat.S_IMODE(os.stat(tmp_path / "sessions").st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert "viewer" not in os.path.basename(path)
+    assert os.listdir(tmp_path / "sessions") == [os.path.basename(path)]
+
+    state = store.load("viewer@example.com", "Kids")
+    assert state["url"] == "https://www.hulu.com/hub/home"
+    assert state["local_storage"] == {"https://www.hulu.com": {"profile": "Kids"}}
+    # Each profile of an account has its own state
+    assert store.load("viewer@example.com", "Main") is None
+
+
+def test_old_unreadable_or_expired_state_is_not_used(tmp_path):
+    store = SessionStateStore(directory=str(tmp_path), max_age=60)
+    path = store.save(StateDriver(), "viewer@example.com", "Kids")
+    with open(path) as file:
+        state = json.load(file)
+
+    state["saved_at"] = NOW - 120
+    with open(path, "w") as file:
+        json.dump(state, file)
+    assert store.load("viewer@example.com", "Kids") is None
+
+    state["saved_at"] = NOW
+    state["cookies"][0]["expires"] = NOW - 1
+    with open(path, "w") as file:
+        json.dump(state, file)
+    assert store.load("viewer@example.com", "Kids") is None
+
+    with open(path, "w") as file:
+        file.write("{not json")
+    assert store.load("viewer@example.com", "Kids") is None
+
+    store.discard("viewer@example.com", "Kids")
+    store.discard("viewer@example.com", "Kids")
+    assert not os.path.exists(path)
+
+
+def test_a_save_in_progress_survives_another_save(tmp_path, monkeypatch):
+    store = SessionStateStore(directory=str(tmp_path))
+    real_replace = os.replace
+    interrupted = []
+
+    def replace(source, destination):
+        if not interrupted:
+            interrupted.append(source)
+            # Another worker saves the same profile before this one finishes
+            store.save(StateDriver(local_storage={"writer": "second"}), "viewer@example.com", "Kids")
+        real_replace(source, destination)
+
+    monkeypatch.setattr(os, "replace", replace)
+    path = store.save(StateDriver(local_storage={"writer": "first"}), "viewer@example.com", "Kids")
+
+    assert interrupted
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    state = store.load("viewer@example.com", "Kids")
+    assert state["local_storage"]["https://www.hulu.com"] == {"writer": "first"}
+
+
+def test_a_failed_save_keeps_the_previous_state(tmp_path, monkeypatch):
+    store = SessionStateStore(directory=str(tmp_path))
+    path = store.save(StateDriver(), "viewer@example.com", "Kids")
+    monkeypatch.setattr(json, "dump", lambda state, file: file.write("{partial") and 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        store.save(StateDriver(), "viewer@example.com", "Kids")
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    assert store.load("viewer@example.com", "Kids") is not None
+
+
+def test_lock_lets_one_holder_in_at_a_time(tmp_path):
+    store = SessionStateStore(directory=str(tmp_path))
+    entered = threading.Event()
+
+    def second_worker():
+        with store.lock("viewer@example.com", "Kids"):
+            entered.set()
+
+    with store.lock("viewer@example.com", "Kids"):
+        thread = threading.Thread(target=second_worker)
+        thread.start()
+        assert not entered.wait(0.2)
+        # Other profiles are not held up
+        with store.lock("viewer@example.com", "Main"):
+            pass
+    assert entered.wait(5)
+    thread.join()
+
+
+def test_restore_sets_cookies_then_storage_then_page():
+    session_cookie = {"name": "s", "value": "1", "domain": ".hulu.com", "path": "/", "expires": -1, "session": True}
+    state = {
+        "url": "https://www.hulu.com/hub/home",
+        "cookies": [session_cookie],
+        "local_storage": {"https://www.hulu.com": {"profile": "Kids"}},
+    }
+    driver = StateDriver()
+    SessionStateStore.restore(driver, state)
+
+    (command, arguments), *rest = driver.commands
+    assert command == "Network.setCookies"
+    # A session cookie keeps no expiry, -1 would set it already expired
+    assert arguments["cookies"] == [{"name": "s", "value": "1", "domain": ".hulu.com", "path": "/"}]
+    assert rest == [
+        ("get", "https://www.hulu.com"),
+        ("script", ({"profile": "Kids"},)),
+        ("get", "https://www.hulu.com/hub/home"),
+    ]
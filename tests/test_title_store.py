@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from hulu_bot.title_store import TitleStore
+
+"""
+SQLite backed title store
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    with TitleStore(str(tmp_path / "titles.db"), legacy_file=None) as store:
+        yield store
+
+
+def test_record_returns_only_new_titles_in_order(store):
+    assert store.record(["Palm Springs", "Love for Sale", "Palm Springs", ""], seen_at=100) == [
+        "Palm Springs",
+        "Love for Sale",
+    ]
+    assert store.record(["Love for Sale", "Pilot"], seen_at=200) == ["Pilot"]
+    assert len(store) == 3
+    assert "Pilot" in store and "Missing" not in store
+
+
+def test_upsert_keeps_first_seen_and_counts_sightings(store):
+    store.record(["Palm Springs", "Palm Springs"], seen_at=100)
+    store.record(["Palm Springs"], seen_at=200)
+    assert store.get("Palm Springs") == {
+        "title": "Palm Springs",
+        "first_seen": 100,
+        "last_seen": 200,
+        "times_seen": 2,
+    }
+    assert store.get("Missing") is None
+
+
+def test_titles_in_first_seen_order(store):
+    store.record(["B", "A"], seen_at=100)
+    store.record(["C", "A"], seen_at=200)
+    assert store.titles() == ["B", "A", "C"]
+    assert store.titles(since=150) == ["C"]
+
+
+def test_titles_survive_reopening(tmp_path):
+    path = str(tmp_path / "titles.db")
+    with TitleStore(path, legacy_file=None) as store:
+        store.record(["Palm Springs"], seen_at=100)
+    with TitleStore(path, legacy_file=None) as store:
+        assert "Palm Springs" in store
+        assert store.record(["Palm Springs"]) == []
+
+
+def test_legacy_file_is_imported_once_dated_by_its_mtime(tmp_path):
+    legacy = tmp_path / "titles.txt"
+    legacy.write_text("Palm Springs\n\nLove for Sale\n  Palm Springs  \n")
+    os.utime(legacy, (1000, 1000))
+    path = str(tmp_path / "titles.db")
+
+    with TitleStore(path, legacy_file=str(legacy)) as store:
+        assert store.titles() == ["Palm Springs", "Love for Sale"]
+        assert store.get("Love for Sale")["first_seen"] == 1000
+
+    # The database has titles now, later edits to the old file are ignored
+    legacy.write_text("Pilot\n")
+    with TitleStore(path, legacy_file=str(legacy)) as store:
+        assert "Pilot" not in store
@@ -0,0 +1,116 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import api_client
+from api_client import BaseAPITClient
+
+"""
+Resumable downloads and streamed uploads of BaseAPITClient against a local
+server
+"""
+
+BODY = bytes(range(256)) * 1024
+
+
+class _TransferHandler(BaseHTTPRequestHandler):
+    """
+    GET serves BODY and honours Range, except on /ignores-range. The first
+    GET of /drops-once closes the connection a third of the way in. PUT
+    answers 503 the first time and 200 after that
+    """
+
+    requests_seen = []
+    uploads = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        requested = self.headers.get("Range")
+        self.requests_seen.append((self.path, requested))
+        start = 0
+        if requested and self.path != "/ignores-range":
+            start = int(requested[len("bytes="):-1])
+            if start >= len(BODY):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(BODY)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        body = BODY[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.path == "/drops-once" and len(self.requests_seen) == 1:
+            self.wfile.write(body[:len(body) // 3])
+            return
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        self.uploads.append(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_response(503 if len(self.uploads) == 1 else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def transfer_server(monkeypatch):
+    monkeypatch.setattr(api_client, "BACKOFF_FACTOR", 0)
+    _TransferHandler.requests_seen = []
+    _TransferHandler.uploads = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TransferHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_an_interrupted_download_resumes_where_it_stopped(transfer_server, tmp_path):
+    path = tmp_path / "catalog.bin"
+    with BaseAPITClient() as client:
+        size = client.download_to(f"{transfer_server}/drops-once", str(path), verbose=False)
+
+    assert size == len(BODY)
+    assert path.read_bytes() == BODY
+    assert not (tmp_path / "catalog.bin.part").exists()
+    (_, first_range), (_, second_range) = _TransferHandler.requests_seen
+    assert first_range is None
+    assert second_range == f"bytes={len(BODY) // 3}-"
+
+
+def test_a_server_ignoring_range_restarts_the_download(transfer_server, tmp_path):
+    path = tmp_path / "catalog.bin"
+    (tmp_path / "catalog.bin.part").write_bytes(b"stale bytes")
+    with BaseAPITClient() as client:
+        client.download_to(f"{transfer_server}/ignores-range", str(path), verbose=False)
+
+    assert _TransferHandler.requests_seen == [("/ignores-range", "bytes=11-")]
+    # The 200 body replaces the part file instead of being appended to it
+    assert path.read_bytes() == BODY
+
+
+def test_a_complete_part_file_is_finished_on_416(transfer_server, tmp_path):
+    path = tmp_path / "catalog.bin"
+    (tmp_path / "catalog.bin.part").write_bytes(BODY)
+    with BaseAPITClient() as client:
+        size = client.download_to(f"{transfer_server}/file", str(path), verbose=False)
+
+    assert size == len(BODY)
+    assert path.read_bytes() == BODY
+    assert _TransferHandler.requests_seen == [("/file", f"bytes={len(BODY)}-")]
+
+
+def test_uploaded_files_are_rewound_when_retried(transfer_server, tmp_path):
+    source = tmp_path / "upload.bin"
+    source.write_bytes(BODY)
+    with BaseAPITClient() as client, open(source, "rb") as file:
+        response = client.upload(f"{transfer_server}/upload", file, verbose=False)
+
+    assert response.status_code == 200
+    # The 503 was retried with the whole file, not what was left of it
+    assert _TransferHandler.uploads == [BODY, BODY]
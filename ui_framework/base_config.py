@@ -12,3 +12,9 @@ else:
 
 def get_project_root():
     return Path(__file__).parent
+
+
+# Name of the pytest-xdist worker this process runs as, "master" when tests
+# are not distributed
+def get_worker_id():
+    return os.environ.get("PYTEST_XDIST_WORKER", "master")
@@ -10,6 +10,7 @@ from selenium.common.exceptions import (
     ElementClickInterceptedException,
     StaleElementReferenceException,
     TimeoutException,
+    WebDriverException,
 )
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
@@ -18,39 +19,213 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.ui import WebDriverWait
 
+from ui_framework import dom_waits, instrumentation
+
 seleniumLogger.setLevel(logging.WARNING)
 
 
+@instrumentation.instrument_public_methods
 class SeleniumBasePage(object):
     ACCEPTABLE_LOADING_TIME = 60  # seconds
+    # verify_* waits run in the browser through a MutationObserver and only
+    # fall back to polling over WebDriver when the script cannot run
+    USE_DOM_OBSERVER = True
+    SCRIPT_TIMEOUT_MARGIN = 5  # seconds
 
     def __init__(self, driver):
         self.driver = driver
+        self._script_timeout = 0
+
+    @staticmethod
+    def _poll_pause(seconds):
+        instrumentation.record("polls")
+        time.sleep(seconds)
+
+    def wait_for_dom_condition(self, element_locator, condition, timeout):
+        """
+        Resolve `condition` (see ui_framework.dom_waits) for the element in
+        one execute_async_script round trip. Returns a DomWaitResult; when
+        `available` is False the caller should poll for the time left
+        """
+        if not self.USE_DOM_OBSERVER:
+            return dom_waits.DomWaitResult(False, False, None, 0)
 
-    def verify_count_of_element(self, locator, expected_count, timeout=30):
-        number_of_elements = len(self.find_elements_by(*locator))
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            if number_of_elements == expected_count:
-                return
-            else:
-                time.sleep(0.1)
-        raise TimeoutError(
-            f"{number_of_elements} did not match {expected_count}"
+        try:
+            if timeout + self.SCRIPT_TIMEOUT_MARGIN > self._script_timeout:
+                self._script_timeout = timeout + self.SCRIPT_TIMEOUT_MARGIN
+                self.driver.set_script_timeout(self._script_timeout)
+            result = self.driver.execute_async_script(
+                dom_waits.WAIT_FOR_CONDITION_JS,
+                element_locator[0],
+                element_locator[1],
+                condition,
+                int(timeout * 1000),
+                dom_waits.STYLE_RECHECK_INTERVAL_MS,
+            )
+        except WebDriverException:
+            # Navigation during the wait unloads the script, and some pages
+            # block script injection altogether
+            return dom_waits.DomWaitResult(False, False, None, time.time() - start_time)
+
+        if not result or "error" in result:
+            return dom_waits.DomWaitResult(False, False, None, time.time() - start_time)
+        return dom_waits.DomWaitResult(
+            True,
+            result["satisfied"],
+            result.get("value"),
+            result["elapsed"],
+            result.get("element"),
         )
 
+    def _wait_for_dom_match(self, element_locator, source, name, matches, timeout):
+        """
+        Wait in the browser for each new value of the element's text or
+        attribute `name` and test it with `matches` here, so regexes keep
+        Python's semantics. Returns a DomWaitResult like wait_for_dom_condition
+        """
+        start_time = time.time()
+        last_value = None
+        while True:
+            result = self.wait_for_dom_condition(
+                element_locator,
+                dom_waits.change_condition(source, last_value, name),
+                max(timeout - (time.time() - start_time), 0),
+            )
+            elapsed = time.time() - start_time
+            if not result.available or not result.satisfied:
+                return dom_waits.DomWaitResult(result.available, False, last_value, elapsed)
+            last_value = result.value
+            if matches(last_value):
+                return dom_waits.DomWaitResult(True, True, last_value, elapsed)
+            if elapsed >= timeout:
+                return dom_waits.DomWaitResult(True, False, last_value, elapsed)
+
+    def resolve_element(
+        self,
+        element_locator,
+        requirement=dom_waits.VISIBLE,
+        wait=ACCEPTABLE_LOADING_TIME,
+    ):
+        """
+        Find the element and wait until it is present, visible or clickable
+        (see dom_waits.element_condition) in a single script round trip,
+        returning the WebElement. Falls back to the WebDriverWait chain when
+        the in-browser wait is unavailable
+        """
+        result = self.wait_for_dom_condition(
+            element_locator, dom_waits.element_condition(requirement), wait
+        )
+        if result.satisfied:
+            return result.element
+        if result.available:
+            raise Exception(
+                self._resolution_error(element_locator, result.value, wait)
+            )
+
+        wait = max(wait - result.elapsed, 0.1)
+        if requirement == dom_waits.PRESENT:
+            return self._webdriver_wait_for_present(element_locator, wait)
+        if requirement == dom_waits.VISIBLE:
+            return self._webdriver_wait_for_visible(element_locator, wait)
+        return self._webdriver_wait_for_clickable(element_locator, wait)
+
+    def act_on_element(
+        self,
+        element_locator,
+        action,
+        requirement=dom_waits.CLICKABLE,
+        timeout=ACCEPTABLE_LOADING_TIME,
+        retry_on=(StaleElementReferenceException,),
+    ):
+        """
+        Resolve the element once and hand it to `action`. If the element goes
+        stale before the action lands (or raises one of `retry_on`), resolve
+        it again and retry until `timeout`
+        """
+        start_time = time.time()
+
+        while True:
+            remaining = timeout - (time.time() - start_time)
+            element = self.resolve_element(
+                element_locator, requirement, max(remaining, 0.1)
+            )
+            try:
+                return action(element)
+            except retry_on as e:
+                if isinstance(e, StaleElementReferenceException):
+                    instrumentation.record("stale_retries")
+                if time.time() - start_time >= timeout:
+                    raise
+                self._poll_pause(0.1)
+
+    @staticmethod
+    def _resolution_error(element_locator, state, wait):
+        if state == "missing":
+            return f"Element with locator: {element_locator} was not in the DOM after {wait} seconds. "
+        if state == "hidden":
+            return "Element was present but not visible. Make sure that element is not hidden. "
+        return (
+            f"Element {element_locator} was visible but not clickable ({state}) after {wait} seconds. "
+            f"Verify that element has been scrolled into view"
+        )
+
+    def verify_count_of_element(self, locator, expected_count, timeout=30):
+        return self.wait_for_count(locator, exact=expected_count, timeout=timeout)
+
     def verify_minimum_count_of_element(
         self, locator, expected_count, timeout=30
     ):
-        number_of_elements = len(self.find_elements_by(*locator))
+        return self.wait_for_count(locator, minimum=expected_count, timeout=timeout)
+
+    def wait_for_count(
+        self, locator, exact=None, minimum=None, maximum=None, timeout=30
+    ):
+        """
+        Wait until the number of elements matching `locator` is `exact`, or
+        lies between `minimum` and `maximum` (either may be left open).
+        The count is re-evaluated on every DOM change. Returns the seconds
+        waited, raises ValueError for missing, negative or crossed bounds
+        """
+        if exact is not None:
+            if minimum is not None or maximum is not None:
+                raise ValueError("Pass either exact or minimum/maximum, not both")
+            minimum = maximum = exact
+        if minimum is None and maximum is None:
+            raise ValueError("wait_for_count needs exact, minimum or maximum")
+        if any(bound is not None and bound < 0 for bound in (minimum, maximum)):
+            raise ValueError(f"Element counts cannot be negative, got {minimum} to {maximum}")
+        if minimum is not None and maximum is not None and minimum > maximum:
+            raise ValueError(f"minimum {minimum} is above maximum {maximum}")
+        if minimum is not None and maximum is not None and minimum == maximum:
+            expected = f"exactly {minimum}"
+        elif maximum is None:
+            expected = f"at least {minimum}"
+        elif minimum is None:
+            expected = f"at most {maximum}"
+        else:
+            expected = f"between {minimum} and {maximum}"
+
+        result = self.wait_for_dom_condition(
+            locator, dom_waits.count_condition(minimum, maximum), timeout
+        )
+        if result.satisfied:
+            return result.elapsed
+        number_of_elements = result.value
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            if number_of_elements >= expected_count:
-                return
-            else:
-                time.sleep(0.1)
+        remaining = timeout - result.elapsed
+
+        while not result.available and time.time() - start_time < remaining:
+            number_of_elements = len(self.find_elements_by(*locator))
+            if (minimum is None or number_of_elements >= minimum) and (
+                maximum is None or number_of_elements <= maximum
+            ):
+                return result.elapsed + time.time() - start_time
+            self._poll_pause(0.1)
+
         raise TimeoutError(
-            f"{number_of_elements} were less than {expected_count}"
+            f"Found {number_of_elements} elements for {locator}, expected "
+            f"{expected} after waiting {timeout} seconds"
         )
 
     def verify_attribute_contains(
@@ -60,9 +235,18 @@ class SeleniumBasePage(object):
         element_locator,
         timeout=ACCEPTABLE_LOADING_TIME,
     ):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.attribute_condition(attribute, "contains", expected_string),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        attribute_value = result.value
+        timeout -= result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             attribute_value = self.get_attribute_of_element(
                 attribute, element_locator
             )
@@ -70,11 +254,11 @@ class SeleniumBasePage(object):
             if expected_string in attribute_value:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutException(
             "Attribute value "
-            + attribute_value
+            + str(attribute_value)
             + " did not contain "
             + expected_string
         )
@@ -86,9 +270,18 @@ class SeleniumBasePage(object):
         element_locator,
         timeout=ACCEPTABLE_LOADING_TIME,
     ):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.css_condition(css_value, "contains", expected_string),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        css_value_value = result.value
+        timeout -= result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             css_value_value = self.get_css_value_of_element(
                 css_value, element_locator
             )
@@ -96,11 +289,11 @@ class SeleniumBasePage(object):
             if expected_string in css_value_value:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutException(
             "CSS value "
-            + css_value_value
+            + str(css_value_value)
             + " did not contain "
             + expected_string
         )
@@ -108,6 +301,14 @@ class SeleniumBasePage(object):
     def wait_for_element_to_be_invisible(
         self, element_locator, timeout=ACCEPTABLE_LOADING_TIME
     ):
+        result = self.wait_for_dom_condition(
+            element_locator, dom_waits.displayed_condition(False), timeout
+        )
+        if result.satisfied:
+            return True
+        if result.available:
+            raise Exception(f"Element was still visible after {timeout}.")
+        timeout -= result.elapsed
         try:
             return WebDriverWait(self.driver, timeout).until(
                 EC.invisibility_of_element_located(element_locator)
@@ -116,14 +317,23 @@ class SeleniumBasePage(object):
             raise Exception(f"Element was still visible after {timeout}.")
 
     def clear(self, element_locator, timeout=10):
-        self.wait_for_element_to_be_clickable(element_locator, timeout)
-        element = self.find_element_by(*element_locator)
-        element.clear()
+        self.act_on_element(
+            element_locator, lambda element: element.clear(), timeout=timeout
+        )
 
     def verify_value(self, expected_value, element_locator, timeout=10):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.attribute_condition("value", "equals", expected_value),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        actual_value = result.value
+        timeout -= result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             actual_value = self.get_attribute_of_element(
                 "value", element_locator
             )
@@ -131,11 +341,11 @@ class SeleniumBasePage(object):
             if actual_value == expected_value:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             "Actual value: "
-            + actual_value
+            + str(actual_value)
             + " did not equal expected value: "
             + expected_value
             + " after waiting"
@@ -144,6 +354,19 @@ class SeleniumBasePage(object):
     def verify_value_contains(
         self, expected_value, element_locator, timeout=10
     ):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.attribute_condition("value", "contains", expected_value),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        if result.available:
+            raise TimeoutError(
+                f"Expected value: {expected_value} is not a substring of: "
+                f"{result.value} after waiting {timeout} seconds."
+            )
+        timeout -= result.elapsed
         start_time = time.time()
 
         actual_value = self.get_attribute_of_element("value", element_locator)
@@ -154,7 +377,7 @@ class SeleniumBasePage(object):
                 actual_value = self.get_attribute_of_element(
                     "value", element_locator
                 )
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             f"Expected value: {expected_value} is not a substring of: "
@@ -162,16 +385,26 @@ class SeleniumBasePage(object):
         )
 
     def verify_text_contains(self, expected_text, element_locator, timeout=40):
-        self.wait_for_element_to_be_present(element_locator)
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.text_condition("contains", expected_text),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        actual_text = result.value
+        if not result.available:
+            self.wait_for_element_to_be_present(element_locator)
+        timeout -= result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             actual_text = self.get_text(element_locator)
 
             if expected_text in actual_text:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
         raise TimeoutError(
             f"Actual text: {actual_text} did not contain "
             f"expected text: {expected_text} after waiting {timeout} seconds."
@@ -181,6 +414,20 @@ class SeleniumBasePage(object):
         self, pattern, element_locator, timeout=15
     ):
         pattern = re.compile(pattern)
+        result = self._wait_for_dom_match(
+            element_locator,
+            "attribute",
+            "value",
+            lambda value: pattern.search(value) is not None,
+            timeout,
+        )
+        if result.satisfied:
+            return
+        if result.available:
+            raise TimeoutError(
+                f"Actual value: {result.value} did not match regex pattern {pattern}"
+            )
+        timeout -= result.elapsed
         start_time = time.time()
 
         actual_value = self.get_attribute_of_element("value", element_locator)
@@ -191,7 +438,7 @@ class SeleniumBasePage(object):
                 actual_value = self.get_attribute_of_element(
                     "value", element_locator
                 )
-                time.sleep(0.1)
+                self._poll_pause(0.1)
         raise TimeoutError(
             f"Actual value: {actual_value} did not match regex pattern {pattern}"
         )
@@ -200,9 +447,20 @@ class SeleniumBasePage(object):
         self, pattern, element_locator, timeout=15
     ):
         pattern = re.compile(pattern)
+        dom_result = self._wait_for_dom_match(
+            element_locator,
+            "attribute",
+            "value",
+            lambda value: pattern.fullmatch(value) is not None,
+            timeout,
+        )
+        if dom_result.satisfied:
+            return
+        actual_value = dom_result.value
+        timeout -= dom_result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not dom_result.available and time.time() - start_time < timeout:
             actual_value = self.get_attribute_of_element(
                 "value", element_locator
             )
@@ -211,7 +469,7 @@ class SeleniumBasePage(object):
             if result and result.group() == actual_value:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
         raise TimeoutError(
             f"Actual value: {actual_value} did not match regex pattern {pattern}"
         )
@@ -219,15 +477,24 @@ class SeleniumBasePage(object):
     def verify_text_does_not_contain(
         self, string, element_locator, timeout=ACCEPTABLE_LOADING_TIME
     ):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.text_condition("not_contains", string),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        actual_text = result.value
+        timeout -= result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             actual_text = self.get_text(element_locator)
 
             if string not in actual_text:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             f"Actual text: {actual_text} "
@@ -237,14 +504,25 @@ class SeleniumBasePage(object):
     def verify_text_does_not_contain_regex(
         self, matcher, element_locator, timeout=ACCEPTABLE_LOADING_TIME
     ):
-        start_time = time.time()
         pattern = re.compile(matcher)
+        result = self._wait_for_dom_match(
+            element_locator,
+            "text",
+            None,
+            lambda text: pattern.match(text) is None,
+            timeout,
+        )
+        if result.satisfied:
+            return
+        actual_text = result.value
+        timeout -= result.elapsed
+        start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             actual_text = self.get_text(element_locator)
 
             if pattern.match(actual_text):
-                time.sleep(0.1)
+                self._poll_pause(0.1)
             else:
                 return
 
@@ -254,19 +532,28 @@ class SeleniumBasePage(object):
         )
 
     def verify_text(self, expected_text, element_locator, timeout=20):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.text_condition("equals", expected_text),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        actual_text = result.value
+        timeout -= result.elapsed
         start_time = time.time()
 
-        while time.time() - start_time < timeout:
+        while not result.available and time.time() - start_time < timeout:
             actual_text = self.get_text(element_locator)
 
             if actual_text == expected_text:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             "Actual text: "
-            + actual_text
+            + str(actual_text)
             + " did not equal expected text: "
             + expected_text
             + " after waiting"
@@ -281,59 +568,111 @@ class SeleniumBasePage(object):
                 element = self.wait_for_element_to_be_visible(element_locator)
                 text = element.text
             except StaleElementReferenceException:
+                instrumentation.record("stale_retries")
                 text = None
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
             if text:
                 return text
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             f"Unable to get text for element after {wait} seconds"
         )
 
     def get_attribute_of_element(self, attribute, element_locator, wait=30):
-        self.wait_for_element_to_be_present(element_locator, wait)
+        element = self.wait_for_element_to_be_present(element_locator, wait)
 
         attribute_load_timeout = wait
         start_time = time.time()
 
         while time.time() - start_time < attribute_load_timeout:
-            element = self.find_element_by(*element_locator)
-            attribute_value = element.get_attribute(attribute)
+            try:
+                attribute_value = element.get_attribute(attribute)
+            except StaleElementReferenceException:
+                instrumentation.record("stale_retries")
+                element = self.wait_for_element_to_be_present(element_locator, wait)
+                continue
 
             if attribute_value:
                 return attribute_value
             else:
-                time.sleep(0.5)
+                self._poll_pause(0.5)
 
         raise TimeoutError(
             "Unable to find value for attribute: " + attribute + "for element"
         )
 
     def get_css_value_of_element(self, css_value, element_locator, wait=30):
-        self.wait_for_element_to_be_present(element_locator, wait)
+        element = self.wait_for_element_to_be_present(element_locator, wait)
 
         css_value_load_timeout = wait
         start_time = time.time()
 
         while time.time() - start_time < css_value_load_timeout:
-            element = self.find_element_by(*element_locator)
-            css_value_value = element.value_of_css_property(css_value)
+            try:
+                css_value_value = element.value_of_css_property(css_value)
+            except StaleElementReferenceException:
+                instrumentation.record("stale_retries")
+                element = self.wait_for_element_to_be_present(element_locator, wait)
+                continue
 
             if css_value_value:
                 return css_value_value
             else:
-                time.sleep(0.5)
+                self._poll_pause(0.5)
 
         raise TimeoutError(
             "Unable to find value for attribute: " + css_value + " for element"
         )
 
+    def get_many(self, locator, fields=("text",), chunk_size=None):
+        """
+        Read several properties of every element matching `locator` in one
+        script call and return a list of dicts keyed by field.
+
+        Fields are "text", "displayed", "tag", "css:<property>" and
+        "attribute:<name>"; any other name is read as an attribute, so
+        ["text", "href", "css:color"] works. Values follow get_text,
+        get_attribute_of_element and get_css_value_of_element. Pass
+        chunk_size to fetch very large result sets in several smaller calls
+        """
+        return list(self.iter_many(locator, fields, chunk_size))
+
+    def iter_many(self, locator, fields=("text",), chunk_size=None):
+        fields = list(fields)
+        offset = 0
+
+        while True:
+            result = self.driver.execute_script(
+                dom_waits.GET_MANY_JS,
+                locator[0],
+                locator[1],
+                fields,
+                offset,
+                chunk_size,
+            )
+            yield from result["records"]
+            offset += len(result["records"])
+            if chunk_size is None or not result["records"] or offset >= result["total"]:
+                return
+
     def verify_element_has_attribute(
         self, element_locator, attribute, timeout=10
     ):
+        result = self.wait_for_dom_condition(
+            element_locator,
+            dom_waits.attribute_condition(attribute, "present"),
+            timeout,
+        )
+        if result.satisfied:
+            return
+        if result.available:
+            raise TimeoutError(
+                "Unable to find attribute: " + attribute + " for element"
+            )
+        timeout -= result.elapsed
         self.wait_for_element_to_be_present(element_locator, timeout)
 
         start_time = time.time()
@@ -345,7 +684,7 @@ class SeleniumBasePage(object):
             if attribute_value:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             "Unable to find attribute: " + attribute + " for element"
@@ -353,9 +692,19 @@ class SeleniumBasePage(object):
 
     def wait_for_element_to_be_present(
         self, element_locator, wait=ACCEPTABLE_LOADING_TIME
+    ):
+        return self.resolve_element(element_locator, dom_waits.PRESENT, wait)
+
+    def wait_for_element_to_be_visible(
+        self, element_locator, wait=ACCEPTABLE_LOADING_TIME
+    ):
+        return self.resolve_element(element_locator, dom_waits.VISIBLE, wait)
+
+    def _webdriver_wait_for_present(
+        self, element_locator, wait=ACCEPTABLE_LOADING_TIME
     ):
         try:
-            WebDriverWait(self.driver, wait).until(
+            return WebDriverWait(self.driver, wait).until(
                 EC.presence_of_element_located(element_locator)
             )
         except TimeoutException:
@@ -363,10 +712,10 @@ class SeleniumBasePage(object):
                 f"Element with locator: {element_locator} was not in the DOM after {wait} seconds. "
             )
 
-    def wait_for_element_to_be_visible(
+    def _webdriver_wait_for_visible(
         self, element_locator, wait=ACCEPTABLE_LOADING_TIME
     ):
-        self.wait_for_element_to_be_present(element_locator, wait=wait)
+        self._webdriver_wait_for_present(element_locator, wait=wait)
 
         try:
             return WebDriverWait(self.driver, wait).until(
@@ -378,58 +727,65 @@ class SeleniumBasePage(object):
             )
 
     def send_keys(self, keys, element_locator):
-        element = self.wait_for_element_to_be_visible(element_locator)
-        element.send_keys(keys)
+        self.act_on_element(
+            element_locator,
+            lambda element: element.send_keys(keys),
+            dom_waits.VISIBLE,
+        )
 
     def clear_and_send_keys(self, keys, element_locator):
         self.clear(element_locator)
         self.send_keys(keys, element_locator)
 
     def click(self, element_locator, timeout=ACCEPTABLE_LOADING_TIME):
-        start_time = time.time()
-
-        while time.time() - start_time < timeout:
-            element = self.wait_for_element_to_be_clickable(
-                element_locator, timeout
+        try:
+            self.act_on_element(
+                element_locator,
+                lambda element: element.click(),
+                timeout=timeout,
+                retry_on=(
+                    ElementClickInterceptedException,
+                    StaleElementReferenceException,
+                ),
+            )
+        except (ElementClickInterceptedException, StaleElementReferenceException):
+            raise Exception(
+                f"Unable to click element with locator {element_locator} after polling for {timeout} seconds"
             )
-            try:
-                element.click()
-                return
-            except ElementClickInterceptedException:
-                time.sleep(0.1)
-            except StaleElementReferenceException:
-                time.sleep(0.1)
-
-        raise Exception(
-            f"Unable to click element with locator {element_locator} after polling for {timeout} seconds"
-        )
 
     def choose_value_in_select(self, element_locator, value_to_select):
-        self.wait_for_element_to_be_clickable(element_locator)
-        element = self.find_element_by(*element_locator)
-        select_element = Select(element)
-        select_element.select_by_value(value_to_select)
+        self.act_on_element(
+            element_locator,
+            lambda element: Select(element).select_by_value(value_to_select),
+        )
 
     def modal_click(self, element_locator, pause_time=None):
-        self.wait_for_element_to_be_clickable(element_locator)
-        element = self.find_element_by(*element_locator)
-        actions = ActionChains(self.driver)
-        if pause_time is not None:
-            actions.click(element).pause(pause_time).perform()
-        else:
-            actions.click(element).perform()
+        def click_with_actions(element):
+            actions = ActionChains(self.driver)
+            if pause_time is not None:
+                actions.click(element).pause(pause_time).perform()
+            else:
+                actions.click(element).perform()
+
+        self.act_on_element(element_locator, click_with_actions)
 
     def move_mouse_to_location(self, element_locator):
-        self.wait_for_element_to_be_visible(element_locator)
-        element = self.find_element_by(*element_locator)
-        actions = ActionChains(self.driver)
-        actions.move_to_element(element).perform()
+        self.act_on_element(
+            element_locator,
+            lambda element: ActionChains(self.driver).move_to_element(element).perform(),
+            dom_waits.VISIBLE,
+        )
 
     def modal_send_keys(self, keys, element_locator):
-        self.wait_for_element_to_be_visible(element_locator)
-        element = self.find_element_by(*element_locator)
-        actions = ActionChains(self.driver)
-        actions.click(element).send_keys(keys).send_keys(Keys.ENTER).perform()
+        self.act_on_element(
+            element_locator,
+            lambda element: ActionChains(self.driver)
+            .click(element)
+            .send_keys(keys)
+            .send_keys(Keys.ENTER)
+            .perform(),
+            dom_waits.VISIBLE,
+        )
 
     def navigate(self, url=None):
         if url:
@@ -444,7 +800,8 @@ class SeleniumBasePage(object):
             try:
                 return self.driver.find_element(*loc)
             except StaleElementReferenceException:
-                time.sleep(0.1)
+                instrumentation.record("stale_retries")
+                self._poll_pause(0.1)
 
         raise Exception(
             f"Unable to find element with locator f{loc} after waiting {timeout} seconds"
@@ -459,7 +816,12 @@ class SeleniumBasePage(object):
     def wait_for_element_to_be_clickable(
         self, element_locator, wait=ACCEPTABLE_LOADING_TIME
     ):
-        self.wait_for_element_to_be_visible(element_locator, wait)
+        return self.resolve_element(element_locator, dom_waits.CLICKABLE, wait)
+
+    def _webdriver_wait_for_clickable(
+        self, element_locator, wait=ACCEPTABLE_LOADING_TIME
+    ):
+        self._webdriver_wait_for_visible(element_locator, wait)
 
         start_time = time.time()
 
@@ -474,15 +836,16 @@ class SeleniumBasePage(object):
                     f"Verify that element has been scrolled into view"
                 )
             except StaleElementReferenceException:
-                time.sleep(0.1)
+                instrumentation.record("stale_retries")
+                self._poll_pause(0.1)
         raise StaleElementReferenceException(
             f"Element remained stale after {wait} seconds"
         )
 
     def switch_to_frame(self, frame_locator):
-        self.wait_for_element_to_be_visible(frame_locator)
-        frame = self.driver.find_element(*frame_locator)
-        self.driver.switch_to.frame(frame)
+        self.act_on_element(
+            frame_locator, self.driver.switch_to.frame, dom_waits.VISIBLE
+        )
 
     def return_from_iframe(self):
         self.driver.switch_to.default_content()
@@ -503,7 +866,7 @@ class SeleniumBasePage(object):
             if current_number_of_tabs is expected_number_of_tabs:
                 return
             else:
-                time.sleep(0.1)
+                self._poll_pause(0.1)
 
         raise TimeoutError(
             "Actual number of tabs "
@@ -539,36 +902,31 @@ class SeleniumBasePage(object):
         )
 
     def scroll_into_center_view(self, locator):
-        self.wait_for_element_to_be_visible(locator)
-        element = self.find_element_by(*locator)
-
-        start_time = time.time()
-
-        while time.time() - start_time < 10:
-            try:
-                self.driver.execute_script(
+        try:
+            self.act_on_element(
+                locator,
+                lambda element: self.driver.execute_script(
                     'arguments[0].scrollIntoView({behavior: "auto", block: "center", inline: "nearest"});',
                     element,
-                )
-                return
-            except StaleElementReferenceException:
-                time.sleep(0.1)
-
-        raise Exception(
-            f"Unable to scoll element with locator {locator} into center view after 10 seconds"
-        )
+                ),
+                dom_waits.VISIBLE,
+                timeout=10,
+            )
+        except StaleElementReferenceException:
+            raise Exception(
+                f"Unable to scoll element with locator {locator} into center view after 10 seconds"
+            )
 
     def scroll_into_view(self, *loc, align_to_top=True):
-        self.wait_for_element_to_be_visible(loc)
-        element = self.find_element_by(*loc)
         if align_to_top:
-            self.driver.execute_script(
-                "arguments[0].scrollIntoView();", element
-            )
+            script = "arguments[0].scrollIntoView();"
         else:
-            self.driver.execute_script(
-                "arguments[0].scrollIntoView(false);", element
-            )
+            script = "arguments[0].scrollIntoView(false);"
+        self.act_on_element(
+            loc,
+            lambda element: self.driver.execute_script(script, element),
+            dom_waits.VISIBLE,
+        )
 
     def scroll_to_top(self):
         self.driver.execute_script("window.scrollTo(0, 0)")
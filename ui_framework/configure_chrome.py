@@ -1,11 +1,29 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+import socket
 import sys
 
 from ui_framework import base_config
 
 
-def configure_base_capabilities(test_name, resolution):
+def free_port():
+    """
+    A port no other process is listening on, so parallel browsers never
+    fight over one debugging port
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_base_options(
+    test_name, resolution, debugging_port=None, user_data_dir=None, headless=None, performance_log=False
+):
+    """
+    The base configuration as Options, for webdriver.Chrome(options=...).
+    `performance_log` records every DevTools network event for get_log, which
+    costs memory and time on busy pages, so it is off unless asked for
+    """
     options = Options()
 
     preferences = {"safebrowsing.enabled": "false", "network.proxy.port": "80"}
@@ -16,17 +34,31 @@ def configure_base_capabilities(test_name, resolution):
     options.add_argument("--allow-running-insecure-content")
     options.add_argument(f"--window-size={resolution.replace('x', ',')}")
     options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--remote-debugging-port=9222")
+    options.add_argument(f"--remote-debugging-port={debugging_port or free_port()}")
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
     # Browser needs to be headless when running in CI
-    if base_config.headless:
+    if base_config.headless if headless is None else headless:
         options.add_argument("--headless")
 
     options.add_experimental_option("prefs", preferences)
 
-    capabilities = options.to_capabilities()
-    capabilities["name"] = test_name
-    capabilities["screenResolution"] = resolution
-    capabilities["browserName"] = "chrome"
-    capabilities["version"] = "latest"
+    options.set_capability("name", test_name)
+    options.set_capability("screenResolution", resolution)
+    options.set_capability("browserName", "chrome")
+    options.set_capability("version", "latest")
+    # Read back with driver.get_log for failure artifacts
+    logging_preferences = {"browser": "ALL"}
+    if performance_log:
+        logging_preferences["performance"] = "ALL"
+    options.set_capability("goog:loggingPrefs", logging_preferences)
+
+    return options
+
 
-    return capabilities
+def configure_base_capabilities(
+    test_name, resolution, debugging_port=None, user_data_dir=None, headless=None, performance_log=False
+):
+    return configure_base_options(
+        test_name, resolution, debugging_port, user_data_dir, headless, performance_log
+    ).to_capabilities()
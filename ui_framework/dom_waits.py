@@ -0,0 +1,290 @@
+from collections import namedtuple
+
+"""
+Waits that are resolved inside the browser
+
+Instead of asking WebDriver for an element's text or attribute every 100ms,
+the page object sends one execute_async_script call that evaluates the
+condition, installs a MutationObserver and calls back as soon as a DOM change
+makes the condition true (or the timeout passes). A slow interval check runs
+alongside the observer for things that change without a mutation, like
+computed styles driven by CSS transitions.
+
+Element lookup, visibility and the attribute/CSS readers below try to match
+what Selenium's own get_attribute/value_of_css_property/is_displayed return,
+so a condition means the same thing here as in the polling fallback.
+
+Regular expressions are never sent to the browser: JavaScript's RegExp
+rejects some Python syntax and silently reads other parts differently
+(string anchors, Unicode digit and word classes, $ before a trailing
+newline). For a regex wait the browser only reports each new value
+(change_condition) and the pattern is matched in Python.
+"""
+
+DomWaitResult = namedtuple(
+    "DomWaitResult",
+    ["available", "satisfied", "value", "elapsed", "element"],
+    defaults=(None,),
+)
+
+# Requirements for element_condition, each includes the ones before it
+PRESENT = "present"
+VISIBLE = "visible"
+CLICKABLE = "clickable"
+
+
+# Milliseconds between re-checks for changes no MutationObserver reports
+STYLE_RECHECK_INTERVAL_MS = 250
+
+# Shared by every script in the page object layer. Defines:
+#   locateAll(strategy, value) -> Array of elements for a Selenium locator
+#   isDisplayed(el), readText(el), readAttribute(el, name), readCss(el, name)
+DOM_HELPERS_JS = r"""
+function locateAll(strategy, value) {
+    var root = document;
+    function byXpath(xpath) {
+        var found = [];
+        var snapshot = root.evaluate(xpath, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var i = 0; i < snapshot.snapshotLength; i++) {
+            if (snapshot.snapshotItem(i).nodeType === 1) found.push(snapshot.snapshotItem(i));
+        }
+        return found;
+    }
+    function literal(text) {
+        if (text.indexOf("'") < 0) return "'" + text + "'";
+        if (text.indexOf('"') < 0) return '"' + text + '"';
+        return "concat('" + text.split("'").join("', \"'\", '") + "')";
+    }
+    switch (strategy) {
+        case "css selector": return Array.prototype.slice.call(root.querySelectorAll(value));
+        case "xpath": return byXpath(value);
+        case "id": return Array.prototype.slice.call(root.querySelectorAll('[id="' + CSS.escape(value) + '"]'));
+        case "name": return Array.prototype.slice.call(root.querySelectorAll('[name="' + CSS.escape(value) + '"]'));
+        case "class name": return Array.prototype.slice.call(root.getElementsByClassName(value));
+        case "tag name": return Array.prototype.slice.call(root.getElementsByTagName(value));
+        case "link text": return byXpath("//a[normalize-space(.)=" + literal(value.trim()) + "]");
+        case "partial link text": return byXpath("//a[contains(., " + literal(value) + ")]");
+    }
+    throw new Error("Unsupported locator strategy: " + strategy);
+}
+
+function isDisplayed(el) {
+    if (!el || !el.isConnected) return false;
+    if (el.checkVisibility) {
+        if (!el.checkVisibility({opacityProperty: true, visibilityProperty: true})) return false;
+    } else {
+        for (var node = el; node && node.nodeType === 1; node = node.parentElement) {
+            var style = getComputedStyle(node);
+            if (style.display === "none" || parseFloat(style.opacity) === 0) return false;
+        }
+        var own = getComputedStyle(el).visibility;
+        if (own === "hidden" || own === "collapse") return false;
+    }
+    function hasSize(node) {
+        var rect = node.getBoundingClientRect();
+        if (rect.width > 0 && rect.height > 0) return true;
+        for (var i = 0; i < node.children.length; i++) {
+            if (hasSize(node.children[i])) return true;
+        }
+        return false;
+    }
+    return hasSize(el);
+}
+
+function interactionState(el, requirement) {
+    // Everything WebDriver would otherwise need separate calls to check
+    // before it is safe to act on the element
+    if (requirement === "present") return "ok";
+    if (!isDisplayed(el)) return "hidden";
+    if (requirement === "visible") return "ok";
+    if (el.matches(":disabled")) return "disabled";
+    var rect = el.getBoundingClientRect();
+    var x = rect.left + rect.width / 2, y = rect.top + rect.height / 2;
+    // Off-screen elements are scrolled into view by WebDriver's click
+    if (x < 0 || y < 0 || x >= window.innerWidth || y >= window.innerHeight) return "ok";
+    var hit = document.elementFromPoint(x, y);
+    if (hit && hit !== el && !el.contains(hit)) return "obscured";
+    return "ok";
+}
+
+function readText(el) {
+    // Selenium's element.text is the rendered text, empty when hidden
+    if (!isDisplayed(el)) return "";
+    return el.innerText.replace(/[ \t]+\n/g, "\n").trim();
+}
+
+function readAttribute(el, name) {
+    if (name === "class") return el.getAttribute("class");
+    var property = el[name];
+    if (typeof property === "boolean") return property ? "true" : null;
+    if (property !== undefined && property !== null
+        && typeof property !== "object" && typeof property !== "function") {
+        return String(property);
+    }
+    return el.getAttribute(name);
+}
+
+function readCss(el, name) {
+    var value = getComputedStyle(el).getPropertyValue(name);
+    // Selenium reports colors as rgba()
+    return value.replace(/rgb\((\d+), (\d+), (\d+)\)/g, "rgba($1, $2, $3, 1)");
+}
+"""
+
+# arguments: strategy, value, condition, timeout ms, recheck interval ms, callback
+WAIT_FOR_CONDITION_JS = DOM_HELPERS_JS + r"""
+var strategy = arguments[0], value = arguments[1], condition = arguments[2];
+var timeoutMs = arguments[3], recheckMs = arguments[4];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+
+function read() {
+    var elements = locateAll(strategy, value);
+    if (condition.source === "count") return elements.length;
+    if (condition.source === "displayed") return elements.length > 0 && isDisplayed(elements[0]);
+    if (condition.source === "element") {
+        if (!elements.length) return "missing";
+        resolved = elements[0];
+        return interactionState(resolved, condition.name);
+    }
+    if (!elements.length) return null;
+    var el = elements[0];
+    var current = null;
+    if (condition.source === "text") current = readText(el);
+    if (condition.source === "attribute") current = readAttribute(el, condition.name);
+    if (condition.source === "css") current = readCss(el, condition.name);
+    // Empty values mean "not loaded yet", same as the polling getters
+    return current ? current : null;
+}
+
+function satisfied(current) {
+    switch (condition.op) {
+        case "is": return current === condition.expected;
+        case "between":
+            return (condition.minimum === null || current >= condition.minimum)
+                && (condition.maximum === null || current <= condition.maximum);
+        case "present": return current !== null;
+    }
+    if (current === null) return false;
+    switch (condition.op) {
+        case "equals": return current === condition.expected;
+        case "contains": return current.indexOf(condition.expected) >= 0;
+        case "not_contains": return current.indexOf(condition.expected) < 0;
+        case "changes": return current !== condition.expected;
+    }
+    throw new Error("Unknown condition " + condition.op);
+}
+
+var observer = null, interval = null, timer = null, finished = false, scheduled = false, last = null;
+var resolved = null;
+
+function finish(result) {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearInterval(interval);
+    clearTimeout(timer);
+    result.elapsed = (Date.now() - started) / 1000;
+    done(result);
+}
+
+function check() {
+    scheduled = false;
+    try {
+        last = read();
+        if (satisfied(last)) finish({satisfied: true, value: last, element: resolved});
+    } catch (e) {
+        finish({error: e.message});
+    }
+}
+
+check();
+if (!finished) {
+    observer = new MutationObserver(function () {
+        // Coalesce bursts of mutations into one check per task
+        if (!scheduled) {
+            scheduled = true;
+            setTimeout(check, 0);
+        }
+    });
+    observer.observe(document.documentElement, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+    interval = setInterval(check, recheckMs);
+    timer = setTimeout(function () {
+        finish({satisfied: false, value: last});
+    }, timeoutMs);
+}
+"""
+
+
+# arguments: strategy, value, fields, offset, limit
+# Returns {total: number of matches, records: [{field: value}, ...]}
+GET_MANY_JS = DOM_HELPERS_JS + r"""
+var elements = locateAll(arguments[0], arguments[1]);
+var fields = arguments[2], offset = arguments[3], limit = arguments[4];
+var end = limit === null ? elements.length : Math.min(elements.length, offset + limit);
+var records = [];
+for (var i = offset; i < end; i++) {
+    var el = elements[i], record = {};
+    for (var f = 0; f < fields.length; f++) {
+        var field = fields[f];
+        if (field === "text") record[field] = readText(el);
+        else if (field === "displayed") record[field] = isDisplayed(el);
+        else if (field === "tag") record[field] = el.tagName.toLowerCase();
+        else if (field.indexOf("css:") === 0) record[field] = readCss(el, field.slice(4));
+        else if (field.indexOf("attribute:") === 0) record[field] = readAttribute(el, field.slice(10));
+        else record[field] = readAttribute(el, field);
+    }
+    records.push(record);
+}
+return {total: elements.length, records: records};
+"""
+
+
+def condition(source, op, expected=None, name=None):
+    return {"source": source, "op": op, "expected": expected, "name": name}
+
+
+def text_condition(op, expected):
+    return condition("text", op, expected)
+
+
+def attribute_condition(attribute, op, expected=None):
+    return condition("attribute", op, expected, attribute)
+
+
+def css_condition(css_property, op, expected):
+    return condition("css", op, expected, css_property)
+
+
+def change_condition(source, last_value=None, name=None):
+    """
+    Met as soon as the text, attribute `name` or CSS property `name` of the
+    element has a value other than `last_value`, None meaning any value
+    """
+    return condition(source, "changes", last_value, name)
+
+
+def displayed_condition(displayed=True):
+    return condition("displayed", "is", displayed)
+
+
+def element_condition(requirement=VISIBLE):
+    """
+    Present, visible or clickable (visible, enabled and not covered by
+    another element). The value reported back is the first unmet state:
+    missing, hidden, disabled or obscured
+    """
+    return condition("element", "is", "ok", requirement)
+
+
+def count_condition(minimum=None, maximum=None):
+    return {
+        "source": "count",
+        "op": "between",
+        "minimum": minimum,
+        "maximum": maximum,
+        "expected": None,
+        "name": None,
+    }
@@ -0,0 +1,229 @@
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from ui_framework import performance_log
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Reuse WebDriver sessions across tests
+
+Starting Chrome costs seconds per test while resetting a running browser
+costs milliseconds. A DriverPool hands out idle drivers and takes them back
+after the test, putting each one back into a known state first: extra tabs
+closed, cookies and storage cleared, parked on about:blank. A driver that
+fails its health check or the reset is quit and replaced by a new one on
+the next acquire, so a crashed browser never leaks into a later test.
+
+Storage is cleared for every origin the test visited, not only the one the
+browser ends on: each tab's navigation history and frames, plus the
+documents in the performance log when it is enabled. A test that visited
+more than `max_cleared_origins` gets its driver recycled instead.
+
+`size` caps how many idle drivers are kept, not how many can be handed out:
+acquire never blocks and a test that needs two browsers gets two.
+"""
+
+DEFAULT_POOL_SIZE = 2
+# Drivers are replaced after this many tests to keep slow browser leaks
+# (memory, GPU process, detached renderers) from building up
+DEFAULT_MAX_USES = 50
+# Past this many origins recycling the browser beats clearing each one
+DEFAULT_MAX_CLEARED_ORIGINS = 20
+BLANK_PAGE = "about:blank"
+# Name of the pool's reader of the shared performance log
+LOG_READER = "driver_pool"
+CLEAR_STORAGE_JS = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+# The page and the frames it loaded, which keep storage of their own origins
+FRAME_URLS_JS = """
+return [location.href].concat(
+    performance.getEntriesByType("resource")
+        .filter(function (entry) { return entry.initiatorType === "iframe"; })
+        .map(function (entry) { return entry.name; })
+);
+"""
+
+
+class DriverPool(object):
+
+    def __init__(
+        self,
+        create_driver,
+        size=DEFAULT_POOL_SIZE,
+        max_uses=DEFAULT_MAX_USES,
+        window_size=None,
+        max_cleared_origins=DEFAULT_MAX_CLEARED_ORIGINS,
+    ):
+        self.create_driver = create_driver
+        self.size = size
+        self.max_uses = max_uses
+        self.max_cleared_origins = max_cleared_origins
+        self.window_size = window_size
+        self._idle = []
+        self._uses = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def acquire(self):
+        """
+        An idle driver that passes the health check, or a new one
+        """
+        while True:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                return self.new_driver()
+            if self.is_healthy(driver):
+                self.reused += 1
+                return driver
+            LOGGER.info("Discarding unresponsive pooled WebDriver session")
+            self.discard(driver)
+
+    def new_driver(self):
+        driver = self.create_driver()
+        # Registered now, so entries other readers drain during the test are
+        # still there for the reset
+        performance_log.reader(driver, LOG_READER)
+        self.created += 1
+        self._uses[id(driver)] = 0
+        return driver
+
+    def release(self, driver):
+        """
+        Reset `driver` and keep it for the next test, or quit it when the pool
+        is full, the driver is worn out or the reset failed
+        """
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+        if self.max_uses and uses >= self.max_uses:
+            self.discard(driver)
+            return
+        try:
+            self.reset(driver)
+        except Exception as e:
+            LOGGER.info(f"Could not reset pooled WebDriver session, replacing it: {e!r}")
+            self.discard(driver)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(driver)
+                return
+        self.discard(driver)
+
+    def discard(self, driver):
+        self._uses.pop(id(driver), None)
+        self.recycled += 1
+        try:
+            driver.quit()
+        except Exception as e:
+            # Already gone when the browser crashed
+            LOGGER.debug(f"Error quitting WebDriver session: {e!r}")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self.discard(driver)
+
+    @staticmethod
+    def is_healthy(driver):
+        try:
+            return bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def reset(self, driver):
+        handles = driver.window_handles
+        origins = set()
+        # Ends on the first tab, the only one kept
+        for handle in reversed(handles):
+            driver.switch_to.window(handle)
+            origins.update(_tab_origins(driver))
+            if handle != handles[0]:
+                driver.close()
+        origins.update(_logged_document_origins(driver))
+
+        driver.execute_script(CLEAR_STORAGE_JS)
+        if hasattr(driver, "execute_cdp_cmd"):
+            if self.max_cleared_origins is not None and len(origins) > self.max_cleared_origins:
+                raise Exception(f"Test visited {len(origins)} origins, recycling instead of clearing them")
+            # Storage is per origin, so each one the test reached is cleared
+            for origin in sorted(origins):
+                driver.execute_cdp_cmd(
+                    "Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"}
+                )
+            # Every domain's cookies, delete_all_cookies only covers the current one
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        else:
+            driver.delete_all_cookies()
+
+        driver.get(BLANK_PAGE)
+        if self.window_size is not None:
+            driver.set_window_size(*self.window_size)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "recycled": self.recycled,
+            "idle": idle,
+        }
+
+
+def _origin(url):
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _origins(urls):
+    return {origin for origin in map(_origin, urls) if origin}
+
+
+def _tab_origins(driver):
+    """
+    Origins of the current tab's page, its frames and its navigation history
+    """
+    urls = [driver.current_url]
+    urls.extend(driver.execute_script(FRAME_URLS_JS) or [])
+    if hasattr(driver, "execute_cdp_cmd"):
+        history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+        urls.extend(entry.get("url") for entry in history.get("entries", []))
+    return _origins(urls)
+
+
+def _logged_document_origins(driver):
+    """
+    Origins of the documents and frames in the performance log, which also
+    covers tabs the test already closed. Empty when the log is not enabled
+    """
+    try:
+        log_entries = performance_log.reader(driver, LOG_READER).read()
+    except Exception:
+        return set()
+    urls = []
+    for entry in log_entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        params = message.get("params", {})
+        if message.get("method") == "Network.requestWillBeSent" and params.get("type") == "Document":
+            urls.append(params.get("request", {}).get("url"))
+    return _origins(urls)
@@ -0,0 +1,219 @@
+import base64
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+
+from ui_framework import performance_log
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Failure artifacts captured off the teardown path
+
+Capturing a failure needs the browser, so the screenshot, DOM and logs are
+pulled from it during teardown, one command each and within a time budget.
+Each command gets whatever is left of the budget as its timeout, and once
+one runs out the remaining steps are skipped. Everything after that (base64
+decoding, gzip, disk writes) is handed to a background writer thread, so a
+run with many failures never waits on the disk. Call ArtifactWriter.close()
+at the end of the session to flush it.
+"""
+
+# Most time capture may add to a failing test's teardown
+CAPTURE_BUDGET_SECONDS = 5
+SCREENSHOT_JPEG_QUALITY = 70
+WRITE_QUEUE_SIZE = 64
+# Add "performance" for browsers started with the performance log enabled
+LOG_TYPES = ("browser",)
+
+# queued: paths handed to the writer. timed_out: a step was abandoned while
+# the browser was still working on it, so the browser should not be reused
+CaptureResult = namedtuple("CaptureResult", ["queued", "timed_out"])
+
+
+class ArtifactWriter(object):
+
+    def __init__(self, max_queued=WRITE_QUEUE_SIZE):
+        self._queue = queue.Queue(max_queued)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="failure-artifacts", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, path, data, encoding=None, compress=False, timeout=1):
+        """
+        Queue `data` to be written to `path`. `encoding` "base64" decodes it
+        first, `compress` gzips it and appends .gz to the path. Returns False
+        when the queue stayed full for `timeout` seconds and it was dropped
+        """
+        self._start()
+        try:
+            self._queue.put((path, data, encoding, compress), timeout=max(timeout, 0))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            LOGGER.warning(f"Artifact writer is backed up, dropped {path}")
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                LOGGER.warning(f"Could not write failure artifact {item[0]}: {e!r}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, data, encoding, compress):
+        if encoding == "base64":
+            data = base64.b64decode(data)
+        elif isinstance(data, str):
+            data = data.encode("utf-8")
+        if compress:
+            data = gzip.compress(data, compresslevel=6)
+            path += ".gz"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+        self.written += 1
+
+    def flush(self):
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def _screenshot(driver):
+    """
+    JPEG through the DevTools protocol, a fraction of the size and encode
+    time of WebDriver's PNG. Returns (base64 data, extension)
+    """
+    if hasattr(driver, "execute_cdp_cmd"):
+        try:
+            result = driver.execute_cdp_cmd(
+                "Page.captureScreenshot",
+                {"format": "jpeg", "quality": SCREENSHOT_JPEG_QUALITY},
+            )
+            return result["data"], "jpg"
+        except Exception as e:
+            LOGGER.debug(f"DevTools screenshot failed, using WebDriver's: {e!r}")
+    return driver.get_screenshot_as_base64(), "png"
+
+
+def _logs(driver, log_type, since):
+    if log_type == "performance":
+        # Shared with the other readers of the log, see ui_framework.performance_log
+        entries = performance_log.buffer_for(driver).peek()
+    else:
+        entries = driver.get_log(log_type)
+    if since is not None:
+        # Pooled browsers still hold entries from earlier tests
+        since_ms = since * 1000
+        entries = [entry for entry in entries if entry.get("timestamp", since_ms) >= since_ms]
+    return "\n".join(json.dumps(entry) for entry in entries) + "\n"
+
+
+def _call_with_timeout(function, timeout):
+    """
+    function() on a daemon thread, raising TimeoutError when it has not
+    returned within `timeout` seconds. The call is abandoned, not stopped
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = function()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name="failure-artifact-capture", daemon=True)
+    thread.start()
+    thread.join(max(timeout, 0))
+    if thread.is_alive():
+        raise TimeoutError(f"No answer within {timeout:.1f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def capture_failure_artifacts(
+    driver, directory, name, writer, since=None, budget=CAPTURE_BUDGET_SECONDS, log_types=LOG_TYPES
+):
+    """
+    Pull the screenshot, DOM and `log_types` logs from `driver` and queue
+    them on `writer`, all within `budget` seconds: a step still waiting on
+    the browser at the deadline is abandoned and the rest are skipped.
+    `since` (epoch seconds) drops log entries older than the test. Returns
+    a CaptureResult, its paths without the .gz suffix compressed files get
+    """
+    deadline = time.monotonic() + budget
+    base_path = os.path.join(directory, re.sub(r"[^\w\-_\. ]", "_", name))
+    queued = []
+    timed_out = False
+
+    def remaining():
+        return deadline - time.monotonic()
+
+    def capture(step, read):
+        nonlocal deadline, timed_out
+        if remaining() <= 0:
+            LOGGER.info(f"Skipped {step} capture for {name}, over the {budget}s budget")
+            return
+        try:
+            path, data, encoding, compress = _call_with_timeout(read, remaining())
+        except TimeoutError:
+            LOGGER.info(f"Gave up on {step} capture for {name} at the {budget}s budget")
+            # The browser is still busy with it, later steps would only queue up
+            deadline = min(deadline, time.monotonic())
+            timed_out = True
+            return
+        except Exception as e:
+            LOGGER.info(f"Could not capture {step} for {name}: {e!r}")
+            return
+        if writer.submit(path, data, encoding, compress, timeout=remaining()):
+            queued.append(path)
+
+    def screenshot():
+        data, extension = _screenshot(driver)
+        return f"{base_path}.{extension}", data, "base64", False
+
+    def dom():
+        return f"{base_path}.html", driver.page_source, None, True
+
+    capture("screenshot", screenshot)
+    capture("DOM", dom)
+    for log_type in log_types:
+        capture(
+            f"{log_type} log",
+            lambda log_type=log_type: (
+                f"{base_path}.{log_type}.jsonl",
+                _logs(driver, log_type, since),
+                None,
+                True,
+            ),
+        )
+    return CaptureResult(queued, timed_out)
@@ -0,0 +1,111 @@
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+"""
+Serve a recorded HAR file from a local port
+
+Every response in the HAR is served again for the same method, path and
+query, whatever host it was recorded from. Text bodies have the recorded
+origins rewritten to the replay server, so a recorded page loads its API
+calls and scripts from the replay too. Requests with no recording get a 404
+and are listed in `misses`.
+"""
+
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "content-encoding",
+    "content-length",
+    "keep-alive",
+    "transfer-encoding",
+}
+TEXT_MIME_MARKERS = ("json", "javascript", "html", "text", "xml")
+
+
+def _request_key(method, url):
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    return method.upper(), f"{path}?{parts.query}" if parts.query else path
+
+
+class HarReplayServer(object):
+
+    def __init__(self, har_path, port=0, host="127.0.0.1"):
+        with open(har_path) as file:
+            entries = json.load(file)["log"]["entries"]
+        self.origins = set()
+        self.responses = {}
+        self.misses = []
+        for entry in entries:
+            parts = urlsplit(entry["request"]["url"])
+            self.origins.add(f"{parts.scheme}://{parts.netloc}")
+            # First recording wins, like the page's first request did
+            self.responses.setdefault(_request_key(entry["request"]["method"], entry["request"]["url"]), entry["response"])
+
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _replay(self):
+                response = replay.responses.get(_request_key(self.command, self.path))
+                if response is None:
+                    replay.misses.append(f"{self.command} {self.path}")
+                    self.send_error(404, "Not recorded")
+                    return
+                body, mime_type = replay.body_of(response)
+                self.send_response(response.get("status") or 200)
+                for header in response.get("headers", []):
+                    if header["name"].lower() not in HOP_BY_HOP_HEADERS:
+                        self.send_header(header["name"], header["value"])
+                if mime_type and not any(h["name"].lower() == "content-type" for h in response.get("headers", [])):
+                    self.send_header("Content-Type", mime_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_HEAD = do_OPTIONS = _replay
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="har-replay", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def body_of(self, response):
+        content = response.get("content", {})
+        mime_type = content.get("mimeType", "")
+        text = content.get("text") or ""
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(text)
+        else:
+            body = text.encode("utf-8")
+        if any(marker in mime_type for marker in TEXT_MIME_MARKERS):
+            decoded = body.decode("utf-8", errors="replace")
+            for origin in self.origins:
+                decoded = decoded.replace(origin, self.url)
+            body = decoded.encode("utf-8")
+        return body, mime_type
+
+    def url_for(self, recorded_url):
+        """
+        Where `recorded_url` is served from by this replay
+        """
+        method, path = _request_key("GET", recorded_url)
+        return f"{self.url}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,272 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from selenium.webdriver.common.by import By
+
+"""
+Optional timing of SeleniumBasePage actions and waits
+
+Nothing is recorded unless a profiler has been activated with
+set_active_profiler (the pytest plugin in tests/conftest.py does this for
+--profile-page-actions). While active, every public page object method
+records its wall time, the WebDriver commands it issued, how many times it
+slept in a poll loop and how many stale element retries it went through.
+Nested calls (click -> wait_for_element_to_be_clickable) are kept as a
+call path so the output can be read as a flame graph
+
+Records are kept per test only until end_test hands them out, after that
+just their per action totals remain, so a long session does not grow
+without bound. Under pytest-xdist each worker sends its totals to the
+controller through workeroutput (see tests/conftest.py)
+"""
+
+# "id", "css selector", ... a locator tuple starts with one of these
+LOCATOR_STRATEGIES = frozenset(value for name, value in vars(By).items() if name.isupper())
+
+ActionRecord = namedtuple(
+    "ActionRecord",
+    [
+        "test",
+        "path",
+        "method",
+        "locator",
+        "wall_ms",
+        "self_ms",
+        "commands",
+        "polls",
+        "stale_retries",
+    ],
+)
+
+_active_profiler = None
+COUNTERS = ("commands", "polls", "stale_retries")
+SUMMARY_FIELDS = ("calls", "wall_ms", "max_ms") + COUNTERS
+
+
+def set_active_profiler(profiler):
+    global _active_profiler
+    _active_profiler = profiler
+
+
+def active_profiler():
+    return _active_profiler
+
+
+def record(counter, amount=1):
+    """
+    Add to a counter of every action currently running on this thread
+    """
+    if _active_profiler is not None:
+        _active_profiler.count(counter, amount)
+
+
+class _Frame(object):
+
+    def __init__(self, method, locator):
+        self.method = method
+        self.locator = locator
+        self.start = time.perf_counter()
+        self.child_ms = 0.0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+
+class ActionProfiler(object):
+
+    def __init__(self):
+        # Test name -> its records, until end_test takes them
+        self.records = defaultdict(list)
+        # (method, locator) -> totals of the top-level calls of ended tests
+        self.totals = {}
+        self.current_test = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def attach(self, driver):
+        """
+        Count every command the driver sends, element commands included since
+        WebElement calls go through the parent driver's execute()
+        """
+        if getattr(driver, "_action_profiler", None) is self:
+            return
+        execute = getattr(driver, "_unprofiled_execute", driver.execute)
+
+        @functools.wraps(execute)
+        def counting_execute(*args, **kwargs):
+            self.count("commands")
+            return execute(*args, **kwargs)
+
+        driver._unprofiled_execute = execute
+        driver.execute = counting_execute
+        driver._action_profiler = self
+
+    def count(self, counter, amount=1):
+        for frame in self._stack():
+            frame.counters[counter] += amount
+
+    def start_test(self, test_name):
+        self.current_test = test_name
+
+    def end_test(self):
+        """
+        The records of the current test, which the profiler no longer keeps
+        past adding them to its totals
+        """
+        test_name, self.current_test = self.current_test, None
+        with self._lock:
+            records = self.records.pop(test_name, [])
+            _add_totals(self.totals, _group_top_level(records))
+        return records
+
+    def summary(self):
+        """
+        Totals of every ended test, as a list that survives serialisation
+        """
+        with self._lock:
+            return [dict(entry) for entry in self.totals.values()]
+
+    def add_summary(self, entries):
+        """
+        Fold in the summary() of another profiler, an xdist worker's
+        """
+        grouped = {(entry["method"], entry["locator"]): entry for entry in entries}
+        with self._lock:
+            _add_totals(self.totals, grouped)
+
+    def enter(self, method, locator):
+        stack = self._stack()
+        stack.append(_Frame(method, locator))
+
+    def exit(self):
+        stack = self._stack()
+        frame = stack.pop()
+        wall_ms = (time.perf_counter() - frame.start) * 1000
+        if stack:
+            stack[-1].child_ms += wall_ms
+        path = tuple(f.method for f in stack) + (frame.method,)
+        action = ActionRecord(
+            test=self.current_test,
+            path=path,
+            method=frame.method,
+            locator=frame.locator,
+            wall_ms=round(wall_ms, 3),
+            self_ms=round(max(wall_ms - frame.child_ms, 0), 3),
+            **frame.counters,
+        )
+        with self._lock:
+            self.records[action.test].append(action)
+
+    def folded_stacks(self, records=None):
+        """
+        Self time per call path, in microseconds, in the collapsed format
+        flamegraph.pl and speedscope read:
+        "test;click;wait_for_element_to_be_clickable 1200"
+        """
+        if records is None:
+            with self._lock:
+                records = [action for test_records in self.records.values() for action in test_records]
+        totals = defaultdict(float)
+        for action in records:
+            totals[";".join((action.test or "session",) + action.path)] += action.self_ms
+        return "\n".join(f"{path} {round(ms * 1000)}" for path, ms in sorted(totals.items())) + "\n"
+
+    def slowest(self, limit=10, records=None):
+        """
+        Top-level calls grouped by method and locator, slowest total first.
+        Without `records`, the totals of every ended test
+        """
+        if records is None:
+            entries = self.summary()
+        else:
+            entries = _group_top_level(records).values()
+        ranked = sorted(entries, key=lambda entry: entry["wall_ms"], reverse=True)
+        return ranked[:limit]
+
+    def export(self, directory, name, records):
+        os.makedirs(directory, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        with open(os.path.join(directory, f"{safe_name}.json"), "w") as file:
+            json.dump([action._asdict() for action in records], file, indent=2)
+        with open(os.path.join(directory, f"{safe_name}.folded"), "w") as file:
+            file.write(self.folded_stacks(records))
+
+
+def _group_top_level(records):
+    grouped = {}
+    for action in records:
+        if len(action.path) != 1:
+            continue
+        entry = grouped.setdefault(
+            (action.method, action.locator),
+            dict({"method": action.method, "locator": action.locator}, **dict.fromkeys(SUMMARY_FIELDS, 0)),
+        )
+        entry["calls"] += 1
+        entry["wall_ms"] += action.wall_ms
+        entry["max_ms"] = max(entry["max_ms"], action.wall_ms)
+        for counter in COUNTERS:
+            entry[counter] += getattr(action, counter)
+    return grouped
+
+
+def _add_totals(totals, grouped):
+    for key, entry in grouped.items():
+        total = totals.get(key)
+        if total is None:
+            totals[key] = dict(entry)
+            continue
+        for field in SUMMARY_FIELDS:
+            if field == "max_ms":
+                total[field] = max(total[field], entry[field])
+            else:
+                total[field] += entry[field]
+
+
+def _is_strategy(value):
+    return isinstance(value, str) and value in LOCATOR_STRATEGIES
+
+
+def _locator_from_arguments(args, kwargs):
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, tuple) and len(value) == 2 and _is_strategy(value[0]):
+            return f"{value[0]}={value[1]}"
+    # scroll_into_view(*loc) receives the locator unpacked
+    if len(args) >= 2 and _is_strategy(args[0]) and isinstance(args[1], str):
+        return f"{args[0]}={args[1]}"
+    return None
+
+
+def profiled(method):
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = _active_profiler
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        profiler.attach(self.driver)
+        profiler.enter(name, _locator_from_arguments(args, kwargs))
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profiler.exit()
+
+    return wrapper
+
+
+def instrument_public_methods(cls):
+    """
+    Class decorator wrapping every public method defined on `cls`
+    """
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and callable(value) and not isinstance(value, (staticmethod, classmethod)):
+            setattr(cls, name, profiled(value))
+    return cls
@@ -0,0 +1,118 @@
+import logging
+import threading
+import weakref
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+One shared reader of a browser's performance log
+
+driver.get_log("performance") hands out each entry only once, so the JSON
+capture, the network report and the driver pool would each miss whatever
+another one read first. Every consumer reads through the buffer of its
+driver instead: the buffer is the only caller of get_log and keeps entries
+until every reader has read them. A reader sees each entry once, however
+many other readers there are.
+"""
+
+# Entries kept for readers that have fallen behind, the oldest go first
+MAX_BUFFERED_ENTRIES = 50000
+
+_buffers = weakref.WeakKeyDictionary()
+_buffers_lock = threading.Lock()
+
+
+def buffer_for(driver):
+    with _buffers_lock:
+        buffer = _buffers.get(driver)
+        if buffer is None:
+            buffer = _buffers[driver] = PerformanceLogBuffer(driver)
+        return buffer
+
+
+def reader(driver, name=None):
+    """
+    A reader of `driver`'s performance log. Readers with a `name` are kept by
+    the buffer and the same one is returned on every call, so consumers that
+    do not hold on to state between calls (like network_report) still pick up
+    where they stopped
+    """
+    return buffer_for(driver).reader(name)
+
+
+class PerformanceLogReader(object):
+
+    def __init__(self, buffer, position):
+        self._buffer = buffer
+        self.position = position
+
+    def read(self):
+        """
+        Entries logged since this reader last read, oldest first
+        """
+        return self._buffer._read(self)
+
+    def skip(self):
+        """
+        Move past everything logged so far
+        """
+        self._buffer._read(self)
+
+
+class PerformanceLogBuffer(object):
+
+    def __init__(self, driver, max_entries=MAX_BUFFERED_ENTRIES):
+        # The buffer lives as long as the driver, it must not keep it alive
+        self._driver = weakref.ref(driver)
+        self.max_entries = max_entries
+        self._entries = []
+        # Position of _entries[0] among everything ever read from the driver
+        self._start = 0
+        self._readers = weakref.WeakSet()
+        self._named_readers = {}
+        self._lock = threading.Lock()
+
+    def reader(self, name=None):
+        """
+        New readers start at the oldest entry still buffered, which for a
+        buffer nobody has read yet is the browser's whole log
+        """
+        with self._lock:
+            if name in self._named_readers:
+                return self._named_readers[name]
+            reader = PerformanceLogReader(self, self._start)
+            self._readers.add(reader)
+            if name is not None:
+                self._named_readers[name] = reader
+            return reader
+
+    def peek(self):
+        """
+        Every entry still buffered plus anything new, without moving any reader
+        """
+        with self._lock:
+            self._drain()
+            return list(self._entries)
+
+    def _drain(self):
+        driver = self._driver()
+        if driver is None:
+            return
+        self._entries.extend(driver.get_log("performance"))
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            LOGGER.debug(f"Performance log buffer is full, dropped the oldest {overflow} entries")
+            del self._entries[:overflow]
+            self._start += overflow
+
+    def _read(self, reader):
+        with self._lock:
+            self._drain()
+            entries = self._entries[max(reader.position - self._start, 0):]
+            reader.position = self._start + len(self._entries)
+            # Only keep what some reader has not read yet
+            oldest = min((other.position for other in self._readers), default=reader.position)
+            if oldest > self._start:
+                del self._entries[:oldest - self._start]
+                self._start = oldest
+            return entries
@@ -0,0 +1,204 @@
+import json
+import logging
+from collections import defaultdict
+
+from ui_framework import performance_log
+
+LOGGER = logging.getLogger(__name__)
+
+"""
+Keep the browser from downloading what a run never looks at
+
+Blocking goes through the DevTools Network.setBlockedURLs command, so it has
+to be applied to a running driver (apply_blocking) rather than through
+capabilities. Blocked requests fail inside the browser before they reach the
+network; the DOM, including every img[alt], is unaffected.
+
+network_report reads the performance log (configure_chrome with
+performance_log=True) for the requests the current page made, and
+compare_reports turns a report taken without blocking and one taken with it
+into requests and bytes saved.
+"""
+
+# Name of network_report's reader of the shared performance log
+NETWORK_REPORT_READER = "network_report"
+
+# File extensions per resource type. Chrome's blocked URL patterns only know
+# the * wildcard, so each extension is anchored to the end of the URL, with
+# or without a query string: ".gif" must not catch "/gift-cards", ".ico"
+# not "/icons.json" and ".webp" not a "webpack" bundle
+BLOCK_EXTENSIONS = {
+    "image": ("png", "jpg", "jpeg", "gif", "webp", "avif", "ico", "bmp"),
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "media": ("mp4", "webm", "m3u8", "mpd", "m4s", "m4a", "mp3", "vtt"),
+}
+
+
+def extension_patterns(extensions):
+    patterns = []
+    for extension in extensions:
+        patterns.extend((f"*.{extension}", f"*.{extension}?*"))
+    return patterns
+
+
+BLOCK_PATTERNS = {
+    "image": extension_patterns(BLOCK_EXTENSIONS["image"]),
+    "font": extension_patterns(BLOCK_EXTENSIONS["font"]),
+    "media": extension_patterns(BLOCK_EXTENSIONS["media"]),
+    "tracker": [
+        "*doubleclick.net*",
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*googlesyndication.com*",
+        "*facebook.net*",
+        "*connect.facebook.com*",
+        "*scorecardresearch.com*",
+        "*demdex.net*",
+        "*omtrdc.net*",
+        "*adobedtm.com*",
+        "*branch.io*",
+        "*hotjar.com*",
+        "*segment.io*",
+        "*newrelic.com*",
+        "*nr-data.net*",
+        "*moatads.com*",
+    ],
+}
+
+# Preset name -> resource types from BLOCK_PATTERNS
+BLOCKING_PRESETS = {
+    "none": (),
+    "no-trackers": ("tracker",),
+    "no-media": ("media", "tracker"),
+    "text-only": ("image", "font", "media", "tracker"),
+}
+
+NAVIGATION_TIMING_JS = """
+var entry = performance.getEntriesByType("navigation")[0];
+if (!entry) return null;
+return {
+    dom_content_loaded_ms: entry.domContentLoadedEventEnd,
+    load_ms: entry.loadEventEnd,
+    transfer_bytes: entry.transferSize
+};
+"""
+
+
+def blocked_types(preset_or_types="none"):
+    """
+    BLOCK_PATTERNS types for a preset name, or the types given
+    """
+    if not isinstance(preset_or_types, str):
+        return tuple(preset_or_types)
+    if preset_or_types not in BLOCKING_PRESETS:
+        raise Exception(
+            f"Unknown blocking preset {preset_or_types}, expected one of {', '.join(BLOCKING_PRESETS)}"
+        )
+    return BLOCKING_PRESETS[preset_or_types]
+
+
+def blocked_patterns(preset_or_types="none", extra_patterns=()):
+    """
+    URL patterns for a preset name or an iterable of BLOCK_PATTERNS types
+    """
+    patterns = []
+    for resource_type in blocked_types(preset_or_types):
+        patterns.extend(BLOCK_PATTERNS[resource_type])
+    patterns.extend(extra_patterns)
+    return patterns
+
+
+def apply_blocking(driver, preset_or_types="none", extra_patterns=()):
+    """
+    Block the preset's patterns for every later request of the driver's
+    current tab. Returns the patterns applied
+    """
+    patterns = blocked_patterns(preset_or_types, extra_patterns)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return patterns
+
+
+def start_network_report(driver):
+    """
+    Count requests for network_report from now on, including log entries
+    other readers of the performance log drain before the first report
+    """
+    performance_log.reader(driver, NETWORK_REPORT_READER)
+
+
+def _new_type_entry():
+    return {"requests": 0, "bytes": 0, "blocked": 0}
+
+
+def network_report(driver, log_entries=None):
+    """
+    Requests and bytes per resource type logged since the last report for
+    this driver, plus the current page's navigation timing. Call this once
+    per page load
+    """
+    if log_entries is None:
+        log_entries = performance_log.reader(driver, NETWORK_REPORT_READER).read()
+    requests = {}
+    for entry in log_entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method", "")
+        params = message.get("params", {})
+        request_id = params.get("requestId")
+        if request_id is None:
+            continue
+        if method == "Network.requestWillBeSent":
+            request = requests.setdefault(request_id, {"bytes": 0, "blocked": False})
+            request["url"] = params.get("request", {}).get("url")
+            request["type"] = params.get("type", "Other")
+        elif method == "Network.loadingFinished":
+            requests.setdefault(request_id, {"bytes": 0, "blocked": False})["bytes"] = params.get(
+                "encodedDataLength", 0
+            )
+        elif method == "Network.loadingFailed":
+            request = requests.setdefault(request_id, {"bytes": 0, "blocked": False})
+            request["blocked"] = bool(params.get("blockedReason"))
+            request.setdefault("type", params.get("type", "Other"))
+
+    by_type = defaultdict(_new_type_entry)
+    for request in requests.values():
+        entry = by_type[request.get("type", "Other")]
+        if request["blocked"]:
+            entry["blocked"] += 1
+        else:
+            entry["requests"] += 1
+            entry["bytes"] += int(request["bytes"])
+
+    report = {
+        "requests": sum(entry["requests"] for entry in by_type.values()),
+        "bytes": sum(entry["bytes"] for entry in by_type.values()),
+        "blocked_requests": sum(entry["blocked"] for entry in by_type.values()),
+        "by_type": dict(by_type),
+    }
+    try:
+        report["timing"] = driver.execute_script(NAVIGATION_TIMING_JS)
+    except Exception as e:
+        LOGGER.debug(f"Could not read navigation timing: {e!r}")
+        report["timing"] = None
+    return report
+
+
+def compare_reports(baseline, blocked):
+    """
+    What blocking saved on a page: `baseline` is its network_report without
+    blocking, `blocked` the one with it
+    """
+    comparison = {
+        "requests_saved": baseline["requests"] - blocked["requests"],
+        "bytes_saved": baseline["bytes"] - blocked["bytes"],
+        "blocked_requests": blocked["blocked_requests"],
+    }
+    if baseline["bytes"]:
+        comparison["bytes_saved_percent"] = round(100 * comparison["bytes_saved"] / baseline["bytes"], 1)
+    baseline_timing, blocked_timing = baseline.get("timing"), blocked.get("timing")
+    if baseline_timing and blocked_timing:
+        comparison["load_ms_saved"] = round(baseline_timing["load_ms"] - blocked_timing["load_ms"], 1)
+    return comparison